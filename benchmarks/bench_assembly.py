@@ -0,0 +1,96 @@
+"""
+Benchmark of the assembly of the training data of Order, Seller and Product:
+features.assemble (one index-aligned join) versus the former chain of
+DataFrame.merge, time and peak memory, on synthetic Olist datasets.
+
+python benchmarks/bench_assembly.py
+python benchmarks/bench_assembly.py --scales 1 10 --encode-ids
+"""
+import os
+import time
+import argparse
+import tracemalloc
+
+import pandas as pd
+
+from olistpackage.session import Session
+from olistpackage.features import assemble
+from bench_scale import BENCHMARKS_PATH, dataset
+
+
+def chain(blocks: list, on: str) -> pd.DataFrame:
+    """
+    The former implementation, one merge per block
+    """
+    result = blocks[0]
+    for block in blocks[1:]:
+        result = result.merge(block, on=on)
+    return result
+
+
+def blocks(session: Session) -> dict:
+    """
+    Return the blocks joined by the get_training_data methods:
+    key column -> Python list of DataFrames
+    """
+    order, seller, product = session.order(), session.seller(), session.product()
+    return {
+        "order_id": [order.get_wait_time(), order.get_review_score(),
+                     order.get_number_products(), order.get_number_sellers(),
+                     order.get_price_and_freight()],
+        "seller_id": [seller.get_seller_features(),
+                      seller.get_seller_delay_wait_time(),
+                      seller.get_active_dates(), seller.get_review_score(),
+                      seller.get_quantity(), seller.get_sales()],
+        "product_id": [product.get_product_features(), product.get_wait_time(),
+                       product.get_price(), product.get_review_score(),
+                       product.get_quantity(), product.get_sales()],
+    }
+
+
+def measure(function) -> tuple:
+    """
+    Return the result, the wall time and the peak memory (MB) of a call
+    """
+    start = time.perf_counter()
+    result = function()
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return result, seconds, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-path", default=os.path.join(BENCHMARKS_PATH, "data"))
+    parser.add_argument("--encode-ids", action="store_true",
+                        help="join the int32 codes, see Session(encode_ids=True)")
+    args = parser.parse_args()
+
+    rows = []
+    for scale in args.scales:
+        olist = dataset(os.path.join(args.data_path, f"scale_{scale:g}"),
+                        scale, args.seed)
+        session = Session(olist.get_data(), feature_cache=False,
+                          encode_ids=args.encode_ids)
+        for on, frames in blocks(session).items():
+            expected, chain_s, chain_mb = measure(lambda: chain(frames, on))
+            result, assemble_s, assemble_mb = measure(lambda: assemble(frames, on))
+            # same rows in the same order
+            pd.testing.assert_frame_equal(
+                result.astype({on: object}), expected.astype({on: object}),
+                check_dtype=False)
+            rows.append({"scale": scale, "key": on, "rows": len(result),
+                         "merge_chain_s": chain_s, "assemble_s": assemble_s,
+                         "speedup": chain_s / assemble_s,
+                         "merge_chain_mb": chain_mb, "assemble_mb": assemble_mb})
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
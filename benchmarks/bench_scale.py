@@ -0,0 +1,146 @@
+"""
+Scale benchmark of olistpackage: time and peak memory of Olist.get_data
+and of every feature method of Order, Seller and Product, on synthetic
+Olist datasets of 1x, 10x and 100x the size of the Olist dataset.
+The results are stored in benchmarks/results/bench_scale_<date>.csv,
+to be compared with the results of a previous run.
+
+python benchmarks/bench_scale.py
+python benchmarks/bench_scale.py --scales 0.1 1 --compare benchmarks/results/bench_scale_<date>.csv
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+
+import pandas as pd
+
+from olistpackage.data import Olist
+from olistpackage.session import Session
+from olistpackage.features import load_graph
+from olistpackage.profiling import rows
+from olistpackage.synthetic import generate
+
+BENCHMARKS_PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def dataset(path: str, scale: float, seed: int) -> Olist:
+    """
+    Return the Olist of the synthetic dataset of a scale,
+    generate it only if it does not exist yet
+    """
+    manifest_path = os.path.join(path, "synthetic.json")
+    manifest = {"scale": scale, "seed": seed}
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) == manifest:
+                return Olist(path)
+    start = time.perf_counter()
+    generate(path, scale, seed)
+    print(f"generated scale {scale} in {time.perf_counter() - start:.1f}s",
+          file=sys.stderr)
+    with open(manifest_path, "w") as f:
+        json.dump(manifest, f)
+    return Olist(path)
+
+
+def measure(function) -> dict:
+    """
+    Call function twice: once for the wall time, once for the peak
+    memory (tracemalloc slows the calls down)
+    :return: a Python dict with the keys seconds, peak_mb, rows, error
+    :rtype: dict
+    """
+    try:
+        start = time.perf_counter()
+        result = function()
+        seconds = time.perf_counter() - start
+
+        tracemalloc.start()
+        function()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    except Exception as error:
+        tracemalloc.stop()
+        return {"seconds": None, "peak_mb": None, "rows": None,
+                "error": f"{type(error).__name__}: {error}"[:200]}
+    return {"seconds": seconds, "peak_mb": peak / 2**20, "rows": rows(result),
+            "error": None}
+
+
+def bench(olist: Olist) -> list:
+    """
+    Measure Olist.get_data, from the csv files and from the cache,
+    then every feature method with the tables in memory
+    and without feature cache, so that each method computes its dependencies
+    :return: a Python list of dict, one per measured function
+    :rtype: list
+    """
+    def cold():
+        olist.clear_cache()
+        return olist.get_data()
+
+    results = [
+        {"target": "Olist.get_data(csv)", **measure(cold)},
+        {"target": "Olist.get_data(cache)", **measure(olist.get_data)},
+    ]
+    data = olist.get_data()
+    for name in sorted(load_graph()):
+        class_name, method = name.split(".")
+        session = Session(data, feature_cache=False)
+        obj = getattr(session, class_name.lower())()
+        results.append({"target": name, **measure(getattr(obj, method))})
+    return results
+
+
+def compare(results: pd.DataFrame, previous_path: str) -> pd.DataFrame:
+    """
+    Compare the results with the results of a previous run:
+    a ratio above 1 is a regression
+    """
+    previous = pd.read_csv(previous_path)
+    df = results.merge(previous, on=["scale", "target"],
+                       suffixes=("", "_previous"))
+    df["seconds_ratio"] = df["seconds"] / df["seconds_previous"]
+    df["peak_mb_ratio"] = df["peak_mb"] / df["peak_mb_previous"]
+    return df[["scale", "target", "seconds_previous", "seconds",
+               "seconds_ratio", "peak_mb_previous", "peak_mb", "peak_mb_ratio"]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--scales", type=float, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-path", default=os.path.join(BENCHMARKS_PATH, "data"),
+                        help="directory of the synthetic datasets")
+    parser.add_argument("--results-path",
+                        default=os.path.join(BENCHMARKS_PATH, "results"))
+    parser.add_argument("--compare", help="csv file of a previous run")
+    args = parser.parse_args()
+
+    results = []
+    for scale in args.scales:
+        olist = dataset(os.path.join(args.data_path, f"scale_{scale:g}"),
+                        scale, args.seed)
+        for result in bench(olist):
+            results.append({"scale": scale, **result})
+    results = pd.DataFrame(results)
+    results["python"] = platform.python_version()
+    results["pandas"] = pd.__version__
+
+    os.makedirs(args.results_path, exist_ok=True)
+    path = os.path.join(args.results_path,
+                        f"bench_scale_{time.strftime('%Y%m%d_%H%M%S')}.csv")
+    results.to_csv(path, index=False)
+    print(results.drop(columns=["python", "pandas"]).to_string(index=False))
+    print(f"\nresults stored in {path}")
+
+    if args.compare:
+        print(compare(results, args.compare).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""
+Benchmark of Seller.get_seller_delay_wait_time:
+the vectorized grouped aggregation versus the former groupby.apply
+Python callbacks, from the ~3k sellers of the Olist dataset
+to 300k synthetic sellers.
+
+python benchmarks/bench_seller_delay_wait_time.py
+python benchmarks/bench_seller_delay_wait_time.py --sellers 3000 30000 --items-per-seller 37
+"""
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from olistpackage.session import Session
+
+
+def synthetic_data(n_sellers: int, items_per_seller: int, seed: int = 0) -> dict:
+    """
+    Return the orders and order_items tables of n_sellers sellers,
+    with one order per item
+    """
+    rng = np.random.default_rng(seed)
+    n = n_sellers * items_per_seller
+    order_id = pd.Series(np.arange(n)).astype(str)
+    purchase = pd.Timestamp("2017-01-01") \
+        + pd.to_timedelta(rng.integers(0, 600 * 86400, n), unit="s")
+    carrier = purchase + pd.to_timedelta(rng.integers(3600, 8 * 86400, n), unit="s")
+    delivered = carrier + pd.to_timedelta(rng.integers(3600, 20 * 86400, n), unit="s")
+    limit = purchase + pd.to_timedelta(rng.integers(86400, 6 * 86400, n), unit="s")
+    # the timestamps are datetime64, as parsed by Olist.get_data
+    orders = pd.DataFrame({
+        "order_id": order_id,
+        "order_status": "delivered",
+        "order_purchase_timestamp": purchase,
+        "order_delivered_carrier_date": carrier,
+        "order_delivered_customer_date": delivered,
+    })
+    order_items = pd.DataFrame({
+        "order_id": order_id,
+        "seller_id": pd.Series(rng.integers(0, n_sellers, n)).astype(str),
+        "shipping_limit_date": limit,
+    })
+    return {"orders": orders, "order_items": order_items}
+
+
+def groupby_apply(data: dict) -> pd.DataFrame:
+    """
+    The former implementation, with groupby.apply Python callbacks
+    """
+    orders = data['orders'].query("order_status=='delivered'")
+    ship = data['order_items'].merge(orders, on='order_id')
+    for col in ['shipping_limit_date', 'order_delivered_carrier_date',
+                'order_delivered_customer_date', 'order_purchase_timestamp']:
+        ship[col] = pd.to_datetime(ship[col])
+
+    def delay_to_logistic_partner(df):
+        days = np.mean(
+            (df.order_delivered_carrier_date - df.shipping_limit_date) /
+            np.timedelta64(24, 'h'))
+        return days if days > 0 else 0
+
+    def order_wait_time(df):
+        return np.mean(
+            (df.order_delivered_customer_date - df.order_purchase_timestamp)
+            / np.timedelta64(24, 'h'))
+
+    delay = ship.groupby('seller_id').apply(delay_to_logistic_partner).reset_index()
+    delay.columns = ['seller_id', 'delay_to_carrier']
+    wait = ship.groupby('seller_id').apply(order_wait_time).reset_index()
+    wait.columns = ['seller_id', 'wait_time']
+    return delay.merge(wait, on='seller_id')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sellers", type=int, nargs="+",
+                        default=[3000, 30000, 300000])
+    parser.add_argument("--items-per-seller", type=int, default=10)
+    args = parser.parse_args()
+
+    rows = []
+    for n_sellers in args.sellers:
+        data = synthetic_data(n_sellers, args.items_per_seller)
+        seller = Session(data, feature_cache=False).seller()
+
+        start = time.perf_counter()
+        vectorized = seller.get_seller_delay_wait_time()
+        vectorized_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = groupby_apply(data)
+        apply_s = time.perf_counter() - start
+
+        pd.testing.assert_frame_equal(
+            vectorized.sort_values('seller_id').reset_index(drop=True),
+            expected.sort_values('seller_id').reset_index(drop=True),
+            check_dtype=False)
+        rows.append({"sellers": n_sellers,
+                     "items": len(data["order_items"]),
+                     "groupby_apply_s": apply_s,
+                     "vectorized_s": vectorized_s,
+                     "speedup": apply_s / vectorized_s})
+
+    print(pd.DataFrame(rows).to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
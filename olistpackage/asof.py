@@ -0,0 +1,192 @@
+import numpy as np
+import pandas as pd
+
+from olistpackage.session import Session
+from olistpackage.incremental import REVIEW_COSTS
+from olistpackage.windows import PrefixSums, FIRST_SECOND, to_seconds
+
+
+class AsOfAggregates:
+    """
+    Point-in-time aggregates of the sellers and of the products: for each
+    order, the aggregates of Seller.get_training_data and
+    Product.get_training_data of its sellers and products, computed only
+    from the events which happened strictly before its
+    order_purchase_timestamp, so that a training set of orders
+    does not leak information of later orders.
+
+    Each fact is dated by the time it is known:
+    - sales, quantity, n_orders: order_purchase_timestamp
+    - delay_to_carrier, wait_time: order_delivered_customer_date,
+    for the delivered orders
+    - review_score, shares of stars, cost_of_reviews: review_creation_date
+
+    The events of each kind are sorted once by entity and time and their
+    values cumulated (see windows.PrefixSums): the aggregates of all the
+    orders take one binary search per order instead of one recomputation.
+
+    aggregates = AsOfAggregates(session)
+    sellers = aggregates.sellers()     # one row per (order_id, seller_id)
+    products = aggregates.products()   # one row per (order_id, product_id)
+    """
+
+    def __init__(self, session: Session = None):
+        """
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        """
+        self.session = session if session is not None else Session.default()
+        data = self.session.source_data
+
+        # the orders of the items, the items of unknown orders are left out
+        orders = data['orders'][['order_id', 'order_status',
+                                 'order_purchase_timestamp',
+                                 'order_delivered_carrier_date',
+                                 'order_delivered_customer_date']]
+        order_ids = pd.Index(orders['order_id'])
+        order = order_ids.get_indexer(data['order_items']['order_id'])
+        self.items = data['order_items'].loc[order >= 0, [
+            'order_id', 'seller_id', 'product_id', 'shipping_limit_date',
+            'price']].reset_index(drop=True)
+        self.order_codes = order[order >= 0]
+        orders = orders.iloc[self.order_codes].reset_index(drop=True)
+        self.purchase = orders['order_purchase_timestamp']
+
+        # delivered items: time of the delivery, delay_to_carrier
+        # and wait_time in days (Seller.get_seller_delay_wait_time)
+        one_day_delta = np.timedelta64(24, 'h')
+        delivered = orders['order_status'] == 'delivered'
+        self.delivery = orders['order_delivered_customer_date'].where(delivered)
+        self.delay = ((orders['order_delivered_carrier_date'] -
+                       self.items['shipping_limit_date']) / one_day_delta)\
+            .to_numpy()
+        self.wait = ((orders['order_delivered_customer_date'] - self.purchase) /
+                     one_day_delta).to_numpy()
+
+        # reviews of the known orders (Order.get_review_score)
+        reviews = data['order_reviews'][['order_id', 'review_score',
+                                         'review_creation_date']]
+        review_order = order_ids.get_indexer(reviews['order_id'])
+        score = reviews['review_score'].astype('float64')
+        self.reviews = pd.DataFrame({
+            'order_code': review_order,
+            'time': reviews['review_creation_date'],
+            'score': score,
+            'one_star': (score == 1) * 1.0,
+            'five_star': (score == 5) * 1.0,
+            'cost': score.map(REVIEW_COSTS),
+        })[review_order >= 0]
+
+        self.seller_events = self._events('seller_id')
+        self.product_events = self._events('product_id')
+
+
+    def _events(self, key: str) -> dict:
+        """
+        Return the entity codes of the items and the sorted events
+        of an entity: "sales", "deliveries" and "reviews" PrefixSums
+        """
+        codes, entities = pd.factorize(self.items[key])
+        # first item of each (order_id, entity) pair
+        first = ~pd.DataFrame({'order': self.order_codes, 'code': codes})\
+            .duplicated().to_numpy()
+
+        # reviews of the distinct (order_id, entity) pairs
+        pairs = pd.DataFrame({'order_code': self.order_codes[first],
+                              'code': codes[first]})
+        reviews = pairs.merge(self.reviews, on='order_code')
+
+        return {
+            'codes': codes,
+            'entities': entities,
+            'first': first,
+            'sales': PrefixSums(codes, self.purchase, np.column_stack([
+                self.items['price'].to_numpy(dtype='float64'), first])),
+            'deliveries': PrefixSums(codes, self.delivery, np.column_stack([
+                ~np.isnan(self.delay), np.nan_to_num(self.delay),
+                ~np.isnan(self.wait), np.nan_to_num(self.wait)])),
+            'reviews': PrefixSums(reviews['code'], reviews['time'], reviews[[
+                'score', 'one_star', 'five_star', 'cost']].to_numpy()),
+        }
+
+
+    def _aggregates(self, key: str, events: dict) -> pd.DataFrame:
+        """
+        Return the aggregates of the entity of each (order_id, entity) pair
+        from the events strictly before the purchase of the order
+        """
+        first = events['first']
+        codes = events['codes'][first]
+        # events from the beginning to the purchase, excluded
+        # (an order without purchase time has no event before it)
+        ends = to_seconds(self.purchase[first])
+        ends = np.where(np.isnat(self.purchase[first].to_numpy()), FIRST_SECOND, ends)
+        starts = np.full(len(ends), FIRST_SECOND)
+
+        quantity, sales = events['sales'].sums(codes, starts, ends)
+        delivered, deliveries = events['deliveries'].sums(codes, starts, ends)
+        reviews, review_sums = events['reviews'].sums(codes, starts, ends)
+
+        df = pd.DataFrame({
+            'order_id': self.items['order_id'][first].to_numpy(),
+            key: events['entities'].take(codes),
+            'n_orders': sales[:, 1].astype('int64'),
+            'quantity': quantity,
+            'sales': sales[:, 0],
+        })
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # means of the past events, NaN without events
+            delay = deliveries[:, 1] / deliveries[:, 0]
+            df['delay_to_carrier'] = np.where(
+                delivered > 0, np.where(delay > 0, delay, 0), np.nan)
+            df['wait_time'] = deliveries[:, 3] / deliveries[:, 2]
+            df['review_score'] = review_sums[:, 0] / reviews
+            df['share_of_one_stars'] = review_sums[:, 1] / reviews
+            df['share_of_five_stars'] = review_sums[:, 2] / reviews
+        df['cost_of_reviews'] = review_sums[:, 3]
+        return df
+
+
+    def sellers(self) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with the following columns:
+        order_id, seller_id, n_orders, quantity, sales, delay_to_carrier,
+        wait_time, review_score, share_of_one_stars, share_of_five_stars,
+        cost_of_reviews
+        one row per distinct (order_id, seller_id) of the order items,
+        the aggregates of the seller strictly before the purchase of the order
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        return self._aggregates('seller_id', self.seller_events)
+
+
+    def products(self) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with the following columns:
+        order_id, product_id, n_orders, quantity, sales, price, wait_time,
+        review_score, share_of_one_stars, share_of_five_stars, cost_of_reviews
+        one row per distinct (order_id, product_id) of the order items,
+        the aggregates of the product strictly before the purchase of the order
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        df = self._aggregates('product_id', self.product_events)\
+            .drop(columns='delay_to_carrier')
+        df.insert(5, 'price', df['sales'] / df['quantity'].replace(0, np.nan))
+        return df
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+def main():
+    print("The library asof.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
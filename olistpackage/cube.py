@@ -0,0 +1,313 @@
+import os
+import numpy as np
+import pandas as pd
+
+from olistpackage.session import Session
+from olistpackage.incremental import REVIEW_COSTS
+
+
+# dimensions of the cells of the cube
+DIMENSIONS = ['category', 'seller_state', 'customer_state', 'month']
+
+# mergeable measures of each cell, summed by the roll-ups
+MEASURES = [
+    # items (Product.get_quantity, Product.get_sales), n_orders counts
+    # the distinct (order_id, product_id) pairs like the sum of
+    # the n_orders of the products
+    'quantity',
+    'n_orders',
+    'sales',
+    'freight_value',
+    # items of delivered orders (Product.get_wait_time)
+    'wait_sum',
+    'wait_count',
+    # reviews of the orders of the products (Product.get_review_score)
+    'reviews',
+    'one_stars',
+    'five_stars',
+    'score_sum',
+    'cost_of_reviews',
+]
+
+# means computed from the sums of the roll-ups, weighted by the items or
+# the reviews: named weighted_<column> to be told apart from the means
+# over the products of Product.get_product_cat
+WEIGHTED_MEANS = ['weighted_wait_time', 'weighted_price',
+                  'weighted_share_of_one_stars', 'weighted_share_of_five_stars',
+                  'weighted_review_score']
+
+# columns of ProductCube.product_cat for each agg
+PRODUCT_CAT_COLUMNS = {
+    'mean': WEIGHTED_MEANS + ['quantity'],
+    'sum': ['n_orders', 'quantity', 'sales', 'cost_of_reviews',
+            'revenues', 'profits'],
+}
+
+
+class ProductCube:
+    """
+    Materialized aggregation cube of the order items: the sums and counts
+    of MEASURES for each (category, seller_state, customer_state, month)
+    cell, month being the month of order_purchase_timestamp.
+    The cube is built once, in one pass over the order items,
+    then the roll-ups over any dimensions sum the cells
+    (a few thousand rows) instead of running Product.get_training_data.
+
+    Product.get_product_cat only sums the products of
+    Product.get_training_data, which have a delivered order: on the same
+    products, the sums of ProductCube.product_cat(agg="sum") are equal.
+    The means are computed from the sums and counts, so they are weighted
+    by the items (wait_time, price) or the reviews (review_score, shares)
+    of the slice, and not averaged over the products like
+    Product.get_product_cat: they are named weighted_<column>
+    (WEIGHTED_MEANS). Medians are not mergeable: use
+    Product.get_product_cat(agg="median") for them.
+
+    The items without seller_state, customer_state or month (unknown
+    seller or customer, no purchase time) are kept in cells with a missing
+    value of the dimension: the totals of the cube are the ones of the
+    order items.
+
+    cube = ProductCube.from_session(session)
+    cube.rollup(['customer_state', 'month'], filters={'category': 'toys'})
+    """
+
+    def __init__(self, cells: pd.DataFrame = None):
+        """
+        :param cells: the cells, a DataFrame with the columns
+        DIMENSIONS + MEASURES, defaults to an empty cube
+        :type cells: pd.DataFrame
+        """
+        if cells is None:
+            cells = pd.DataFrame(columns=DIMENSIONS + MEASURES)
+        self.cells = cells
+
+
+    @classmethod
+    def from_session(cls, session: Session = None) -> "ProductCube":
+        """
+        Build the cube from all the order items of a session
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        :return: the cube
+        :rtype: ProductCube
+        """
+        session = session if session is not None else Session.default()
+        data = session.source_data
+
+        # one row per order: purchase month, customer_state, wait_time
+        orders = data['orders'][['order_id', 'customer_id', 'order_status',
+                                 'order_purchase_timestamp',
+                                 'order_delivered_customer_date']]
+        orders = orders.merge(data['customers'][['customer_id', 'customer_state']],
+                              on='customer_id', how='left')
+        orders['month'] = orders['order_purchase_timestamp'].dt.to_period('M')\
+            .dt.to_timestamp()
+        wait = (orders['order_delivered_customer_date'] -
+                orders['order_purchase_timestamp']) / np.timedelta64(24, 'h')
+        orders['wait'] = wait.where(orders['order_status'] == 'delivered')
+
+        # one row per order: its reviews (Order.get_review_score)
+        reviews = data['order_reviews'][['order_id', 'review_score']]
+        reviews = reviews.assign(
+            review_score=reviews['review_score'].astype('float64'),
+            one_star=(reviews['review_score'] == 1) * 1,
+            five_star=(reviews['review_score'] == 5) * 1,
+            cost=reviews['review_score'].map(REVIEW_COSTS))
+        reviews = reviews.groupby('order_id', observed=True).agg(
+            reviews=('review_score', 'size'),
+            one_stars=('one_star', 'sum'),
+            five_stars=('five_star', 'sum'),
+            score_sum=('review_score', 'sum'),
+            cost_of_reviews=('cost', 'sum')).reset_index()
+
+        # categories in English, like Product.get_product_features
+        categories = data['products'][['product_id', 'product_category_name']]\
+            .merge(data['product_category_name_translation'],
+                   on='product_category_name')\
+            .rename(columns={'product_category_name_english': 'category'})
+
+        # the pass over the order items: the attributes of their product,
+        # seller and order are looked up by position, the items without
+        # category or order are left out, like with an inner merge
+        items = data['order_items']
+        product = pd.Index(categories['product_id']).get_indexer(items['product_id'])
+        order = pd.Index(orders['order_id']).get_indexer(items['order_id'])
+        kept = (product >= 0) & (order >= 0)
+        items = items.loc[kept, ['order_id', 'product_id', 'seller_id',
+                                 'price', 'freight_value']].reset_index(drop=True)
+        product, order = product[kept], order[kept]
+        seller = pd.Index(data['sellers']['seller_id']).get_indexer(items['seller_id'])
+        review = pd.Index(reviews['order_id']).get_indexer(items['order_id'])
+
+        items['category'] = categories['category'].array.take(product)
+        items['seller_state'] = data['sellers']['seller_state'].array\
+            .take(seller, allow_fill=True)
+        for column in ['customer_state', 'month', 'wait']:
+            items[column] = orders[column].array.take(order)
+
+        # the order counts and the reviews are counted once per
+        # (order_id, product_id) pair, on its first item
+        first = ~items.duplicated(['order_id', 'product_id']).to_numpy()
+        for column in ['reviews', 'one_stars', 'five_stars', 'score_sum',
+                       'cost_of_reviews']:
+            values = reviews[column].to_numpy(dtype='float64')
+            items[column] = np.where(first & (review >= 0), values[review], 0)
+        items['quantity'] = 1
+        items['n_orders'] = first * 1
+        items['sales'] = items['price']
+        items['wait_sum'] = items['wait'].fillna(0)
+        items['wait_count'] = items['wait'].notna() * 1
+
+        cells = items.groupby(DIMENSIONS, observed=True, dropna=False)\
+            [MEASURES].sum()
+        return cls(cells.reset_index())
+
+
+    def merge(self, other: "ProductCube") -> "ProductCube":
+        """
+        Return the cube of the order items of two cubes,
+        e.g. of two partitions of the orders
+        :param other: a cube of other orders
+        :type other: ProductCube
+        :return: a new cube
+        :rtype: ProductCube
+        """
+        cells = [c for c in (self.cells, other.cells) if not c.empty]
+        if not cells:
+            return ProductCube()
+        cells = pd.concat(cells, ignore_index=True)
+        for dimension in ['category', 'seller_state', 'customer_state']:
+            cells[dimension] = cells[dimension].astype(object)
+        cells = cells.groupby(DIMENSIONS, observed=True, dropna=False)\
+            [MEASURES].sum()
+        return ProductCube(cells.reset_index())
+
+
+    def select(self, filters: dict = None) -> pd.DataFrame:
+        """
+        Return the cells of a slice of the cube
+        :param filters: dimension -> a value or a Python list of values,
+        or for month a (first, last) tuple of months, e.g.
+        {'customer_state': ['SP', 'RJ'], 'month': ('2017-01', '2017-12')}
+        :type filters: dict
+        :return: the cells
+        :rtype: pd.DataFrame
+        """
+        cells = self.cells
+        mask = np.ones(len(cells), dtype=bool)
+        for dimension, values in (filters or {}).items():
+            if dimension not in DIMENSIONS:
+                raise ValueError(f"unknown dimension {dimension}, "
+                                 f"the dimensions are {DIMENSIONS}")
+            if dimension == 'month' and isinstance(values, tuple):
+                first, last = (pd.Timestamp(value) for value in values)
+                mask &= cells['month'].between(first, last).to_numpy()
+                continue
+            if isinstance(values, (str, pd.Timestamp)) or np.isscalar(values):
+                values = [values]
+            if dimension == 'month':
+                values = [pd.Timestamp(value) for value in values]
+            mask &= cells[dimension].isin(values).to_numpy()
+        return cells[mask]
+
+
+    def rollup(self,
+               dimensions: list = (),
+               filters: dict = None) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with the dimensions as index, the sums of
+        MEASURES and the following columns computed from them:
+        weighted_wait_time, weighted_price, weighted_share_of_one_stars,
+        weighted_share_of_five_stars, weighted_review_score, revenues, profits
+        :param dimensions: the dimensions to group by, a single row
+        without index name if empty
+        :type dimensions: list
+        :param filters: the slice of the cube, see ProductCube.select
+        :type filters: dict
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        cells = self.select(filters)
+        if dimensions:
+            df = cells.groupby(list(dimensions), observed=True, dropna=False)\
+                [MEASURES].sum()
+        else:
+            df = cells[MEASURES].sum().to_frame().T
+
+        # means of the slices, NaN without items or reviews
+        df['weighted_wait_time'] = df['wait_sum'] / df['wait_count'].replace(0, np.nan)
+        df['weighted_price'] = df['sales'] / df['quantity'].replace(0, np.nan)
+        reviews = df['reviews'].replace(0, np.nan)
+        df['weighted_share_of_one_stars'] = df['one_stars'] / reviews
+        df['weighted_share_of_five_stars'] = df['five_stars'] / reviews
+        df['weighted_review_score'] = df['score_sum'] / reviews
+
+        # compute the economics, like Product.get_training_data
+        olist_sales_cut = 0.1
+        df['revenues'] = olist_sales_cut * df['sales']
+        df['profits'] = df['revenues'] - df['cost_of_reviews']
+        return df
+
+
+    def product_cat(self,
+                    agg: str = "mean",
+                    filters: dict = None) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with category as index, like
+        Product.get_product_cat, on a slice of the cube:
+        - agg="mean": the WEIGHTED_MEANS, which differ from the means
+        of Product.get_product_cat, and quantity
+        - agg="sum": n_orders, quantity, sales, cost_of_reviews,
+        revenues, profits
+        :param agg: "mean" or "sum"
+        :type agg: str
+        :param filters: the slice of the cube, see ProductCube.select
+        :type filters: dict
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        if agg not in PRODUCT_CAT_COLUMNS:
+            raise ValueError(f"the cube holds sums and counts only, agg must be "
+                             f"one of {list(PRODUCT_CAT_COLUMNS)}, not {agg}")
+        return self.rollup(['category'], filters)[PRODUCT_CAT_COLUMNS[agg]]
+
+
+    def save(self, path: str) -> None:
+        """
+        Save the cells in a parquet file
+        :param path: path of the parquet file
+        :type path: str
+        :return: None
+        """
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.cells.to_parquet(path)
+
+
+    @classmethod
+    def load(cls, path: str) -> "ProductCube":
+        """
+        Load the cells saved by ProductCube.save
+        :param path: path of the parquet file
+        :type path: str
+        :return: the cube
+        :rtype: ProductCube
+        """
+        return cls(pd.read_parquet(path))
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+def main():
+    print("The library cube.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,244 @@
 import os
+import json
+import time
+import hashlib
 import pandas as pd
 import opendatasets
 import shutil
+import threading
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+
+from olistpackage.profiling import profiled, in_thread
+
+
+# dtype schema of each Olist table, applied by Olist.get_data()
+# - "category": hex ids and low-cardinality strings, loaded as categoricals
+# - "integer" / "float": numeric columns, downcast to the narrowest dtype
+#   which holds every value exactly
+# - "datetime": timestamps, parsed once to datetime64 with DATETIME_FORMAT
+# columns which are not listed (e.g. free text) are left as read by pandas
+SCHEMA = {
+    "customers": {
+        "customer_id": "category",
+        "customer_unique_id": "category",
+        "customer_zip_code_prefix": "integer",
+        "customer_city": "category",
+        "customer_state": "category",
+    },
+    "geolocation": {
+        "geolocation_zip_code_prefix": "integer",
+        "geolocation_lat": "float",
+        "geolocation_lng": "float",
+        "geolocation_city": "category",
+        "geolocation_state": "category",
+    },
+    "order_items": {
+        "order_id": "category",
+        "order_item_id": "integer",
+        "product_id": "category",
+        "seller_id": "category",
+        "shipping_limit_date": "datetime",
+        "price": "float",
+        "freight_value": "float",
+    },
+    "order_payments": {
+        "order_id": "category",
+        "payment_sequential": "integer",
+        "payment_type": "category",
+        "payment_installments": "integer",
+        "payment_value": "float",
+    },
+    "order_reviews": {
+        "order_id": "category",
+        "review_score": "integer",
+        "review_creation_date": "datetime",
+        "review_answer_timestamp": "datetime",
+    },
+    "orders": {
+        "order_id": "category",
+        "customer_id": "category",
+        "order_status": "category",
+        "order_purchase_timestamp": "datetime",
+        "order_approved_at": "datetime",
+        "order_delivered_carrier_date": "datetime",
+        "order_delivered_customer_date": "datetime",
+        "order_estimated_delivery_date": "datetime",
+    },
+    "products": {
+        "product_id": "category",
+        "product_category_name": "category",
+        "product_name_lenght": "float",
+        "product_description_lenght": "float",
+        "product_photos_qty": "float",
+        "product_weight_g": "float",
+        "product_length_cm": "float",
+        "product_height_cm": "float",
+        "product_width_cm": "float",
+    },
+    "sellers": {
+        "seller_id": "category",
+        "seller_zip_code_prefix": "integer",
+        "seller_city": "category",
+        "seller_state": "category",
+    },
+    "product_category_name_translation": {
+        "product_category_name": "category",
+        "product_category_name_english": "category",
+    },
+}
+
+# format of every timestamp of the Olist csv files, e.g. "2017-10-02 10:56:33"
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def downcast(column: pd.Series, kind: str) -> pd.Series:
+    """
+    Downcast a numeric column to the narrowest dtype of the given kind
+    which holds every value of the column exactly
+    :param column: the column to downcast
+    :type column: pd.Series
+    :param kind: "integer" or "float"
+    :type kind: str
+    :return: the downcasted column
+    :rtype: pd.Series
+    """
+    if kind == "integer":
+        return pd.to_numeric(column, downcast="integer")
+    # pd.to_numeric(downcast="float") may round values to float32,
+    # only keep float32 if the round trip is exact
+    float32_column = column.astype("float32")
+    if float32_column.astype(column.dtype).equals(column):
+        return float32_column
+    return column
+
+
+def apply_schema(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """
+    Apply the dtypes from SCHEMA to a DataFrame of the Olist table "key"
+    :param df: a DataFrame read from an Olist csv file
+    :type df: pd.DataFrame
+    :param key: name of the table, e.g. "orders"
+    :type key: str
+    :return: the DataFrame with categorical, datetime and downcasted columns
+    :rtype: pd.DataFrame
+    """
+    for column, kind in SCHEMA.get(key, {}).items():
+        if column not in df.columns:
+            continue
+        if kind == "category":
+            df[column] = df[column].astype("category")
+        elif kind == "datetime":
+            # an explicit format skips the format inference of each value
+            if not pd.api.types.is_datetime64_any_dtype(df[column]):
+                df[column] = pd.to_datetime(df[column], format=DATETIME_FORMAT)
+        elif pd.api.types.is_numeric_dtype(df[column]):
+            df[column] = downcast(df[column], kind)
+    return df
+
+
+def read_csv(path: str, key: str, columns: list = None) -> pd.DataFrame:
+    """
+    Read a csv file of the Olist table "key" with the dtypes from SCHEMA
+    :param path: path of the csv file
+    :type path: str
+    :param key: name of the table, e.g. "orders"
+    :type key: str
+    :param columns: the columns to read, all the columns if None:
+    the other columns are skipped by the parser
+    :type columns: list
+    :return: the DataFrame of the table
+    :rtype: pd.DataFrame
+    """
+    # parse the categorical columns directly as categoricals
+    # then downcast the numeric columns
+    return apply_schema(
+        pd.read_csv(path, dtype=category_dtypes(key), usecols=columns), key)
+
+
+def iter_csv(path: str, key: str, chunksize: int = 100_000):
+    """
+    Read a csv file of the Olist table "key" in chunks of rows,
+    with the dtypes from SCHEMA, without reading the whole file in memory
+    :param path: path of the csv file
+    :type path: str
+    :param key: name of the table, e.g. "orders"
+    :type key: str
+    :param chunksize: number of rows per chunk
+    :type chunksize: int
+    :return: an iterator of DataFrames
+    """
+    with pd.read_csv(path, dtype=category_dtypes(key),
+                     chunksize=chunksize) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk, key)
+
+
+def category_dtypes(key: str) -> dict:
+    """
+    Return the dtype argument of pd.read_csv
+    for the categorical columns of the table "key"
+    :rtype: dict
+    """
+    return {
+        column: "category"
+        for column, kind in SCHEMA.get(key, {}).items()
+        if kind == "category"
+    }
+
+
+# Parquet cache of the tables, see Olist.read_table()
+# bump CACHE_VERSION to invalidate every cached table
+CACHE_VERSION = 1
+CACHE_COMPRESSION = "zstd"
+
+
+def file_hash(path: str) -> str:
+    """
+    Return the sha1 hex digest of the content of a file
+    :param path: path of the file
+    :type path: str
+    :return: the sha1 hex digest
+    :rtype: str
+    """
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(2**20), b""):
+            sha1.update(block)
+    return sha1.hexdigest()
+
+
+def schema_hash(key: str) -> str:
+    """
+    Return a hash of the SCHEMA of the table "key" and of CACHE_VERSION,
+    a cached table built with another schema is stale
+    :param key: name of the table, e.g. "orders"
+    :type key: str
+    :return: the sha1 hex digest
+    :rtype: str
+    """
+    schema = json.dumps([CACHE_VERSION, SCHEMA.get(key, {})], sort_keys=True)
+    return hashlib.sha1(schema.encode()).hexdigest()
+
 
 class Olist:
     """
     A class to access the Olist dataset version 2 from www.kaggle.com
     """
 
+    def __init__(self, data_path: str = None):
+        """
+        Attribute "read_times" : dict of the duration of the last
+        read_table call of each table, in seconds
+        :param data_path: directory of the csv and cache directories,
+        defaults to root/data; e.g. a dataset from synthetic.generate
+        :type data_path: str
+        """
+        self.data_path = data_path if data_path is not None else \
+            os.path.join(self.root_absolute_path(), "data")
+        self.read_times = {}
+
+
     def root_absolute_path(self) -> str:
         """
         return the absolute path of the root directory
@@ -21,14 +252,12 @@ class Olist:
     def csv_path(self) -> str:
         """
         return the absolute path of the olist csv files directory
-        which is root/data/csv
+        which is root/data/csv by default
         :return: the absolute path of the directory
         :rtype: str
         """
-        # absolute path of the root directory
-        root_dir = self.root_absolute_path()
         # absolute path of the olist csv files directory
-        return os.path.join(root_dir, "data", "csv")
+        return os.path.join(os.path.abspath(self.data_path), "csv")
 
 
     def csv_files_exist(self) -> bool:
@@ -105,29 +334,313 @@ class Olist:
         print("The Olist csv files are downloaded.")
 
 
-    def get_data(self) -> dict:
+    def csv_files(self) -> dict:
         """
-        Transfert the csv files from brazilian-ecommerce directory
-        into a dictionary of dataframes
-        :return: a Python dict of pandas dataframes from the Olist csv files
+        Return the csv files names from the root/data/csv directory
+        :return: a Python dict with table names as keys, e.g. "orders",
+        and csv files names as values, e.g. "olist_orders_dataset.csv"
         :rtype: dict
         """
-        # get the absolute path of the csv files directory
-        csv_path = self.csv_path()
-
-        # get the csv files names and store them in a dictionary
-        file_names = [file for file in os.listdir(csv_path) if file.endswith(".csv")]
+        file_names = [
+            file for file in os.listdir(self.csv_path()) if file.endswith(".csv")
+        ]
         key_names = [
             key_name.replace("olist_", "").replace("_dataset", "").replace(".csv", "")
             for key_name in file_names
         ]
+        return dict(zip(key_names, file_names))
+
 
-        # Read the csv files into pandas dataframes and store them in a dictionary
-        data = {
-            k: pd.read_csv(os.path.join(csv_path, f))
-            for k, f in zip(key_names, file_names)
+    def cache_path(self) -> str:
+        """
+        return the absolute path of the parquet cache directory
+        which is root/data/cache by default
+        :return: the absolute path of the directory
+        :rtype: str
+        """
+        return os.path.join(os.path.abspath(self.data_path), "cache")
+
+
+    def csv_fingerprint(self, key: str, with_hash: bool = True) -> dict:
+        """
+        Return the fingerprint of the csv file of the table "key"
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :param with_hash: if True, include the sha1 of the file content
+        :type with_hash: bool
+        :return: a Python dict with the keys file, size, mtime_ns
+        and sha1 (only if with_hash is True)
+        :rtype: dict
+        """
+        file_name = self.csv_files()[key]
+        path = os.path.join(self.csv_path(), file_name)
+        stat = os.stat(path)
+        fingerprint = {
+            "file": file_name,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
         }
-        return data
+        if with_hash:
+            fingerprint["sha1"] = file_hash(path)
+        return fingerprint
+
+
+    def fingerprint(self, with_hash: bool = False) -> str:
+        """
+        Return the fingerprint of the whole dataset,
+        which changes when any csv file changes
+        :param with_hash: if True, use the content hash of the csv files,
+        else their sizes and mtimes only (much faster)
+        :type with_hash: bool
+        :return: a sha1 hex digest
+        :rtype: str
+        """
+        fingerprints = [
+            self.csv_fingerprint(key, with_hash)
+            for key in sorted(self.csv_files())
+        ]
+        if with_hash:
+            # the mtime does not matter when the content is known
+            for fingerprint in fingerprints:
+                del fingerprint["mtime_ns"]
+        content = json.dumps(fingerprints, sort_keys=True)
+        return hashlib.sha1(content.encode()).hexdigest()
+
+
+    def cache_file(self, key: str):
+        """
+        Return the path of the parquet cache of the table "key".
+        The cache is stale if the schema changed, or if the size, the mtime
+        or the content hash of the csv file changed.
+        A csv file which is touched but whose content is unchanged
+        keeps its cache: only its fingerprint is updated.
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :return: the path of the parquet file, or None if missing or stale
+        :rtype: str or None
+        """
+        parquet_path = os.path.join(self.cache_path(), f"{key}.parquet")
+        manifest_path = os.path.join(self.cache_path(), f"{key}.json")
+        if not (os.path.exists(parquet_path) and os.path.exists(manifest_path)):
+            return None
+
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest.get("schema") != schema_hash(key):
+            return None
+
+        cached = manifest["fingerprint"]
+        fingerprint = self.csv_fingerprint(key, with_hash=False)
+        if (fingerprint["size"], fingerprint["mtime_ns"]) != \
+                (cached["size"], cached["mtime_ns"]):
+            if fingerprint["size"] != cached["size"]:
+                return None
+            # same size but another mtime: compare the content
+            fingerprint = self.csv_fingerprint(key)
+            if fingerprint["sha1"] != cached["sha1"]:
+                return None
+            manifest["fingerprint"] = fingerprint
+            self._write_json(manifest_path, manifest)
+
+        return parquet_path
+
+
+    def read_cache(self, key: str, columns: list = None):
+        """
+        Read the table "key" from the parquet cache, see cache_file
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :param columns: the columns to read, all the columns if None
+        :type columns: list
+        :return: the cached DataFrame, or None if missing or stale
+        :rtype: pd.DataFrame or None
+        """
+        parquet_path = self.cache_file(key)
+        if parquet_path is None:
+            return None
+        return pd.read_parquet(parquet_path, columns=columns)
+
+
+    def write_cache(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Write the table "key" in the parquet cache,
+        along with the fingerprint of its csv file
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :param df: the DataFrame of the table, with the dtypes from SCHEMA
+        :type df: pd.DataFrame
+        :return: None
+        """
+        os.makedirs(self.cache_path(), exist_ok=True)
+        fingerprint = self.csv_fingerprint(key)
+        parquet_path = os.path.join(self.cache_path(), f"{key}.parquet")
+        # write in a temporary file first, so that a reader
+        # never sees a partially written cache
+        tmp_path = f"{parquet_path}.{os.getpid()}.tmp"
+        df.to_parquet(tmp_path, compression=CACHE_COMPRESSION, index=False)
+        os.replace(tmp_path, parquet_path)
+        self._write_json(
+            os.path.join(self.cache_path(), f"{key}.json"),
+            {"schema": schema_hash(key), "fingerprint": fingerprint})
+
+
+    def clear_cache(self) -> None:
+        """
+        Delete the root/data/cache directory
+        :return: None
+        """
+        if os.path.exists(self.cache_path()):
+            shutil.rmtree(self.cache_path())
+
+
+    @profiled("key")
+    def read_table(self,
+                   key: str,
+                   optimize_dtypes: bool = True,
+                   use_cache: bool = True,
+                   columns: list = None) -> pd.DataFrame:
+        """
+        Read one Olist csv file into a DataFrame
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :param optimize_dtypes: if True, apply the dtypes from SCHEMA
+        :type optimize_dtypes: bool
+        :param use_cache: if True, read the table from the parquet cache
+        when it is up to date, else parse the csv file and write the cache
+        (only with optimize_dtypes)
+        :type use_cache: bool
+        :param columns: the columns to read, all the columns if None.
+        The cache is only written when all the columns are read
+        :type columns: list
+        :return: a DataFrame of the Olist table
+        :rtype: pd.DataFrame
+        """
+        start = time.perf_counter()
+        path = os.path.join(self.csv_path(), self.csv_files()[key])
+        if not optimize_dtypes:
+            df = pd.read_csv(path, usecols=columns)
+        else:
+            df = self.read_cache(key, columns) if use_cache else None
+            if df is None:
+                df = read_csv(path, key, columns)
+                if use_cache and columns is None:
+                    self.write_cache(key, df)
+
+        self.read_times[key] = time.perf_counter() - start
+        return df
+
+
+    @profiled()
+    def get_data(self,
+                 optimize_dtypes: bool = True,
+                 use_cache: bool = True,
+                 lazy: bool = False,
+                 n_jobs: int = 1,
+                 columns: dict = None) -> dict:
+        """
+        Transfert the csv files from brazilian-ecommerce directory
+        into a dictionary of dataframes
+        :param optimize_dtypes: if True, load the strings as categoricals and
+        downcast the numeric columns (see SCHEMA)
+        :type optimize_dtypes: bool
+        :param use_cache: if True, use the parquet cache of root/data/cache
+        (see read_table)
+        :type use_cache: bool
+        :param lazy: if True, return a LazyData mapping which reads each table
+        the first time its key is accessed
+        :type lazy: bool
+        :param n_jobs: number of tables read at the same time, by a pool of
+        threads (the csv parser and the parquet reader release the GIL).
+        The duration of each read is kept in self.read_times
+        :type n_jobs: int
+        :param columns: the columns to read of some tables, e.g.
+        {"orders": ["order_id", "order_status"]} (see
+        features.required_columns), the other tables are read entirely
+        :type columns: dict
+        :return: a Python dict of pandas dataframes from the Olist csv files
+        :rtype: dict
+        """
+        if lazy:
+            return LazyData(self, optimize_dtypes, use_cache, columns)
+
+        keys = list(self.csv_files())
+        columns = columns if columns is not None else {}
+        if n_jobs <= 1:
+            # Read the csv files into pandas dataframes and store them in a dictionary
+            return {k: self.read_table(k, optimize_dtypes, use_cache, columns.get(k))
+                    for k in keys}
+
+        # start with the largest files, so that the last file to finish
+        # is not a large one started late
+        paths = {k: os.path.join(self.csv_path(), f)
+                 for k, f in self.csv_files().items()}
+        largest_first = sorted(keys, key=lambda k: -os.path.getsize(paths[k]))
+        read_table = in_thread(self.read_table)
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            futures = {
+                k: executor.submit(read_table, k, optimize_dtypes, use_cache,
+                                   columns.get(k))
+                for k in largest_first
+            }
+            # same keys, in the same order as the sequential read
+            return {k: futures[k].result() for k in keys}
+
+
+    def time_get_data(self, n_jobs: int = 1) -> dict:
+        """
+        Measure a cold load (the cache is cleared, the csv files are parsed
+        and the cache is written) then a warm load (read from the cache)
+        :param n_jobs: see get_data
+        :type n_jobs: int
+        :return: a Python dict with the keys cold and warm,
+        and the durations of get_data in seconds as values,
+        and the key cold_tables with the cold duration of each table
+        :rtype: dict
+        """
+        self.clear_cache()
+        start = time.perf_counter()
+        self.get_data(n_jobs=n_jobs)
+        cold = time.perf_counter() - start
+        cold_tables = dict(self.read_times)
+
+        start = time.perf_counter()
+        self.get_data(n_jobs=n_jobs)
+        warm = time.perf_counter() - start
+        return {"cold": cold, "warm": warm, "cold_tables": cold_tables}
+
+
+    @staticmethod
+    def _write_json(path: str, content: dict) -> None:
+        """
+        Write a Python dict in a json file, atomically
+        """
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(content, f)
+        os.replace(tmp_path, path)
+
+
+    def memory_report(self) -> pd.DataFrame:
+        """
+        Compare the memory footprint of each table
+        before (bare pd.read_csv) and after applying SCHEMA
+        :return: a DataFrame with the following columns:
+        table, rows, memory_before_mb, memory_after_mb, reduction
+        :rtype: pd.DataFrame
+        """
+        rows = []
+        for k in self.csv_files():
+            before = self.read_table(k, optimize_dtypes=False)
+            after = self.read_table(k)
+            rows.append({
+                "table": k,
+                "rows": len(after),
+                "memory_before_mb": before.memory_usage(deep=True).sum() / 2**20,
+                "memory_after_mb": after.memory_usage(deep=True).sum() / 2**20,
+            })
+        report = pd.DataFrame(rows)
+        report["reduction"] = 1 - report["memory_after_mb"] / report["memory_before_mb"]
+        return report
 
 
     def ping(self):
@@ -137,6 +650,103 @@ class Olist:
         return "PONG"
 
 
+class LazyData(Mapping):
+    """
+    A read-only Python dict of the Olist tables
+    which reads a table the first time its key is accessed,
+    then keeps it.
+    Returned by Olist().get_data(lazy=True)
+    """
+
+    def __init__(self,
+                 olist: Olist,
+                 optimize_dtypes: bool = True,
+                 use_cache: bool = True,
+                 columns: dict = None):
+        """
+        :param olist: the Olist instance which reads the tables
+        :type olist: Olist
+        :param optimize_dtypes: see Olist.read_table
+        :type optimize_dtypes: bool
+        :param use_cache: see Olist.read_table
+        :type use_cache: bool
+        :param columns: the columns to read of some tables, see Olist.get_data
+        :type columns: dict
+        """
+        self.olist = olist
+        self.optimize_dtypes = optimize_dtypes
+        self.use_cache = use_cache
+        self.columns = columns if columns is not None else {}
+        self._keys = list(olist.csv_files())
+        self._tables = {}
+        # tables replaced in memory, which differ from the csv files
+        # and from the data cache (see Session.zip_index)
+        self.replaced = set()
+        # one lock per table: concurrent feature methods read a table once,
+        # and different tables at the same time
+        self._locks = {key: threading.Lock() for key in self._keys}
+
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        if key not in self._tables:
+            if key not in self._keys:
+                raise KeyError(key)
+            with self._locks[key]:
+                if key not in self._tables:
+                    self._tables[key] = self.olist.read_table(
+                        key, self.optimize_dtypes, self.use_cache,
+                        self.columns.get(key))
+        return self._tables[key]
+
+
+    def __iter__(self):
+        return iter(self._keys)
+
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+    def __repr__(self) -> str:
+        return f"LazyData(keys={self._keys}, loaded={self.loaded()})"
+
+
+    def replace(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Replace the table "key" by another DataFrame
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :param df: the new DataFrame of the table
+        :type df: pd.DataFrame
+        :return: None
+        """
+        if key not in self._keys:
+            raise KeyError(key)
+        self._tables[key] = df
+        self.replaced.add(key)
+
+
+    def unload(self, keys: list) -> None:
+        """
+        Forget some tables, they are read again the next time they are used
+        :param keys: table names
+        :type keys: list
+        :return: None
+        """
+        for key in keys:
+            self._tables.pop(key, None)
+            self.replaced.discard(key)
+
+
+    def loaded(self) -> list:
+        """
+        Return the keys of the tables already read
+        :return: a Python list of table names
+        :rtype: list
+        """
+        return list(self._tables)
+
+
 def main():
     print("The library data.py has been ran directly.")
 
@@ -0,0 +1,235 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import tempfile
+import pandas as pd
+
+from olistpackage.data import Olist, LazyData
+from olistpackage.session import Session
+
+
+# version of the feature code: bump it when a feature method
+# of Order, Seller or Product changes the content of a training table
+FEATURE_CODE_VERSION = "1"
+
+# training tables of the store, built by Session.<name>().get_training_data()
+TRAINING_TABLES = ("order", "seller", "product")
+
+
+def data_fingerprint(data) -> str:
+    """
+    Return the fingerprint of the input data of the training tables
+    :param data: the tables with the original ids of a session,
+    see Session.source_data
+    :type data: dict
+    :return: a sha1 hex digest
+    :rtype: str
+    """
+    if isinstance(data, LazyData):
+        if not data.replaced:
+            return data.olist.fingerprint()
+        # the csv files, and the content of the tables replaced in memory
+        # (see Session.update_table)
+        keys = sorted(data.replaced)
+        sha1 = hashlib.sha1(data.olist.fingerprint().encode())
+    else:
+        # tables which do not come from the csv files: hash their content
+        keys = sorted(data)
+        sha1 = hashlib.sha1()
+    for key in keys:
+        sha1.update(key.encode())
+        sha1.update(
+            pd.util.hash_pandas_object(data[key], index=False).values.tobytes())
+    return sha1.hexdigest()
+
+
+class FeatureStore:
+    """
+    Versioned on-disk store of the training tables:
+    root/data/feature_store/<name>/<version>/ contains data.parquet
+    and metadata.json. A version is keyed by the fingerprint of the input
+    data and by the version of the feature code.
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: directory of the store,
+        defaults to root/data/feature_store
+        :type path: str
+        """
+        self.path = path if path is not None else os.path.join(
+            Olist().root_absolute_path(), "data", "feature_store")
+
+
+    @staticmethod
+    def version_id(fingerprint: str,
+                   code_version: str = FEATURE_CODE_VERSION) -> str:
+        """
+        Return the version of a training table
+        built by the feature code code_version from the data fingerprint
+        :rtype: str
+        """
+        return f"{code_version}-{fingerprint[:16]}"
+
+
+    def write(self,
+              name: str,
+              df: pd.DataFrame,
+              fingerprint: str,
+              code_version: str = FEATURE_CODE_VERSION) -> str:
+        """
+        Write a training table as a new version. A version is keyed by
+        the data fingerprint and the code version: an existing version
+        is kept, and never modified
+        :param name: name of the training table, e.g. "seller"
+        :type name: str
+        :param df: the training table
+        :type df: pd.DataFrame
+        :param fingerprint: fingerprint of the input data, see data_fingerprint
+        :type fingerprint: str
+        :param code_version: version of the feature code
+        :type code_version: str
+        :return: the version
+        :rtype: str
+        """
+        version = self.version_id(fingerprint, code_version)
+        version_path = os.path.join(self.path, name, version)
+        if os.path.exists(version_path):
+            return version
+        # a temporary directory per writer, process or thread
+        os.makedirs(os.path.join(self.path, name), exist_ok=True)
+        tmp_path = tempfile.mkdtemp(prefix=f"{version}.", suffix=".tmp",
+                                    dir=os.path.join(self.path, name))
+
+        df.to_parquet(os.path.join(tmp_path, "data.parquet"), index=False)
+        with open(os.path.join(tmp_path, "metadata.json"), "w") as f:
+            json.dump({
+                "name": name,
+                "version": version,
+                "data_fingerprint": fingerprint,
+                "code_version": code_version,
+                "created_at": time.time(),
+                "rows": len(df),
+                "columns": list(df.columns),
+            }, f)
+
+        # the complete directory is renamed once: readers see the version
+        # or no version, never a part. The rename fails if another writer
+        # wrote the version first, its version is kept
+        try:
+            os.rename(tmp_path, version_path)
+        except OSError:
+            shutil.rmtree(tmp_path)
+            if not os.path.exists(version_path):
+                raise
+        return version
+
+
+    def versions(self, name: str) -> pd.DataFrame:
+        """
+        List the versions of a training table, from the oldest to the latest
+        :param name: name of the training table, e.g. "seller"
+        :type name: str
+        :return: a DataFrame with the following columns:
+        version, data_fingerprint, code_version, created_at, rows
+        :rtype: pd.DataFrame
+        """
+        columns = ["version", "data_fingerprint", "code_version",
+                   "created_at", "rows"]
+        name_path = os.path.join(self.path, name)
+        metadata = []
+        if os.path.exists(name_path):
+            for version in os.listdir(name_path):
+                metadata_path = os.path.join(name_path, version, "metadata.json")
+                if version.endswith(".tmp") or not os.path.exists(metadata_path):
+                    continue
+                with open(metadata_path) as f:
+                    metadata.append(json.load(f))
+        df = pd.DataFrame(metadata, columns=columns + ["columns", "name"])[columns]
+        df["created_at"] = pd.to_datetime(df["created_at"], unit="s")
+        return df.sort_values(["created_at", "version"]).reset_index(drop=True)
+
+
+    def load(self, name: str, version: str = None) -> pd.DataFrame:
+        """
+        Load a version of a training table
+        :param name: name of the training table, e.g. "seller"
+        :type name: str
+        :param version: the version, defaults to the latest one
+        :type version: str
+        :return: the training table
+        :rtype: pd.DataFrame
+        """
+        if version is None:
+            versions = self.versions(name)
+            if versions.empty:
+                raise KeyError(f"no version of {name!r} in {self.path}")
+            version = versions["version"].iloc[-1]
+        path = os.path.join(self.path, name, version, "data.parquet")
+        if not os.path.exists(path):
+            raise KeyError(f"no version {version!r} of {name!r} in {self.path}")
+        return pd.read_parquet(path)
+
+
+    def prune(self, name: str, keep: int = 1) -> list:
+        """
+        Delete the oldest versions of a training table
+        :param name: name of the training table, e.g. "seller"
+        :type name: str
+        :param keep: number of latest versions to keep
+        :type keep: int
+        :return: the deleted versions
+        :rtype: list
+        """
+        versions = list(self.versions(name)["version"])
+        deleted = versions[:max(len(versions) - keep, 0)]
+        for version in deleted:
+            shutil.rmtree(os.path.join(self.path, name, version))
+        return deleted
+
+
+    def build(self, name: str, session: Session = None) -> str:
+        """
+        Compute a training table from the data of a session and write it
+        :param name: "order", "seller" or "product"
+        :type name: str
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        :return: the version
+        :rtype: str
+        """
+        if name not in TRAINING_TABLES:
+            raise ValueError(f"name must be one of {TRAINING_TABLES}, got {name!r}")
+        session = session if session is not None else Session.default()
+        df = getattr(session, name)().get_training_data()
+        return self.write(name, df, data_fingerprint(session.source_data))
+
+
+    def get(self, name: str, session: Session = None) -> pd.DataFrame:
+        """
+        Return the training table of the data of a session,
+        from the store if it contains the version of this data
+        and of the current feature code, else build it first
+        :param name: "order", "seller" or "product"
+        :type name: str
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        :return: the training table
+        :rtype: pd.DataFrame
+        """
+        session = session if session is not None else Session.default()
+        version = self.version_id(data_fingerprint(session.source_data))
+        try:
+            return self.load(name, version)
+        except KeyError:
+            return self.load(name, self.build(name, session))
+
+
+def main():
+    print("The library feature_store.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
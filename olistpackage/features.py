@@ -0,0 +1,374 @@
+import inspect
+import importlib
+import threading
+import functools
+import contextvars
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from olistpackage import profiling
+from olistpackage.data import SCHEMA
+
+
+# dependency graph of the feature methods of Order, Seller and Product:
+# "Class.method" -> {"tables": [...], "columns": {...}, "depends_on": [...]}
+GRAPH = {}
+
+# modules of the feature methods, registered in GRAPH when imported
+FEATURE_MODULES = ("olistpackage.order", "olistpackage.seller",
+                   "olistpackage.product")
+
+# number of feature methods in progress in this context: only the results
+# of the outermost call are decoded (see Session(encode_ids=True)),
+# the nested calls join the int32 codes
+_depth = contextvars.ContextVar("feature_depth", default=0)
+
+
+def feature(tables: tuple = (), depends_on: tuple = (), ignore: tuple = ()):
+    """
+    Decorator registering a feature method as a node of GRAPH,
+    and caching its results in the FeatureCache of the session of the object
+    :param tables: the tables read by the method and their columns used by
+    the method, e.g. {"orders": ("order_id", "order_status")}, or only the
+    names of the tables, e.g. ("orders",), if the method uses all the columns
+    :type tables: dict
+    :param depends_on: names of the feature methods called by the method,
+    e.g. ("Order.get_review_score",)
+    :type depends_on: tuple
+    :param ignore: names of the arguments which do not change the result,
+    e.g. ("n_jobs",), left out of the cache key
+    :type ignore: tuple
+    :return: the decorator
+    """
+    def decorator(method):
+        name = method.__qualname__
+        GRAPH[name] = {
+            "tables": list(tables),
+            "columns": {table: list(columns) for table, columns in tables.items()}
+            if isinstance(tables, dict) else {},
+            "depends_on": list(depends_on),
+        }
+        signature = inspect.signature(method)
+
+        def arguments(self, *args, **kwargs) -> dict:
+            # the same call with positional, keyword or default arguments
+            # gives the same arguments
+            bound = signature.bind(self, *args, **kwargs)
+            bound.apply_defaults()
+            return {argument: value
+                    for argument, value in list(bound.arguments.items())[1:]
+                    if argument not in ignore}
+
+        def compute(self, *args, **kwargs):
+            # Session(engine="duckdb"): run the SQL query of the method
+            if self.session.sql is not None:
+                return self.session.sql.run(name, arguments(self, *args, **kwargs))
+            return method(self, *args, **kwargs)
+
+        def cached(self, *args, **kwargs):
+            cache = self.session.features
+            if cache is None:
+                return compute(self, *args, **kwargs)
+
+            key = (name, tuple(arguments(self, *args, **kwargs).items()))
+            result = cache.get(key)
+            if result is None:
+                result = compute(self, *args, **kwargs)
+                cache.put(key, result, required_tables(name))
+            # return a copy, so that the caller can modify it
+            return result.copy()
+
+        def decoded(self, *args, **kwargs):
+            ids = self.session.ids
+            if ids is None:
+                return cached(self, *args, **kwargs)
+            depth = _depth.get()
+            token = _depth.set(depth + 1)
+            try:
+                result = cached(self, *args, **kwargs)
+            finally:
+                _depth.reset(token)
+            return ids.decode(result) if depth == 0 else result
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            # disabled instrumentation: a single check of a global variable
+            if profiling.ACTIVE is None:
+                return decoded(self, *args, **kwargs)
+            return profiling.ACTIVE.call(
+                name, lambda: decoded(self, *args, **kwargs),
+                lambda: table_rows(self.session.data, tables))
+
+        return wrapper
+    return decorator
+
+
+def run_blocks(blocks: list, n_jobs: int = 1) -> list:
+    """
+    Call independent feature blocks, e.g. the feature methods merged by
+    a get_training_data method, one after the other or at the same time
+    in a pool of threads (pandas releases the GIL in most of its operations)
+    :param blocks: a Python list of functions without arguments
+    :type blocks: list
+    :param n_jobs: number of blocks called at the same time
+    :type n_jobs: int
+    :return: the results, in the order of blocks whatever the order
+    in which the blocks finish
+    :rtype: list
+    """
+    if n_jobs <= 1:
+        return [block() for block in blocks]
+    # the blocks are profiled as children of the call in progress
+    blocks = [profiling.in_thread(block) for block in blocks]
+    with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+        # each block runs in a copy of this context, see _depth
+        futures = [executor.submit(contextvars.copy_context().run, block)
+                   for block in blocks]
+        return [future.result() for future in futures]
+
+
+def assemble(blocks: list, on: str) -> pd.DataFrame:
+    """
+    Inner join of feature blocks on a key column in one pass: each block is
+    aligned once on the keys present in every block, then the columns are
+    concatenated, instead of a chain of merges which hashes the key and
+    copies the columns joined so far at each merge.
+    Same rows, columns and row order as
+    blocks[0].merge(blocks[1], on=on).merge(blocks[2], on=on)...
+    At most one block may have duplicated keys (e.g. several reviews
+    per order), else the blocks are merged one after the other
+    :param blocks: a Python list of DataFrames with the column "on"
+    :type blocks: list
+    :param on: the key column, e.g. "order_id"
+    :type on: str
+    :return: the joined DataFrame
+    :rtype: pd.DataFrame
+    """
+    duplicated = [i for i, block in enumerate(blocks)
+                  if block[on].duplicated().any()]
+    columns = [c for block in blocks for c in block.columns if c != on]
+    # several blocks with duplicated keys, or columns with the same name
+    # (suffixed by merge): merge the blocks one after the other
+    if len(duplicated) > 1 or len(set(columns)) < len(columns):
+        result = blocks[0]
+        for block in blocks[1:]:
+            result = result.merge(block, on=on)
+        return result
+
+    # the block with duplicated keys gives the rows, else the first block
+    rows = duplicated[0] if duplicated else 0
+    row_keys = blocks[rows][on]
+    # position of each row key in each block, -1 if missing
+    # (one hash table at a time)
+    positions = [np.arange(len(row_keys)) if i == rows
+                 else pd.Index(block[on]).get_indexer(row_keys)
+                 for i, block in enumerate(blocks)]
+    # inner join: keep the keys present in every block
+    found = np.logical_and.reduce([p >= 0 for p in positions])
+    positions = [p[found] for p in positions]
+    if rows != 0:
+        # merge keeps the order of the keys of the first block
+        order = np.argsort(positions[0], kind="stable")
+        positions = [p[order] for p in positions]
+
+    # copy each column once, into the result
+    result = blocks[0].iloc[positions[0]].reset_index(drop=True)
+    for block, p in zip(blocks[1:], positions[1:]):
+        for column in block.columns.drop(on):
+            result[column] = block[column].array.take(p)
+    return result
+
+
+def table_rows(data, tables: list) -> int:
+    """
+    Number of rows of the tables read by a feature method,
+    without reading the tables of a LazyData not read yet
+    """
+    loaded = data.loaded() if hasattr(data, "loaded") else list(data)
+    return sum(len(data[table]) for table in tables if table in loaded)
+
+
+def load_graph() -> dict:
+    """
+    Import the modules of the feature methods, which registers them
+    in GRAPH, whatever modules the caller imported
+    :return: GRAPH
+    :rtype: dict
+    """
+    for module in FEATURE_MODULES:
+        importlib.import_module(module)
+    return GRAPH
+
+
+def dependencies(name: str) -> list:
+    """
+    Return the feature methods called by a feature method, recursively
+    :param name: name of the feature method, e.g. "Seller.get_training_data"
+    :type name: str
+    :return: a Python list of feature method names
+    :rtype: list
+    """
+    result = []
+    for dependency in load_graph()[name]["depends_on"]:
+        for d in [dependency] + dependencies(dependency):
+            if d not in result:
+                result.append(d)
+    return result
+
+
+def required_tables(name: str) -> list:
+    """
+    Return the tables read by a feature method and its dependencies
+    :param name: name of the feature method, e.g. "Seller.get_training_data"
+    :type name: str
+    :return: a sorted Python list of table names
+    :rtype: list
+    """
+    tables = set(load_graph()[name]["tables"])
+    for dependency in dependencies(name):
+        tables.update(GRAPH[dependency]["tables"])
+    return sorted(tables)
+
+
+def required_columns(names: list) -> dict:
+    """
+    Return the columns of the tables read by some feature methods
+    and their dependencies, e.g. to read only these columns
+    (see Olist.get_data and Session(features=...))
+    :param names: names of feature methods, e.g. ["Seller.get_training_data"]
+    :type names: list
+    :return: a Python dict: table name -> list of columns, in the order of
+    SCHEMA; the tables read entirely by a method are not listed
+    :rtype: dict
+    """
+    columns, entire = {}, set()
+    for name in names:
+        for node in [load_graph()[n] for n in [name] + dependencies(name)]:
+            for table in node["tables"]:
+                if table in node["columns"]:
+                    columns.setdefault(table, set()).update(node["columns"][table])
+                else:
+                    entire.add(table)
+
+    def schema_order(table: str, used: set) -> list:
+        schema = list(SCHEMA.get(table, {}))
+        return sorted(used, key=lambda c: (schema.index(c) if c in schema
+                                           else len(schema), c))
+
+    return {table: schema_order(table, used)
+            for table, used in columns.items() if table not in entire}
+
+
+def graph() -> pd.DataFrame:
+    """
+    Return GRAPH as a DataFrame with the following columns:
+    feature, tables, columns, depends_on, required_tables
+    :rtype: pd.DataFrame
+    """
+    return pd.DataFrame([{
+        "feature": name,
+        "tables": node["tables"],
+        "columns": node["columns"],
+        "depends_on": node["depends_on"],
+        "required_tables": required_tables(name),
+    } for name, node in load_graph().items()])
+
+
+class FeatureCache:
+    """
+    In-process cache of the results of the feature methods,
+    keyed by method and arguments, with a memory budget and LRU eviction
+    """
+
+    def __init__(self, max_bytes: int = 512 * 2**20):
+        """
+        :param max_bytes: memory budget of the cached DataFrames, in bytes
+        :type max_bytes: int
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (result, size in bytes, required tables)
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+
+    def get(self, key: tuple):
+        """
+        Return the cached result of the key, or None
+        """
+        with self._lock:
+            if key not in self._entries:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][0]
+
+
+    def put(self, key: tuple, result: pd.DataFrame, tables: list) -> None:
+        """
+        Cache a result, then evict the least recently used results
+        until the cache fits in the memory budget
+        :param key: method name and arguments
+        :type key: tuple
+        :param result: the result of the method
+        :type result: pd.DataFrame
+        :param tables: the tables the result is computed from
+        :type tables: list
+        """
+        size = int(result.memory_usage(deep=True).sum())
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self.nbytes -= self._entries.pop(key)[1]
+            self._entries[key] = (result, size, set(tables))
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                self.nbytes -= self._entries.popitem(last=False)[1][1]
+
+
+    def invalidate(self, tables=None) -> None:
+        """
+        Drop the results computed from some tables
+        :param tables: table names, all the results if None
+        :type tables: list
+        """
+        with self._lock:
+            for key, (_, size, required) in list(self._entries.items()):
+                if tables is None or required.intersection(tables):
+                    del self._entries[key]
+                    self.nbytes -= size
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def info(self) -> dict:
+        """
+        Return the statistics of the cache
+        :return: a Python dict with the keys
+        entries, nbytes, max_bytes, hits, misses
+        :rtype: dict
+        """
+        return {
+            "entries": len(self),
+            "nbytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+def main():
+    print("The library features.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
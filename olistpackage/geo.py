@@ -0,0 +1,293 @@
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from olistpackage.data import Olist
+
+
+# same mean Earth radius as the haversine librairy
+AVG_EARTH_RADIUS_KM = 6371.0088
+
+# parquet schema metadata of DistanceCache: the ZipIndex.key of the distances
+DISTANCE_KEY = b"zip_index_key"
+
+
+def haversine_np(lat1, lng1, lat2, lng2) -> np.ndarray:
+    """
+    Vectorized great-circle distance, in kilometers,
+    between (lat1, lng1) and (lat2, lng2) in degrees.
+    Gives the same results as haversine.haversine((lat1, lng1), (lat2, lng2))
+    :param lat1, lng1, lat2, lng2: array-like of coordinates in degrees
+    :return: a numpy array of distances in km
+    :rtype: np.ndarray
+    """
+    lat1, lng1, lat2, lng2 = (
+        np.radians(np.asarray(a, dtype=np.float64))
+        for a in (lat1, lng1, lat2, lng2))
+    lat = lat2 - lat1
+    lng = lng2 - lng1
+    d = np.sin(lat * 0.5)**2 + np.cos(lat1) * np.cos(lat2) * np.sin(lng * 0.5)**2
+    return 2 * AVG_EARTH_RADIUS_KM * np.arcsin(np.sqrt(d))
+
+
+class ZipIndex:
+    """
+    Coordinates of each geolocation zip code prefix:
+    a sorted array of the prefixes and float32 arrays of their lat and lng,
+    looked up with np.searchsorted instead of DataFrame merges
+    """
+
+    # how the multiple (lat, lng) of one zip code prefix are aggregated
+    AGGREGATIONS = ("first", "mean", "median")
+
+    def __init__(self,
+                 prefixes: np.ndarray,
+                 lat: np.ndarray,
+                 lng: np.ndarray,
+                 agg: str = "first"):
+        """
+        :param prefixes: sorted array of unique zip code prefixes
+        :type prefixes: np.ndarray
+        :param lat: latitude of each prefix
+        :type lat: np.ndarray
+        :param lng: longitude of each prefix
+        :type lng: np.ndarray
+        :param agg: aggregation used to build the coordinates
+        :type agg: str
+        """
+        self.prefixes = np.asarray(prefixes, dtype=np.int32)
+        self.lat = np.asarray(lat, dtype=np.float32)
+        self.lng = np.asarray(lng, dtype=np.float32)
+        self.agg = agg
+
+
+    @classmethod
+    def from_geolocation(cls,
+                         geolocation: pd.DataFrame,
+                         agg: str = "first") -> "ZipIndex":
+        """
+        Build the index from the geolocation table
+        :param geolocation: the geolocation DataFrame
+        :type geolocation: pd.DataFrame
+        :param agg: "first", "mean" or "median"
+        :type agg: str
+        :return: the index
+        :rtype: ZipIndex
+        """
+        if agg not in cls.AGGREGATIONS:
+            raise ValueError(f"agg must be one of {cls.AGGREGATIONS}, got {agg!r}")
+        # groupby sorts the zip code prefixes
+        coordinates = geolocation.groupby('geolocation_zip_code_prefix')\
+            [['geolocation_lat', 'geolocation_lng']].agg(agg)
+        return cls(coordinates.index.to_numpy(),
+                   coordinates['geolocation_lat'].to_numpy(),
+                   coordinates['geolocation_lng'].to_numpy(),
+                   agg)
+
+
+    @classmethod
+    def cached(cls, data, agg: str = "first") -> "ZipIndex":
+        """
+        Return the index of the Olist geolocation table, built once
+        and stored with the data cache in root/data/cache/zip_index_<agg>.npz.
+        It is rebuilt when the size or the mtime of the geolocation csv file
+        changes: the geolocation table is only read in that case.
+        :param data: a LazyData mapping, see Olist.get_data(lazy=True)
+        :type data: LazyData
+        :param agg: "first", "mean" or "median"
+        :type agg: str
+        :return: the index
+        :rtype: ZipIndex
+        """
+        olist = data.olist
+        path = os.path.join(olist.cache_path(), f"zip_index_{agg}.npz")
+        fingerprint = olist.csv_fingerprint('geolocation', with_hash=False)
+        fingerprint = json.dumps(fingerprint, sort_keys=True)
+
+        if os.path.exists(path):
+            with np.load(path) as arrays:
+                if str(arrays["fingerprint"]) == fingerprint:
+                    return cls(arrays["prefixes"], arrays["lat"], arrays["lng"],
+                               agg)
+
+        index = cls.from_geolocation(data['geolocation'], agg)
+        os.makedirs(olist.cache_path(), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, prefixes=index.prefixes, lat=index.lat,
+                 lng=index.lng, fingerprint=np.array(fingerprint))
+        os.replace(tmp_path, path)
+        return index
+
+
+    @property
+    def key(self) -> str:
+        """
+        Hash of the coordinates, see DistanceCache
+        """
+        sha1 = hashlib.sha1(self.agg.encode())
+        for array in (self.prefixes, self.lat, self.lng):
+            sha1.update(array.tobytes())
+        return sha1.hexdigest()
+
+
+    def lookup(self, zips) -> tuple:
+        """
+        Return the coordinates of zip code prefixes
+        :param zips: array-like of zip code prefixes
+        :return: two float32 arrays (lat, lng),
+        NaN for the prefixes which are not in the index
+        :rtype: tuple
+        """
+        zips = np.asarray(zips)
+        if len(self.prefixes) == 0:
+            # empty geolocation table: no prefix is found
+            missing = np.full(zips.shape, np.nan, dtype=np.float32)
+            return missing, missing.copy()
+        positions = np.searchsorted(self.prefixes, zips)
+        # positions == len(prefixes) for zips above the last prefix
+        positions = np.minimum(positions, len(self.prefixes) - 1)
+        found = self.prefixes[positions] == zips
+        lat = np.where(found, self.lat[positions], np.float32(np.nan))
+        lng = np.where(found, self.lng[positions], np.float32(np.nan))
+        return lat, lng
+
+
+    def __len__(self) -> int:
+        return len(self.prefixes)
+
+
+class DistanceCache:
+    """
+    Persistent cache of the distances between
+    (seller zip code prefix, customer zip code prefix) pairs,
+    stored in root/data/cache/distances.parquet with the key of
+    their coordinates in the parquet schema metadata: the distances
+    and their key are replaced at once
+    """
+
+    def __init__(self, path: str = None):
+        """
+        :param path: path of the parquet file,
+        defaults to root/data/cache/distances.parquet
+        :type path: str
+        """
+        self.path = path if path is not None else os.path.join(
+            Olist().cache_path(), "distances.parquet")
+
+
+    def read(self, key: str) -> pd.DataFrame:
+        """
+        Read the cached distances computed from the coordinates "key"
+        :param key: hash of the coordinates, see ZipIndex.key
+        :type key: str
+        :return: a DataFrame with the following columns:
+        seller_zip_code_prefix, customer_zip_code_prefix, distance_seller_customer
+        (empty if there is no cache for these coordinates)
+        :rtype: pd.DataFrame
+        """
+        if os.path.exists(self.path):
+            # the distances and the key are read from the same file
+            table = pq.read_table(self.path)
+            if (table.schema.metadata or {}).get(DISTANCE_KEY) == key.encode():
+                return table.to_pandas()
+        return pd.DataFrame({
+            'seller_zip_code_prefix': pd.Series(dtype='int32'),
+            'customer_zip_code_prefix': pd.Series(dtype='int32'),
+            'distance_seller_customer': pd.Series(dtype='float64'),
+        })
+
+
+    def write(self, key: str, distances: pd.DataFrame) -> None:
+        """
+        Replace the cached distances
+        :param key: hash of the coordinates, see ZipIndex.key
+        :type key: str
+        :param distances: a DataFrame with the same columns as DistanceCache.read
+        :type distances: pd.DataFrame
+        :return: None
+        """
+        table = pa.Table.from_pandas(distances, preserve_index=False)
+        table = table.replace_schema_metadata(
+            {**(table.schema.metadata or {}), DISTANCE_KEY: key.encode()})
+
+        # a temporary file per writer, process or thread, then one atomic rename
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory or ".", exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(
+            prefix=f"{os.path.basename(self.path)}.", suffix=".tmp",
+            dir=directory or None)
+        os.close(fd)
+        try:
+            pq.write_table(table, tmp_path)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+
+    def distances(self,
+                  pairs: pd.DataFrame,
+                  key: str,
+                  use_cache: bool = True) -> np.ndarray:
+        """
+        Return the distance of each pair of zip code prefixes,
+        only the pairs missing from the cache are computed, then cached
+        :param pairs: a DataFrame of unique pairs with the following columns:
+        seller_zip_code_prefix, customer_zip_code_prefix,
+        geolocation_lat_seller, geolocation_lng_seller,
+        geolocation_lat_customer, geolocation_lng_customer
+        :type pairs: pd.DataFrame
+        :param key: hash of the coordinates of the zip code prefixes,
+        see ZipIndex.key
+        :type key: str
+        :param use_cache: if False, compute every pair and ignore the cache
+        :type use_cache: bool
+        :return: the distances in km, in the order of pairs
+        :rtype: np.ndarray
+        """
+        if not use_cache:
+            return self.compute(pairs)
+
+        zips = ['seller_zip_code_prefix', 'customer_zip_code_prefix']
+        cached = self.read(key)
+        distances = pairs[zips].merge(cached, on=zips, how='left')\
+            ['distance_seller_customer'].to_numpy(dtype='float64', copy=True)
+
+        # compute and cache the missing pairs only
+        missing = np.isnan(distances)
+        if missing.any():
+            distances[missing] = self.compute(pairs[missing])
+            new = pairs.loc[missing, zips].copy()
+            new['distance_seller_customer'] = distances[missing]
+            self.write(key, pd.concat([cached, new], ignore_index=True))
+        return distances
+
+
+    @staticmethod
+    def compute(pairs: pd.DataFrame) -> np.ndarray:
+        """
+        Compute the distance of each pair of zip code prefixes
+        :param pairs: see DistanceCache.distances
+        :type pairs: pd.DataFrame
+        :return: the distances in km, in the order of pairs
+        :rtype: np.ndarray
+        """
+        # (lng, lat) are passed in place of (lat, lng),
+        # as the original haversine() call of Order.get_distance_seller_customer
+        return haversine_np(pairs['geolocation_lng_seller'],
+                            pairs['geolocation_lat_seller'],
+                            pairs['geolocation_lng_customer'],
+                            pairs['geolocation_lat_customer'])
+
+
+def main():
+    print("The library geo.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
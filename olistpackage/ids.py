@@ -0,0 +1,227 @@
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+
+
+# id columns encoded by IdDictionary, and the table listing every id
+# of each column: its values get the codes 0..n-1 in sorted order
+ID_COLUMNS = {
+    "order_id": "orders",
+    "customer_id": "customers",
+    "seller_id": "sellers",
+    "product_id": "products",
+}
+
+# dtype of the codes
+CODE_DTYPE = np.int32
+
+
+class IdDictionary:
+    """
+    A shared dictionary of the 32-character hex ids of the Olist tables:
+    each id column is encoded into dense int32 codes, with the same code
+    for the same id in every table, so that the joins and the groupbys of
+    the feature methods run on integers. Codes are sorted like the ids,
+    so the results are in the same order as with the hex ids.
+    """
+
+    def __init__(self, data):
+        """
+        :param data: a Python dict (or LazyData) of the Olist tables
+        with the original ids, the dictionary of an id column is built
+        from its table in ID_COLUMNS the first time the column is encoded
+        :type data: dict
+        """
+        self.data = data
+        # id column -> pd.Index of the ids, the position is the code
+        self.indexes = {}
+        self._lock = threading.RLock()
+
+
+    def index(self, column: str) -> pd.Index:
+        """
+        Return the ids of an id column, in the order of their codes
+        :param column: e.g. "order_id"
+        :type column: str
+        :rtype: pd.Index
+        """
+        if column not in self.indexes:
+            with self._lock:
+                if column not in self.indexes:
+                    values = self.data[ID_COLUMNS[column]][column]
+                    values = pd.Series(values.dropna().unique()).astype(object)
+                    self.indexes[column] = pd.Index(values.sort_values().array)
+        return self.indexes[column]
+
+
+    def _positions(self, column: str, ids: pd.Index) -> np.ndarray:
+        """
+        Return the codes of distinct ids, the ids missing from
+        the dictionary (not in the table of ID_COLUMNS) are appended to it
+        """
+        positions = self.index(column).get_indexer(ids)
+        if (positions == -1).any():
+            with self._lock:
+                index = self.index(column)
+                positions = index.get_indexer(ids)
+                new = ids[positions == -1]
+                self.indexes[column] = index.append(pd.Index(new.astype(object)))
+                positions[positions == -1] = np.arange(len(index), len(index) + len(new))
+        return positions
+
+
+    def encode(self, column: str, values: pd.Series) -> pd.Series:
+        """
+        Encode the values of an id column, missing values get the code -1
+        :param column: e.g. "order_id"
+        :type column: str
+        :param values: the ids, as categoricals or Python objects
+        :type values: pd.Series
+        :return: the codes
+        :rtype: pd.Series
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            # encode each category once
+            positions = self._positions(column, values.cat.categories)
+            codes = values.cat.codes.to_numpy()
+            encoded = np.where(codes == -1, -1, positions[codes])
+        else:
+            inverse, uniques = pd.factorize(values)
+            positions = self._positions(column, pd.Index(uniques))
+            encoded = np.where(inverse == -1, -1, positions[inverse])
+        return pd.Series(encoded.astype(CODE_DTYPE), index=values.index, name=values.name)
+
+
+    def encode_table(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Return a DataFrame with the id columns of ID_COLUMNS encoded,
+        the other columns are shared with df
+        """
+        encoded = df.copy(deep=False)
+        for column in ID_COLUMNS:
+            if column in df.columns:
+                encoded[column] = self.encode(column, df[column])
+        return encoded
+
+
+    def decode(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Replace the codes of the id columns of a DataFrame by the ids,
+        as categoricals sharing the categories of the dictionary
+        :param df: a DataFrame with encoded id columns, modified in place
+        :type df: pd.DataFrame
+        :return: df
+        :rtype: pd.DataFrame
+        """
+        for column in ID_COLUMNS:
+            if column in df.columns and pd.api.types.is_integer_dtype(df[column]):
+                df[column] = pd.Categorical.from_codes(
+                    df[column].to_numpy(), categories=self.index(column))
+        return df
+
+
+    def info(self) -> dict:
+        """
+        Return the number of ids of each id column already encoded
+        :rtype: dict
+        """
+        return {column: len(index) for column, index in self.indexes.items()}
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+class EncodedData(Mapping):
+    """
+    A read-only Python dict of the Olist tables with the id columns
+    encoded by an IdDictionary, each table is encoded the first time
+    its key is accessed. Used by Session(encode_ids=True)
+    """
+
+    def __init__(self, source, ids: IdDictionary = None):
+        """
+        :param source: a Python dict (or LazyData) of the Olist tables
+        with the original ids
+        :type source: dict
+        :param ids: the shared dictionary, defaults to IdDictionary(source)
+        :type ids: IdDictionary
+        """
+        self.source = source
+        self.ids = ids if ids is not None else IdDictionary(source)
+        self._tables = {}
+        self._lock = threading.Lock()
+
+
+    def __getitem__(self, key: str) -> pd.DataFrame:
+        if key not in self._tables:
+            # read the table out of the lock, LazyData has its own locks
+            df = self.source[key]
+            with self._lock:
+                if key not in self._tables:
+                    self._tables[key] = self.ids.encode_table(df)
+        return self._tables[key]
+
+
+    def __iter__(self):
+        return iter(self.source)
+
+
+    def __len__(self) -> int:
+        return len(self.source)
+
+
+    def __repr__(self) -> str:
+        return f"EncodedData(keys={list(self.source)}, encoded={list(self._tables)})"
+
+
+    def replace(self, key: str, df: pd.DataFrame) -> None:
+        """
+        Replace the table "key" by another DataFrame with the original ids,
+        the new ids are appended to the dictionary
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :param df: the new DataFrame of the table
+        :type df: pd.DataFrame
+        :return: None
+        """
+        if hasattr(self.source, "replace"):
+            self.source.replace(key, df)
+        else:
+            self.source[key] = df
+        self._tables.pop(key, None)
+
+
+    def unload(self, keys: list) -> None:
+        """
+        Forget some tables, they are read and encoded again
+        the next time they are used
+        :param keys: table names
+        :type keys: list
+        :return: None
+        """
+        self.source.unload(keys)
+        for key in keys:
+            self._tables.pop(key, None)
+
+
+    def loaded(self) -> list:
+        """
+        Return the keys of the tables already encoded
+        :return: a Python list of table names
+        :rtype: list
+        """
+        return list(self._tables)
+
+
+def main():
+    print("The library ids.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
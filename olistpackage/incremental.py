@@ -0,0 +1,386 @@
+import os
+import numpy as np
+import pandas as pd
+
+from olistpackage.data import read_csv, apply_schema
+from olistpackage.session import Session
+from olistpackage import seller, product
+
+
+# how each column of the partial states is merged
+SELLER_STATE = {
+    # items of the seller (Seller.get_quantity, Seller.get_sales)
+    'quantity': 'sum',
+    'n_orders': 'sum',
+    'sales': 'sum',
+    # items of delivered orders (Seller.get_seller_delay_wait_time)
+    'delivered_items': 'sum',
+    'delay_sum': 'sum',
+    'delay_count': 'sum',
+    'wait_sum': 'sum',
+    'wait_count': 'sum',
+    # items of known orders (Seller.get_active_dates)
+    'ordered_items': 'sum',
+    'date_first_sale': 'min',
+    'date_last_sale': 'max',
+    # reviews of the orders of the seller (Seller.get_review_score)
+    'reviews': 'sum',
+    'one_stars': 'sum',
+    'five_stars': 'sum',
+    'score_sum': 'sum',
+    'cost_of_reviews': 'sum',
+}
+
+PRODUCT_STATE = {
+    # items of the product (Product.get_price, get_quantity, get_sales)
+    'quantity': 'sum',
+    'n_orders': 'sum',
+    'sales': 'sum',
+    # items of delivered orders (Product.get_wait_time)
+    'delivered_items': 'sum',
+    'wait_sum': 'sum',
+    'wait_count': 'sum',
+    # reviews of the orders of the product (Product.get_review_score)
+    'reviews': 'sum',
+    'one_stars': 'sum',
+    'five_stars': 'sum',
+    'score_sum': 'sum',
+    'cost_of_reviews': 'sum',
+}
+
+# cost_of_review of each review_score, see Seller.get_review_score
+REVIEW_COSTS = {1: 100, 2: 50, 3: 40, 4: 0, 5: 0}
+
+
+def merge_states(states: list, agg: dict) -> pd.DataFrame:
+    """
+    Merge partial states indexed by seller_id or product_id
+    :param states: a Python list of partial states
+    :type states: list
+    :param agg: how each column is merged, SELLER_STATE or PRODUCT_STATE
+    :type agg: dict
+    :return: the merged state
+    :rtype: pd.DataFrame
+    """
+    states = [state for state in states if not state.empty]
+    if not states:
+        return pd.DataFrame(columns=list(agg))
+    state = pd.concat(states)
+    return state.groupby(level=0).agg(agg)
+
+
+class IncrementalAggregates:
+    """
+    Per-seller and per-product aggregates of Seller.get_training_data
+    and Product.get_training_data, kept as mergeable partial states
+    (counts, sums, min / max dates) and updated from deltas of new orders,
+    order items and order reviews instead of a full recompute.
+
+    A delta contains new orders only: its orders and the orders of its
+    order items must not be known yet, while its reviews can be about
+    any order. The results equal a full recompute on all the data.
+    """
+
+    def __init__(self, session: Session = None, keep_orders: bool = True):
+        """
+        :param session: the dataset context of the sellers, products and
+        product_category_name_translation tables, defaults to Session.default()
+        :type session: Session
+        :param keep_orders: if True, keep the ids, sellers, products and
+        reviews of the known orders, to match the reviews of later deltas
+        with them. If False, the memory does not depend on the number of
+        orders, but each delta must contain all the reviews of its orders
+        and the known orders are not checked (see streaming.StreamingTrainingData)
+        :type keep_orders: bool
+        """
+        self.session = session if session is not None else Session.default()
+        self.keep_orders = keep_orders
+        self.sellers = merge_states([], SELLER_STATE)
+        self.products = merge_states([], PRODUCT_STATE)
+        # order_id of the known orders
+        self.order_ids = pd.Index([], dtype=object)
+        # distinct (order_id, seller_id) and (order_id, product_id) pairs,
+        # and (order_id, review_score) of all the reviews,
+        # to match the reviews and the orders of different deltas
+        self.order_sellers = pd.DataFrame(columns=['order_id', 'seller_id'])
+        self.order_products = pd.DataFrame(columns=['order_id', 'product_id'])
+        self.reviews = pd.DataFrame({'order_id': pd.Series(dtype=object),
+                                     'review_score': pd.Series(dtype='float64')})
+
+
+    @classmethod
+    def from_session(cls, session: Session = None) -> "IncrementalAggregates":
+        """
+        Build the aggregates from all the orders of a session
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        :return: the aggregates
+        :rtype: IncrementalAggregates
+        """
+        aggregates = cls(session)
+        data = aggregates.session.source_data
+        return aggregates.update(data['orders'], data['order_items'],
+                                 data['order_reviews'])
+
+
+    @staticmethod
+    def _read(table, key: str, columns: list) -> pd.DataFrame:
+        """
+        Return the columns of a delta table given as a DataFrame,
+        a csv file path or None, with the dtypes from SCHEMA
+        and the ids as Python objects
+        """
+        if table is None:
+            return pd.DataFrame(columns=columns)
+        if isinstance(table, str):
+            table = read_csv(table, key)
+        # parse the timestamps of DataFrames of strings
+        table = apply_schema(table[columns].copy(), key)
+        for column in columns:
+            if column.endswith('_id'):
+                table[column] = table[column].astype(object)
+        return table
+
+
+    def update(self,
+               orders=None,
+               order_items=None,
+               order_reviews=None) -> "IncrementalAggregates":
+        """
+        Fold a delta of new orders, order items and order reviews
+        into the aggregates
+        :param orders: new orders, as a DataFrame or a csv file path
+        :param order_items: items of the new orders,
+        as a DataFrame or a csv file path
+        :param order_reviews: new reviews, as a DataFrame or a csv file path
+        :return: the updated aggregates
+        :rtype: IncrementalAggregates
+        """
+        orders = self._read(orders, 'orders', [
+            'order_id', 'order_status', 'order_purchase_timestamp',
+            'order_approved_at', 'order_delivered_carrier_date',
+            'order_delivered_customer_date'])
+        items = self._read(order_items, 'order_items', [
+            'order_id', 'product_id', 'seller_id', 'shipping_limit_date',
+            'price'])
+        reviews = self._read(order_reviews, 'order_reviews',
+                             ['order_id', 'review_score'])
+
+        # a delta contains new orders only
+        if orders['order_id'].isin(self.order_ids).any():
+            raise ValueError("the delta contains orders which are already known")
+        if items['order_id'].isin(self.order_ids).any():
+            raise ValueError(
+                "the delta contains items of orders which are already known")
+
+        # items of the delivered orders, with their delays and wait times
+        one_day_delta = np.timedelta64(24, 'h')
+        delivered = items.merge(
+            orders.query("order_status == 'delivered'"), on='order_id')
+        delivered['delay'] = (delivered['order_delivered_carrier_date'] -
+                              delivered['shipping_limit_date']) / one_day_delta
+        delivered['wait'] = (delivered['order_delivered_customer_date'] -
+                             delivered['order_purchase_timestamp']) / one_day_delta
+
+        # items of the known orders, with their approval dates
+        ordered = items.merge(orders[['order_id', 'order_approved_at']],
+                              on='order_id')
+
+        # reviews of the new orders, and new reviews of the known orders
+        order_sellers = items[['order_id', 'seller_id']].drop_duplicates()
+        order_products = items[['order_id', 'product_id']].drop_duplicates()
+        all_reviews = pd.concat([self.reviews, reviews], ignore_index=True)
+        seller_reviews = pd.concat([
+            order_sellers.merge(all_reviews, on='order_id'),
+            self.order_sellers.merge(reviews, on='order_id')])
+        product_reviews = pd.concat([
+            order_products.merge(all_reviews, on='order_id'),
+            self.order_products.merge(reviews, on='order_id')])
+
+        self.sellers = merge_states([
+            self.sellers,
+            self._item_state(items, 'seller_id'),
+            self._delivered_state(delivered, 'seller_id', with_delay=True),
+            ordered.groupby('seller_id').agg(
+                ordered_items=('order_id', 'size'),
+                date_first_sale=('order_approved_at', 'min'),
+                date_last_sale=('order_approved_at', 'max')),
+            self._review_state(seller_reviews, 'seller_id'),
+        ], SELLER_STATE)
+        self.products = merge_states([
+            self.products,
+            self._item_state(items, 'product_id'),
+            self._delivered_state(delivered, 'product_id', with_delay=False),
+            self._review_state(product_reviews, 'product_id'),
+        ], PRODUCT_STATE)
+
+        if self.keep_orders:
+            self.order_ids = self.order_ids.append(
+                pd.Index(orders['order_id'].unique()))
+            self.order_sellers = pd.concat([self.order_sellers, order_sellers],
+                                           ignore_index=True)
+            self.order_products = pd.concat(
+                [self.order_products, order_products], ignore_index=True)
+            self.reviews = all_reviews
+        return self
+
+
+    @staticmethod
+    def _item_state(items: pd.DataFrame, key: str) -> pd.DataFrame:
+        return items.groupby(key).agg(quantity=('order_id', 'count'),
+                                      n_orders=('order_id', 'nunique'),
+                                      sales=('price', 'sum'))
+
+
+    @staticmethod
+    def _delivered_state(delivered: pd.DataFrame,
+                         key: str,
+                         with_delay: bool) -> pd.DataFrame:
+        columns = {
+            'delivered_items': ('order_id', 'size'),
+            'wait_sum': ('wait', 'sum'),
+            'wait_count': ('wait', 'count'),
+        }
+        if with_delay:
+            columns['delay_sum'] = ('delay', 'sum')
+            columns['delay_count'] = ('delay', 'count')
+        return delivered.groupby(key).agg(**columns)
+
+
+    @staticmethod
+    def _review_state(reviews: pd.DataFrame, key: str) -> pd.DataFrame:
+        reviews = reviews.assign(
+            one_star=(reviews['review_score'] == 1) * 1,
+            five_star=(reviews['review_score'] == 5) * 1,
+            cost=reviews['review_score'].map(REVIEW_COSTS))
+        return reviews.groupby(key).agg(reviews=('order_id', 'size'),
+                                        one_stars=('one_star', 'sum'),
+                                        five_stars=('five_star', 'sum'),
+                                        score_sum=('review_score', 'sum'),
+                                        cost_of_reviews=('cost', 'sum'))
+
+
+    def seller_training_data(self) -> pd.core.frame.DataFrame:
+        """
+        Returns the same DataFrame as Seller.get_training_data
+        on all the orders folded so far
+        :rtype: pd.core.frame.DataFrame
+        """
+        state = self.sellers.rename_axis('seller_id')
+
+        delivered = state[state['delivered_items'] > 0]
+        delay = delivered['delay_sum'] / delivered['delay_count']
+        delay_wait_time = pd.DataFrame({
+            'delay_to_carrier': delay.where(delay > 0, 0),
+            'wait_time': delivered['wait_sum'] / delivered['wait_count'],
+        }).reset_index()
+
+        active_dates = state.loc[state['ordered_items'] > 0,
+                                 ['date_first_sale', 'date_last_sale']]
+        active_dates['months_on_olist'] = round(
+            (active_dates['date_last_sale'] - active_dates['date_first_sale']) /
+            seller.ONE_MONTH)
+
+        quantity = state.loc[state['quantity'] > 0, ['n_orders', 'quantity']]
+        quantity['quantity_per_order'] = quantity['quantity'] / quantity['n_orders']
+
+        return seller.assemble_training_data(
+            self.session.seller().get_seller_features(),
+            delay_wait_time,
+            active_dates.reset_index(),
+            self._review_score(state),
+            quantity.reset_index(),
+            state.loc[state['quantity'] > 0, ['sales']].reset_index())
+
+
+    def product_training_data(self) -> pd.core.frame.DataFrame:
+        """
+        Returns the same DataFrame as Product.get_training_data
+        on all the orders folded so far
+        :rtype: pd.core.frame.DataFrame
+        """
+        state = self.products.rename_axis('product_id')
+
+        delivered = state[state['delivered_items'] > 0]
+        wait_time = (delivered['wait_sum'] / delivered['wait_count'])\
+            .rename('wait_time').reset_index()
+
+        items = state[state['quantity'] > 0]
+        price = (items['sales'] / items['quantity']).rename('price').reset_index()
+
+        return product.assemble_training_data(
+            self.session.product().get_product_features(),
+            wait_time,
+            price,
+            self._review_score(state),
+            items[['n_orders', 'quantity']].reset_index(),
+            items[['sales']].reset_index())
+
+
+    @staticmethod
+    def _review_score(state: pd.DataFrame) -> pd.DataFrame:
+        reviewed = state[state['reviews'] > 0]
+        return pd.DataFrame({
+            'share_of_one_stars': reviewed['one_stars'] / reviewed['reviews'],
+            'share_of_five_stars': reviewed['five_stars'] / reviewed['reviews'],
+            'review_score': reviewed['score_sum'] / reviewed['reviews'],
+            'cost_of_reviews': reviewed['cost_of_reviews'],
+        }).reset_index()
+
+
+    def save(self, path: str) -> None:
+        """
+        Save the partial states in a directory of parquet files,
+        e.g. between two daily updates
+        :param path: the directory
+        :type path: str
+        :return: None
+        """
+        os.makedirs(path, exist_ok=True)
+        self.sellers.rename_axis('seller_id').reset_index()\
+            .to_parquet(os.path.join(path, 'sellers.parquet'))
+        self.products.rename_axis('product_id').reset_index()\
+            .to_parquet(os.path.join(path, 'products.parquet'))
+        for name in ['order_sellers', 'order_products', 'reviews']:
+            getattr(self, name).to_parquet(os.path.join(path, f'{name}.parquet'))
+        pd.DataFrame({'order_id': self.order_ids})\
+            .to_parquet(os.path.join(path, 'order_ids.parquet'))
+
+
+    @classmethod
+    def load(cls, path: str, session: Session = None) -> "IncrementalAggregates":
+        """
+        Load the partial states saved by IncrementalAggregates.save
+        :param path: the directory
+        :type path: str
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        :return: the aggregates
+        :rtype: IncrementalAggregates
+        """
+        aggregates = cls(session)
+        aggregates.sellers = pd.read_parquet(
+            os.path.join(path, 'sellers.parquet')).set_index('seller_id')
+        aggregates.products = pd.read_parquet(
+            os.path.join(path, 'products.parquet')).set_index('product_id')
+        for name in ['order_sellers', 'order_products', 'reviews']:
+            setattr(aggregates, name,
+                    pd.read_parquet(os.path.join(path, f'{name}.parquet')))
+        aggregates.order_ids = pd.Index(pd.read_parquet(
+            os.path.join(path, 'order_ids.parquet'))['order_id'])
+        return aggregates
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+def main():
+    print("The library incremental.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,10 @@
+import os
 import pandas as pd
 import numpy as np
-from haversine import haversine
 
-from olistpackage.data import Olist
+from olistpackage.geo import DistanceCache
+from olistpackage.session import Session
+from olistpackage.features import feature, run_blocks, assemble
 
 
 class Order:
@@ -11,13 +13,21 @@ class Order:
     and various properties of these orders as columns
     """
 
-    def __init__(self):
+    def __init__(self, session: Session = None):
         """
-        Attribute "data" : dict of dataframes (from Olist csv files)
+        Attribute "data" : dict of dataframes (from Olist csv files),
+        shared by all the objects built from the same session
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
         """
-        self.data = Olist().get_data()
+        self.session = session if session is not None else Session.default()
+        self.data = self.session.data
 
 
+    @feature(tables={'orders': ('order_id', 'order_status',
+                                'order_purchase_timestamp',
+                                'order_delivered_customer_date',
+                                'order_estimated_delivery_date')})
     def get_wait_time(self, is_delivered: bool = True) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -35,15 +45,6 @@ class Order:
         if is_delivered:
             orders = orders.query("order_status == 'delivered'").copy()
 
-        # Convert dates from str to pandas.datetime
-        columns = [
-        "order_purchase_timestamp",
-        "order_delivered_customer_date",
-        "order_estimated_delivery_date"
-        ]
-        for c in columns:
-            orders.loc[:, c] = pd.to_datetime(orders[c])
-
         # Compute wait_time, expected_wait_time and delay_vs_expected, in days
         one_day_delta = np.timedelta64(24, 'h')
         orders.loc[:, 'wait_time'] = \
@@ -63,6 +64,7 @@ class Order:
         return orders[['order_id', 'wait_time', 'expected_wait_time', 'delay_vs_expected', 'order_status']]
 
 
+    @feature(tables={'order_reviews': ('order_id', 'review_score')})
     def get_review_score(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -76,6 +78,7 @@ class Order:
         return reviews[['order_id', 'dim_is_five_star', 'dim_is_one_star', 'review_score']]
 
 
+    @feature(tables={'order_items': ('order_id', 'product_id')})
     def get_number_products(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -84,10 +87,11 @@ class Order:
         :rtype: pd.core.frame.DataFrame
         """
         items = self.data['order_items'].copy()
-        items = items.groupby('order_id').count().product_id.reset_index()
+        items = items.groupby('order_id', observed=True).count().product_id.reset_index()
         return items.rename(columns = {'product_id': 'number_of_products'})
 
 
+    @feature(tables={'order_items': ('order_id', 'seller_id')})
     def get_number_sellers(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -96,10 +100,11 @@ class Order:
         :rtype: pd.core.frame.DataFrame
         """
         items = self.data['order_items'].copy()
-        nb_sellers = items.groupby("order_id")['seller_id'].nunique().reset_index()
+        nb_sellers = items.groupby("order_id", observed=True)['seller_id'].nunique().reset_index()
         return nb_sellers.rename(columns = {'seller_id': 'number_of_sellers'})
 
 
+    @feature(tables={'order_items': ('order_id', 'price', 'freight_value')})
     def get_price_and_freight(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -108,13 +113,32 @@ class Order:
         :rtype: pd.core.frame.DataFrame
         """
         order_items = self.data['order_items'].copy()
-        return order_items.groupby('order_id')[['price', 'freight_value']].sum().reset_index()
+        return order_items.groupby('order_id', observed=True)[['price', 'freight_value']].sum().reset_index()
 
 
-    def get_distance_seller_customer(self) -> pd.core.frame.DataFrame:
+    @feature(tables={'orders': ('order_id', 'customer_id'),
+                     'order_items': ('order_id', 'seller_id'),
+                     'sellers': ('seller_id', 'seller_zip_code_prefix'),
+                     'customers': ('customer_id', 'customer_zip_code_prefix'),
+                     'geolocation': ('geolocation_zip_code_prefix',
+                                     'geolocation_lat', 'geolocation_lng')})
+    def get_distance_seller_customer(self,
+                                     agg: str = "first",
+                                     use_cache: bool = True
+                                     ) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
         order_id, distance_seller_customer
+        The distance is computed once per unique pair of
+        (seller zip code prefix, customer zip code prefix),
+        and kept in a persistent cache between runs (see geo.DistanceCache)
+        in the data cache directory of the session (see Session.cache_path),
+        the distances of tables given as DataFrames are not persisted
+        :param agg: since one zip code can map to multiple (lat, lng),
+        take the "first", the "mean" or the "median" one (see geo.ZipIndex)
+        :type agg: str
+        :param use_cache: if False, compute every pair and ignore the cache
+        :type use_cache: bool
         :return: a DataFrame with the specified columns
         :rtype: pd.core.frame.DataFrame
         """
@@ -125,67 +149,59 @@ class Order:
         order_items = data['order_items']
         sellers = data['sellers']
         customers = data['customers']
-        geo = data['geolocation']
-
-        # Since one zip code can map to multiple (lat, lng), take the first one
-        geo = data['geolocation']
-        geo = geo.groupby('geolocation_zip_code_prefix',
-                          as_index=False).first()
-
-        # Merge geo_location for sellers
-        columns = [
-            'seller_id', 'seller_zip_code_prefix', 'geolocation_lat', 'geolocation_lng'
-        ]
-        sellers_geoloc = sellers.merge(
-            geo,
-            how='left',
-            left_on='seller_zip_code_prefix',
-            right_on='geolocation_zip_code_prefix')[columns]
 
-        # Merge geo_location for customers
-        columns = [
-            'customer_id', 'customer_zip_code_prefix', 'geolocation_lat', 'geolocation_lng'
-            ]
-        customers_geoloc = customers.merge(
-            geo,
-            how='left',
-            left_on='customer_zip_code_prefix',
-            right_on='geolocation_zip_code_prefix')[columns]
+        # coordinates of each zip code prefix
+        zip_index = self.session.zip_index(agg)
 
         # Match customers with sellers in one table
         columns = [
-            'order_id', 'customer_id','customer_zip_code_prefix', 'seller_id', 'seller_zip_code_prefix'
+            'order_id', 'seller_zip_code_prefix', 'customer_zip_code_prefix'
         ]
         customers_and_sellers = customers.merge(orders, on='customer_id')\
             .merge(order_items, on='order_id')\
             .merge(sellers, on='seller_id')[columns]
 
-        # Add the geolocalisation from sellers_geoloc and customers_geoloc
-        customers_and_sellers_geoloc = customers_and_sellers.merge(
-            sellers_geoloc, on='seller_id'
-            ).merge(customers_geoloc, on='customer_id', suffixes=('_seller', '_customer'))
+        # Add the geolocalisation of the sellers and the customers
+        # to each unique pair of zip codes
+        pairs = customers_and_sellers[[
+            'seller_zip_code_prefix', 'customer_zip_code_prefix'
+        ]].drop_duplicates()
+        for who in ['seller', 'customer']:
+            pairs[f'geolocation_lat_{who}'], pairs[f'geolocation_lng_{who}'] = \
+                zip_index.lookup(pairs[f'{who}_zip_code_prefix'])
 
         # remove na()
-        customers_and_sellers_geoloc = customers_and_sellers_geoloc.dropna()
-
-        # compute haversine distance in the distance_seller_customer column
-        customers_and_sellers_geoloc.loc[:, "distance_seller_customer"] = \
-            customers_and_sellers_geoloc.apply(
-                lambda row: haversine((row['geolocation_lng_seller'],
-                                       row['geolocation_lat_seller']),
-                                        (row['geolocation_lng_customer'],
-                                         row['geolocation_lat_customer'])),
-                axis=1)
+        pairs = pairs.dropna()
+
+        # compute haversine distance in the distance_seller_customer column,
+        # cached with the data cache of the tables of the session, if any
+        cache_path = self.session.cache_path()
+        if use_cache and cache_path is not None:
+            distance_cache = DistanceCache(
+                os.path.join(cache_path, "distances.parquet"))
+            pairs['distance_seller_customer'] = distance_cache.distances(
+                pairs, zip_index.key)
+        else:
+            pairs['distance_seller_customer'] = DistanceCache.compute(pairs)
 
         # Since an order can have multiple sellers,
         # return the average of the distance per order
-        return customers_and_sellers_geoloc.groupby('order_id', as_index=False)\
+        return customers_and_sellers.merge(
+            pairs, on=['seller_zip_code_prefix', 'customer_zip_code_prefix']
+        ).groupby('order_id', as_index=False, observed=True)\
             .agg({'distance_seller_customer':'mean'})
 
 
+    @feature(depends_on=('Order.get_wait_time', 'Order.get_review_score',
+                         'Order.get_number_products',
+                         'Order.get_number_sellers',
+                         'Order.get_price_and_freight',
+                         'Order.get_distance_seller_customer'),
+             ignore=('n_jobs',))
     def get_training_data(self,
                           is_delivered=True,
-                          with_distance_seller_customer=False):
+                          with_distance_seller_customer=False,
+                          n_jobs: int = 1):
         """
         Returns a clean DataFrame (without NaN), with the all following columns:
         order_id, wait_time, expected_wait_time, delay_vs_expected,
@@ -196,26 +212,26 @@ class Order:
         :type is_delivered: bool
         :param with_distance_seller_customer: if True, include the distance seller-customer
         :type with_distance_seller_customer: bool
+        :param n_jobs: number of feature methods computed at the same time,
+        see features.run_blocks
+        :type n_jobs: int
         :return: a DataFrame with the specified columns
         :rtype: pd.core.frame.DataFrame
         """
-        training_set =\
-            self.get_wait_time(is_delivered)\
-                .merge(
-                self.get_review_score(), on='order_id'
-            ).merge(
-                self.get_number_products(), on='order_id'
-            ).merge(
-                self.get_number_sellers(), on='order_id'
-            ).merge(
-                self.get_price_and_freight(), on='order_id'
-            )
-
+        blocks = [
+            lambda: self.get_wait_time(is_delivered),
+            self.get_review_score,
+            self.get_number_products,
+            self.get_number_sellers,
+            self.get_price_and_freight,
+        ]
         # Include the distance seller-customer
         # only if with_distance_seller_customer is True
         if with_distance_seller_customer:
-            training_set = training_set.merge(
-                self.get_distance_seller_customer(), on='order_id')
+            blocks.append(self.get_distance_seller_customer)
+
+        # join the blocks on order_id, in the order of the list
+        training_set = assemble(run_blocks(blocks, n_jobs), on='order_id')
 
         return training_set.dropna()
 
@@ -1,8 +1,9 @@
 import pandas as pd
 import numpy as np
 
-from olistpackage.data import Olist
 from olistpackage.order import Order
+from olistpackage.session import Session
+from olistpackage.features import feature, run_blocks, assemble
 
 
 class Product:
@@ -13,13 +14,20 @@ class Product:
     :rtype: pd.core.frame.DataFrame
 
     """
-    def __init__(self):
+    def __init__(self, session: Session = None):
+        """
+        Attribute "data" : dict of dataframes (from Olist csv files),
+        shared with self.order and all the objects built from the same session
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        """
         # Import data only once
-        olist = Olist()
-        self.data = olist.get_data()
-        self.order = Order()
+        self.session = session if session is not None else Session.default()
+        self.data = self.session.data
+        self.order = Order(self.session)
 
 
+    @feature(tables=('products', 'product_category_name_translation'))
     def get_product_features(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -47,6 +55,7 @@ class Product:
         return df
 
 
+    @feature(tables={'order_items': ('product_id', 'price')})
     def get_price(self) -> pd.core.frame.DataFrame:
         """
         Return a DataFrame with the following columns:
@@ -58,11 +67,13 @@ class Product:
         order_items = self.data['order_items']
         # compute the mean price for each product
         # and return the wanted dataframe
-        df =  order_items[['product_id', 'price']].groupby('product_id').mean()
+        df =  order_items[['product_id', 'price']].groupby('product_id', observed=True).mean()
 
         return df.reset_index()
 
 
+    @feature(tables={'order_items': ('order_id', 'product_id')},
+             depends_on=('Order.get_wait_time',))
     def get_wait_time(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -79,12 +90,13 @@ class Product:
         orders_products_with_time = orders_products.merge(orders_wait_time, on='order_id')
         # compute the mean wait time for each product
         # and return the wanted dataframe
-        df = orders_products_with_time.groupby('product_id', as_index=False) \
+        df = orders_products_with_time.groupby('product_id', as_index=False, observed=True) \
             .agg({'wait_time': 'mean'})
 
         return df
 
 
+    @feature(tables={'order_items': ('order_id', 'product_id')})
     def get_quantity(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -95,12 +107,12 @@ class Product:
         # get the order_items dataframe
         order_items = self.data['order_items']
         # compute the number of orders for each product in n_orders dataframe
-        n_orders = order_items.groupby('product_id')['order_id'] \
+        n_orders = order_items.groupby('product_id', observed=True)['order_id'] \
             .nunique().reset_index()
         # rename columns
         n_orders.columns = ['product_id', 'n_orders']
         # compute the total quantity for each product in quantity dataframe
-        quantity = order_items.groupby('product_id', as_index=False) \
+        quantity = order_items.groupby('product_id', as_index=False, observed=True) \
             .agg({'order_id': 'count'})
         # rename columns
         quantity.columns = ['product_id', 'quantity']
@@ -111,6 +123,7 @@ class Product:
         return df
 
 
+    @feature(tables={'order_items': ('product_id', 'price')})
     def get_sales(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -121,13 +134,15 @@ class Product:
         # compute the total sales for each product
         # and return the wanted dataframe
         df = self.data['order_items'][['product_id', 'price']]\
-            .groupby('product_id')\
+            .groupby('product_id', observed=True)\
             .sum()\
             .rename(columns={'price': 'sales'})
 
         return df.reset_index()
 
 
+    @feature(tables={'order_items': ('order_id', 'product_id')},
+             depends_on=('Order.get_review_score',))
     def get_review_score(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -154,7 +169,7 @@ class Product:
             1: 100, 2: 50, 3: 40, 4: 0, 5: 0
         })
         # compute for each product the following means and sum
-        df = df.groupby('product_id', as_index=False).agg({
+        df = df.groupby('product_id', as_index=False, observed=True).agg({
             'dim_is_one_star': 'mean',
             'dim_is_five_star': 'mean',
             'review_score': 'mean',
@@ -169,7 +184,12 @@ class Product:
         return df
 
 
-    def get_training_data(self) -> pd.core.frame.DataFrame:
+    @feature(depends_on=('Product.get_product_features',
+                         'Product.get_wait_time', 'Product.get_price',
+                         'Product.get_review_score', 'Product.get_quantity',
+                         'Product.get_sales'),
+             ignore=('n_jobs',))
+    def get_training_data(self, n_jobs: int = 1) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
         product_id, product_name_length, product_description_length,
@@ -177,33 +197,24 @@ class Product:
         product_height_cm, product_width_cm, category, wait_time,
         price, share_of_one_stars, share_of_five_stars, review_score,
         cost_of_reviews, n_orders, quantity, sales, revenues, profits
+        :param n_jobs: number of feature methods computed at the same time,
+        see features.run_blocks
+        :type n_jobs: int
         :return: a DataFrame with the specified columns
         :rtype: pd.core.frame.DataFrame
         """
-        # merge the dataframes from the previous methods of this class
-        training_set =\
-            self.get_product_features()\
-                .merge(
-                self.get_wait_time(), on='product_id'
-               ).merge(
-                self.get_price(), on='product_id'
-               ).merge(
-                self.get_review_score(), on='product_id'
-               ).merge(
-                self.get_quantity(), on='product_id'
-               ).merge(
-                self.get_sales(), on='product_id'
-               )
-
-        # compute the economics (revenues, profits)
-        olist_sales_cut = 0.1
-        training_set['revenues'] = olist_sales_cut * training_set['sales']
-        training_set['profits'] = training_set['revenues'] - training_set[
-            'cost_of_reviews']
-
-        return training_set
-
-
+        # merge the blocks in the order of the list
+        return assemble_training_data(*run_blocks([
+            self.get_product_features,
+            self.get_wait_time,
+            self.get_price,
+            self.get_review_score,
+            self.get_quantity,
+            self.get_sales,
+        ], n_jobs))
+
+
+    @feature(depends_on=('Product.get_training_data',))
     def get_product_cat(self, agg: str ="mean") -> pd.core.frame.DataFrame:
         '''
         Returns a DataFrame with category as index,
@@ -219,13 +230,15 @@ class Product:
         '''
         # get the training_data from the previous class method
         products = self.get_training_data()
-        # list of columns for which dtype is not object
-        columns = list(products.select_dtypes(exclude=['object']).columns)
+        # list of columns for which dtype is neither object nor category,
+        # except product_id (int32 codes with Session(encode_ids=True))
+        columns = list(products.drop(columns='product_id')
+                       .select_dtypes(exclude=['object', 'category']).columns)
         # set the aggregiate parameters
         agg_params = dict(zip(columns, [agg] * len(columns)))
         agg_params['quantity'] = 'sum'
         # compute and return the wanted dataframe
-        df = products.groupby("category").agg(agg_params)
+        df = products.groupby("category", observed=True).agg(agg_params)
 
         return df
 
@@ -237,6 +250,34 @@ class Product:
         return "PONG"
 
 
+def assemble_training_data(features: pd.DataFrame,
+                           wait_time: pd.DataFrame,
+                           price: pd.DataFrame,
+                           review_score: pd.DataFrame,
+                           quantity: pd.DataFrame,
+                           sales: pd.DataFrame) -> pd.core.frame.DataFrame:
+    """
+    Merge the per-product DataFrames returned by the Product methods
+    get_product_features, get_wait_time, get_price, get_review_score,
+    get_quantity and get_sales, and add the economics (revenues, profits)
+    :return: a DataFrame with the columns of Product.get_training_data
+    :rtype: pd.core.frame.DataFrame
+    """
+    # join the dataframes from the methods of the Product class on product_id
+    training_set = assemble(
+        [features, wait_time, price,
+         review_score, quantity, sales],
+        on='product_id')
+
+    # compute the economics (revenues, profits)
+    olist_sales_cut = 0.1
+    training_set['revenues'] = olist_sales_cut * training_set['sales']
+    training_set['profits'] = training_set['revenues'] - training_set[
+        'cost_of_reviews']
+
+    return training_set
+
+
 def main():
     print("The library product.py has been ran directly.")
 
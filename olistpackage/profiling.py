@@ -0,0 +1,305 @@
+import json
+import inspect
+import time
+import functools
+import threading
+import tracemalloc
+
+import pandas as pd
+
+
+# the Profiler recording the calls, None when the instrumentation is disabled:
+# the instrumented functions then only read this global variable
+ACTIVE = None
+
+
+class Frame:
+    """
+    A call being measured, see Profiler.call
+    """
+
+    def __init__(self, record: dict, memory_start: int):
+        self.record = record
+        self.memory_start = memory_start
+        self.memory_peak = memory_start
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of the data loader (Olist.get_data,
+    Olist.read_table) and of the feature methods of Order, Seller and Product.
+    Each call records its wall time, the CPU time of its thread,
+    the peak of the memory allocated during the call (tracemalloc),
+    the rows of the tables it reads and of its result, and its parent call:
+    e.g. Seller.get_review_score is a child of Seller.get_training_data.
+
+    The CPU time of a call does not include its children computed in
+    other threads (run_blocks, get_data(n_jobs > 1)). The peak memory
+    of tracemalloc is global to the process: it is only recorded for the
+    calls of the thread which started the profiler, and includes the
+    allocations of the other threads during the call; memory_peak_mb is
+    None for the calls of the other threads.
+
+    with Profiler() as profiler:
+        Seller().get_training_data()
+    profiler.report()
+    """
+
+    def __init__(self, memory: bool = True):
+        """
+        :param memory: if True, measure the memory with tracemalloc,
+        which slows the calls down
+        :type memory: bool
+        """
+        self.memory = memory
+        self.records = []
+        self._lock = threading.Lock()
+        # stack of the frames of the calls in progress, per thread
+        self._local = threading.local()
+        # the thread measuring the memory, see Profiler.start
+        self._thread = None
+
+
+    def start(self) -> "Profiler":
+        """
+        Enable the instrumentation, until Profiler.stop
+        :return: the profiler
+        :rtype: Profiler
+        """
+        global ACTIVE
+        self._thread = threading.get_ident()
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+        ACTIVE = self
+        return self
+
+
+    def stop(self) -> None:
+        """
+        Disable the instrumentation
+        :return: None
+        """
+        global ACTIVE
+        ACTIVE = None
+        if getattr(self, "_started_tracemalloc", False):
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+
+    def __enter__(self) -> "Profiler":
+        return self.start()
+
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+
+    def _stack(self) -> list:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+
+    def current(self):
+        """
+        Return the frame of the call in progress in this thread, or None
+        """
+        stack = self._stack()
+        return stack[-1] if stack else None
+
+
+    def call(self, name: str, function, input_rows=None):
+        """
+        Call function and record its measures
+        :param name: name of the call, e.g. "Order.get_wait_time"
+        :type name: str
+        :param function: a function without arguments
+        :param input_rows: a function without arguments returning the rows
+        of the tables read by the call, called after the call
+        :return: the result of function
+        """
+        stack = self._stack()
+        parent = stack[-1] if stack else getattr(self._local, "parent", None)
+        with self._lock:
+            record = {
+                "id": len(self.records),
+                "parent": parent.record["id"] if parent else None,
+                "depth": parent.record["depth"] + 1 if parent else 0,
+                "name": name,
+                "thread": threading.current_thread().name,
+            }
+            self.records.append(record)
+
+        # the peak of tracemalloc is reset and read by one thread only:
+        # the calls of the other threads would reset the peak of its calls
+        measure_memory = tracemalloc.is_tracing() and \
+            threading.get_ident() == self._thread
+        memory_start = 0
+        if measure_memory:
+            memory_start, peak = tracemalloc.get_traced_memory()
+            if parent is not None:
+                parent.memory_peak = max(parent.memory_peak, peak)
+            tracemalloc.reset_peak()
+        frame = Frame(record, memory_start)
+
+        stack.append(frame)
+        wall_start, cpu_start = time.perf_counter(), time.thread_time()
+        try:
+            result = function()
+        finally:
+            record["wall_s"] = time.perf_counter() - wall_start
+            record["cpu_s"] = time.thread_time() - cpu_start
+            stack.pop()
+            if not measure_memory:
+                record["memory_peak_mb"] = None
+            elif tracemalloc.is_tracing():
+                frame.memory_peak = max(frame.memory_peak,
+                                        tracemalloc.get_traced_memory()[1])
+                if parent is not None:
+                    parent.memory_peak = max(parent.memory_peak, frame.memory_peak)
+                record["memory_peak_mb"] = \
+                    (frame.memory_peak - frame.memory_start) / 2**20
+
+        record["input_rows"] = input_rows() if input_rows is not None else None
+        record["output_rows"] = rows(result)
+        return result
+
+
+    def in_thread(self, parent, function):
+        """
+        Return function, to be called in another thread as a child of
+        the call "parent"
+        """
+        def wrapper(*args, **kwargs):
+            self._local.parent = parent
+            try:
+                return function(*args, **kwargs)
+            finally:
+                self._local.parent = None
+        return wrapper
+
+
+    def report(self) -> pd.DataFrame:
+        """
+        Return the records as a DataFrame with the following columns:
+        id, parent, depth, name, thread, wall_s, cpu_s, memory_peak_mb,
+        input_rows, output_rows, in the order of the calls
+        :rtype: pd.DataFrame
+        """
+        columns = ["id", "parent", "depth", "name", "thread", "wall_s", "cpu_s",
+                   "memory_peak_mb", "input_rows", "output_rows"]
+        return pd.DataFrame(self.records, columns=columns)
+
+
+    def tree(self) -> list:
+        """
+        Return the call tree: a Python list of the root calls,
+        each record has a "children" list of its own calls
+        :rtype: list
+        """
+        nodes = {r["id"]: {**r, "children": []} for r in self.records}
+        roots = []
+        for node in nodes.values():
+            if node["parent"] is None:
+                roots.append(node)
+            else:
+                nodes[node["parent"]]["children"].append(node)
+        return roots
+
+
+    def to_json(self, path: str = None) -> str:
+        """
+        Return the call tree as a JSON string, and write it in a file
+        :param path: path of the json file, not written if None
+        :type path: str
+        :return: the JSON string
+        :rtype: str
+        """
+        content = json.dumps(self.tree(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(content)
+        return content
+
+
+    def format_tree(self) -> str:
+        """
+        Return the call tree as an indented text, one call per line
+        :rtype: str
+        """
+        lines = []
+
+        def add(node):
+            memory = node.get("memory_peak_mb")
+            memory = f"  {memory:.1f} MB" if memory is not None else ""
+            lines.append(f"{'  ' * node['depth']}{node['name']}"
+                         f"  {node.get('wall_s', 0):.3f}s"
+                         f"  cpu {node.get('cpu_s', 0):.3f}s{memory}"
+                         f"  rows {node.get('input_rows')} -> {node.get('output_rows')}")
+            # the concurrent children are listed in the order they started
+            for child in node["children"]:
+                add(child)
+
+        for root in self.tree():
+            add(root)
+        return "\n".join(lines)
+
+
+def rows(result):
+    """
+    Number of rows of a DataFrame, or of all the DataFrames of a dict
+    """
+    if isinstance(result, (pd.DataFrame, pd.Series)):
+        return len(result)
+    if isinstance(result, dict):
+        return sum(rows(value) or 0 for value in result.values())
+    return None
+
+
+def in_thread(function):
+    """
+    Return function, to be called in a pool of threads as a child of
+    the call in progress in this thread (see features.run_blocks
+    and Olist.get_data). Return function itself when the instrumentation
+    is disabled
+    """
+    if ACTIVE is None:
+        return function
+    return ACTIVE.in_thread(ACTIVE.current(), function)
+
+
+def profiled(key_argument: str = None):
+    """
+    Decorator recording the calls of a function in the active Profiler
+    :param key_argument: name of an argument added to the name of the call,
+    e.g. "key" for Olist.read_table(orders)
+    :type key_argument: str
+    :return: the decorator
+    """
+    def decorator(function):
+        name = function.__qualname__
+        position = None
+        if key_argument is not None:
+            position = list(inspect.signature(function).parameters).index(key_argument)
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if ACTIVE is None:
+                return function(*args, **kwargs)
+            call_name = name
+            if position is not None:
+                key = args[position] if len(args) > position else kwargs.get(key_argument)
+                call_name = f"{name}({key})"
+            return ACTIVE.call(call_name, lambda: function(*args, **kwargs))
+
+        return wrapper
+    return decorator
+
+
+def main():
+    print("The library profiling.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
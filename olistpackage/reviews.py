@@ -0,0 +1,369 @@
+import re
+import string
+import functools
+from itertools import repeat
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+from nltk.tokenize import word_tokenize
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.decomposition import LatentDirichletAllocation, NMF
+
+from olistpackage.session import Session
+
+
+# ASCII punctuation and digits, removed first
+# (remove_punctuation and remove_number), the other digits
+# (e.g. "²") are added for each batch
+REMOVED = string.punctuation + string.digits
+
+# ASCII punctuation left by unidecode (e.g. "…" -> "..."), the texts
+# containing some are tokenized by nltk like in the reviews notebook
+PUNCTUATION = re.compile(f"[{re.escape(string.punctuation)}]")
+
+# separator of the texts joined into one string, a Unicode noncharacter:
+# unchanged by the normalization and absent from the texts
+SEPARATOR = "\uffff"
+
+# words split by word_tokenize in the texts without punctuation
+# (the contractions of NLTKWordTokenizer.CONTRACTIONS2 without apostrophe)
+CONTRACTIONS = {
+    "cannot": "can not",
+    "gimme": "gim me",
+    "gonna": "gon na",
+    "gotta": "got ta",
+    "lemme": "lem me",
+    "wanna": "wan na",
+}
+
+# non-ASCII characters, replaced by unidecode
+NON_ASCII = re.compile(f"[^\\x00-\\x7f{SEPARATOR}]")
+
+# review_score bands of ReviewTopics: name -> (lowest, highest score)
+SCORE_BANDS = {
+    "negative": (1, 2),
+    "neutral": (3, 3),
+    "positive": (4, 5),
+}
+
+# topic models of ReviewTopics.topics
+TOPIC_MODELS = {
+    "lda": LatentDirichletAllocation,
+    "nmf": NMF,
+}
+
+
+@functools.lru_cache(maxsize=None)
+def stop_words(language: str = "portuguese") -> tuple:
+    """
+    Return the nltk stop words of a language,
+    the nltk stopwords corpus must be downloaded: nltk.download("stopwords")
+    :param language: e.g. "portuguese"
+    :type language: str
+    :return: a Python tuple of words
+    :rtype: tuple
+    """
+    from nltk.corpus import stopwords
+    return tuple(stopwords.words(language))
+
+
+def normalize_unique(texts: list, words: tuple) -> list:
+    """
+    Normalize distinct texts, see normalize
+    :param texts: a Python list of str
+    :type texts: list
+    :param words: the stop words
+    :type words: tuple
+    :return: a Python list of the normalized texts
+    :rtype: list
+    """
+    # each step runs once on all the texts, joined into one string
+    text = SEPARATOR.join(texts)
+
+    # remove_punctuation, lower_case, remove_number: one regular expression
+    # (no character becomes a digit or a punctuation when lower cased)
+    digits = "".join(c for c in set(text) if c.isdigit() and not c.isascii())
+    text = re.sub(f"[{re.escape(REMOVED + digits)}]", "", text).lower()
+
+    # remove_accents_diacritics: unidecode of each non-ASCII character
+    replaced = {c: unidecode(c) for c in set(NON_ASCII.findall(text))}
+    text = NON_ASCII.sub(lambda match: replaced[match.group()], text)
+
+    # tokenize and stop_words: without punctuation, word_tokenize splits
+    # a text on the white spaces and splits the CONTRACTIONS, then
+    # the stop words are removed: one substitution of the words
+    # between the white spaces, in one pass
+    stop = set(words)
+    replacements = dict.fromkeys(stop, "")
+    replacements.update({
+        word: " ".join(w for w in tokens.split() if w not in stop)
+        for word, tokens in CONTRACTIONS.items()})
+    pattern = re.compile(r"(?<!\S)(?:%s)(?!\S)" % "|".join(
+        re.escape(w) for w in sorted(replacements, key=len, reverse=True)))
+    cleaned = pattern.sub(lambda match: replacements[match.group()],
+                          text.replace(SEPARATOR, f" {SEPARATOR} "))
+
+    # strip_white_spaces
+    result = []
+    for original, tokens in zip(text.split(SEPARATOR), cleaned.split(SEPARATOR)):
+        if PUNCTUATION.search(original):
+            tokens = [w for w in word_tokenize(original) if w not in stop]
+        else:
+            tokens = tokens.split()
+        result.append(" ".join(tokens))
+    return result
+
+
+def normalize(texts: pd.Series,
+              words: tuple = None,
+              n_jobs: int = 1) -> pd.Series:
+    """
+    Normalize review texts like the clean function of the notebook
+    5_reviews_investigation: remove the punctuation, lower case,
+    remove the digits, remove the accents, tokenize, remove the stop words
+    and strip. Each distinct text is normalized once, and each step runs
+    on all the distinct texts at once with precompiled regular expressions
+    (the texts containing punctuation after unidecode, e.g. "…" -> "...",
+    are tokenized with nltk.word_tokenize, which needs the nltk punkt data)
+    :param texts: the texts, missing texts are normalized as ""
+    :type texts: pd.Series
+    :param words: the stop words, defaults to stop_words("portuguese")
+    :type words: tuple
+    :param n_jobs: number of processes normalizing the distinct texts
+    :type n_jobs: int
+    :return: the normalized texts, with the index of texts
+    :rtype: pd.Series
+    """
+    words = tuple(words) if words is not None else stop_words("portuguese")
+    codes, uniques = pd.factorize(texts.fillna("").astype(str))
+    uniques = list(uniques)
+
+    if n_jobs <= 1 or len(uniques) < 2 * n_jobs:
+        normalized = normalize_unique(uniques, words)
+    else:
+        chunks = np.array_split(np.arange(len(uniques)), n_jobs)
+        with ProcessPoolExecutor(max_workers=n_jobs) as executor:
+            results = executor.map(
+                normalize_unique,
+                [[uniques[i] for i in chunk] for chunk in chunks],
+                repeat(words))
+            normalized = [text for result in results for text in result]
+
+    return pd.Series(np.asarray(normalized, dtype=object)[codes],
+                     index=texts.index, name=texts.name)
+
+
+class Reviews:
+    """
+    The order reviews with their comments normalized for text analysis
+    """
+
+    def __init__(self, session: Session = None):
+        """
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        """
+        self.session = session if session is not None else Session.default()
+        self.data = self.session.source_data
+
+
+    def get_reviews(self,
+                    after_delivery: bool = True,
+                    words: tuple = None,
+                    n_jobs: int = 1) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with the following columns:
+        review_id, order_id, review_score, review_title_and_message,
+        clean_review
+        one row per review with a non empty clean_review
+        :param after_delivery: if True, keep the reviews written after
+        the delivery of the order only
+        :type after_delivery: bool
+        :param words: the stop words, see normalize
+        :type words: tuple
+        :param n_jobs: number of processes, see normalize
+        :type n_jobs: int
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        df = self.data['order_reviews'].merge(
+            self.data['orders'][['order_id', 'order_delivered_customer_date']],
+            on='order_id')
+        # customers could review an order before receiving it
+        if after_delivery:
+            df = df[df['review_creation_date'] >=
+                    df['order_delivered_customer_date']]
+
+        # combine review title and review message
+        df = df.assign(review_title_and_message=(
+            df['review_comment_title'].astype(object).fillna("") + " " +
+            df['review_comment_message'].astype(object).fillna("")))
+        df['clean_review'] = normalize(df['review_title_and_message'],
+                                       words, n_jobs)
+
+        # drop the empty reviews
+        df = df[df['clean_review'] != ""]
+        return df[['review_id', 'order_id', 'review_score',
+                   'review_title_and_message', 'clean_review']]\
+            .reset_index(drop=True)
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+class ReviewTopics:
+    """
+    Term weights and topics of the clean reviews, like the notebook
+    5_reviews_investigation, with the TF-IDF matrix kept sparse from
+    the vectorization to the term ranking and the topic models:
+    the memory depends on the number of non-zero entries of the matrix,
+    not on the number of reviews times the size of the vocabulary.
+
+    reviews = Reviews().get_reviews()
+    topics = ReviewTopics(ngram_range=(2, 2))
+    topics.fit(reviews['clean_review'], reviews['review_score'])
+    topics.top_terms_by_band()
+    topics.topics(n_topics=2, band="negative")
+    """
+
+    def __init__(self, bands: dict = None, **vectorizer_params):
+        """
+        :param bands: the review_score bands, defaults to SCORE_BANDS
+        :type bands: dict
+        :param vectorizer_params: parameters of TfidfVectorizer,
+        e.g. ngram_range=(2, 2), min_df=0.01, max_df=0.05
+        """
+        self.bands = bands if bands is not None else SCORE_BANDS
+        self.vectorizer = TfidfVectorizer(**vectorizer_params)
+
+
+    def fit(self, texts: pd.Series, scores: pd.Series = None) -> "ReviewTopics":
+        """
+        Compute the sparse TF-IDF matrix of the texts
+        :param texts: the clean reviews, see Reviews.get_reviews
+        :type texts: pd.Series
+        :param scores: the review_score of each text, for the bands
+        :type scores: pd.Series
+        :return: self
+        :rtype: ReviewTopics
+        """
+        # scipy.sparse CSR matrix, one row per text
+        self.matrix = self.vectorizer.fit_transform(texts)
+        self.terms = self.vectorizer.get_feature_names_out()
+        self.scores = None if scores is None else np.asarray(scores)
+        return self
+
+
+    def rows(self, band: str = None):
+        """
+        Return the rows of the TF-IDF matrix of a review_score band
+        :param band: a key of self.bands, all the rows if None
+        :type band: str
+        :return: the rows of the sparse matrix
+        :rtype: scipy.sparse.csr_matrix
+        """
+        if band is None:
+            return self.matrix
+        if self.scores is None:
+            raise ValueError("the bands need the scores, see ReviewTopics.fit")
+        lowest, highest = self.bands[band]
+        mask = (self.scores >= lowest) & (self.scores <= highest)
+        return self.matrix[np.flatnonzero(mask)]
+
+
+    def ranking(self, weights: np.ndarray, top: int) -> pd.core.frame.DataFrame:
+        """
+        Return the top terms of a vector of weights of the vocabulary,
+        sorted by decreasing weight, with the columns rank, term, weight
+        """
+        best = np.argsort(-weights, kind="stable")[:top]
+        return pd.DataFrame({"rank": np.arange(1, len(best) + 1),
+                             "term": self.terms[best],
+                             "weight": weights[best]})
+
+
+    def top_terms(self, top: int = 10, band: str = None) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with the following columns:
+        rank, term, weight
+        the terms with the largest sum of TF-IDF weights over the reviews
+        :param top: number of terms
+        :type top: int
+        :param band: a review_score band, all the reviews if None
+        :type band: str
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        # sum of the columns of the sparse matrix
+        weights = np.asarray(self.rows(band).sum(axis=0)).ravel()
+        return self.ranking(weights, top)
+
+
+    def top_terms_by_band(self, top: int = 10) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with the following columns:
+        band, rank, term, weight
+        the top terms of each review_score band
+        :param top: number of terms per band
+        :type top: int
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        return pd.concat([self.top_terms(top, band).assign(band=band)
+                          for band in self.bands], ignore_index=True)\
+            [["band", "rank", "term", "weight"]]
+
+
+    def topics(self,
+               n_topics: int = 2,
+               method: str = "lda",
+               top: int = 10,
+               band: str = None,
+               random_state: int = 0) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with the following columns:
+        topic, rank, term, weight
+        the top terms of each topic of a topic model fitted
+        on the sparse TF-IDF matrix
+        :param n_topics: number of topics
+        :type n_topics: int
+        :param method: "lda" (LatentDirichletAllocation) or "nmf"
+        :type method: str
+        :param top: number of terms per topic
+        :type top: int
+        :param band: a review_score band, all the reviews if None
+        :type band: str
+        :param random_state: seed of the topic model
+        :type random_state: int
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        if method not in TOPIC_MODELS:
+            raise ValueError(f"method must be one of {list(TOPIC_MODELS)}, not {method}")
+        self.model = TOPIC_MODELS[method](n_components=n_topics,
+                                          random_state=random_state)
+        self.model.fit(self.rows(band))
+        return pd.concat([self.ranking(weights, top).assign(topic=topic)
+                          for topic, weights in enumerate(self.model.components_)],
+                         ignore_index=True)[["topic", "rank", "term", "weight"]]
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+def main():
+    print("The library reviews.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
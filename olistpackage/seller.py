@@ -1,8 +1,14 @@
 import pandas as pd
 import numpy as np
 
-from olistpackage.data import Olist
 from olistpackage.order import Order
+from olistpackage.session import Session
+from olistpackage.features import feature, run_blocks, assemble
+
+
+# average length of a month (365.2425 / 12 days), the value of
+# np.timedelta64(1, 'M'), whose unit pandas 2 no longer accepts
+ONE_MONTH = np.timedelta64(2629746, 's')
 
 
 class Seller:
@@ -11,12 +17,19 @@ class Seller:
     and various properties of these sellers as columns
     """
 
-    def __init__(self):
+    def __init__(self, session: Session = None):
+        """
+        Attribute "data" : dict of dataframes (from Olist csv files),
+        shared with self.order and all the objects built from the same session
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        """
         # Import data only once
-        olist = Olist()
-        self.data = olist.get_data()
-        self.order = Order()
+        self.session = session if session is not None else Session.default()
+        self.data = self.session.data
+        self.order = Order(self.session)
 
+    @feature(tables={'sellers': ('seller_id', 'seller_city', 'seller_state')})
     def get_seller_features(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -24,12 +37,17 @@ class Seller:
         :return: a DataFrame with the specified columns
         :rtype: pd.core.frame.DataFrame
         """
-        # copy of sellers dataframe
-        sellers = self.data['sellers'].copy()
-        # remove the unwanted column and remove multiple rows per seller
-        return sellers.drop('seller_zip_code_prefix', axis=1).drop_duplicates()
+        # keep the wanted columns and remove multiple rows per seller
+        sellers = self.data['sellers'][['seller_id', 'seller_city', 'seller_state']]
+        return sellers.drop_duplicates()
 
 
+    @feature(tables={'order_items': ('order_id', 'seller_id',
+                                     'shipping_limit_date'),
+                     'orders': ('order_id', 'order_status',
+                                'order_purchase_timestamp',
+                                'order_delivered_carrier_date',
+                                'order_delivered_customer_date')})
     def get_seller_delay_wait_time(self)-> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -37,47 +55,39 @@ class Seller:
         :return: a DataFrame with the specified columns
         :rtype: pd.core.frame.DataFrame
         """
-        # copy of order_items and orders dataframes
-        order_items = self.data['order_items'].copy()
-        orders = self.data['orders'].query("order_status=='delivered'").copy()
+        # columns of order_items and delivered orders used below
+        order_items = self.data['order_items'][[
+            'order_id', 'seller_id', 'shipping_limit_date']]
+        orders = self.data['orders'].query("order_status=='delivered'")[[
+            'order_id', 'order_purchase_timestamp',
+            'order_delivered_carrier_date', 'order_delivered_customer_date']]
 
         # merge order_item and orders dataframes
         ship = order_items.merge(orders, on='order_id')
 
-        # convert dates to datetime type
-        for col in ['shipping_limit_date',
-                    'order_delivered_carrier_date',
-                    'order_delivered_customer_date',
-                    'order_purchase_timestamp']:
-            ship.loc[:, col] = pd.to_datetime(ship[col])
-
-        # compute delay_to_carrier
-        def delay_to_logistic_partner(df):
-            days = np.mean(
-                (df.order_delivered_carrier_date - df.shipping_limit_date) /
-                np.timedelta64(24, 'h'))
-            return days if days > 0 else 0
+        # compute delay_to_carrier and wait_time of each order item, in days
+        one_day_delta = np.timedelta64(24, 'h')
+        ship['delay_to_carrier'] = \
+            (ship['order_delivered_carrier_date'] -
+             ship['shipping_limit_date']) / one_day_delta
+        ship['wait_time'] = \
+            (ship['order_delivered_customer_date'] -
+             ship['order_purchase_timestamp']) / one_day_delta
 
-        delay = ship.groupby('seller_id')\
-                    .apply(delay_to_logistic_partner)\
-                    .reset_index()
-        delay.columns = ['seller_id', 'delay_to_carrier']
+        # average both per seller in a single grouped aggregation
+        df = ship.groupby('seller_id', as_index=False, observed=True)\
+            [['delay_to_carrier', 'wait_time']].mean()
 
-        # compute wait_time
-        def order_wait_time(df):
-            return np.mean(
-                (df.order_delivered_customer_date - df.order_purchase_timestamp)
-                / np.timedelta64(24, 'h'))
+        # set negative delays to zero,
+        # as well as the delays of the sellers without any carrier date
+        df['delay_to_carrier'] = df['delay_to_carrier']\
+            .where(df['delay_to_carrier'] > 0, 0)
 
-        wait = ship.groupby('seller_id')\
-                   .apply(order_wait_time)\
-                   .reset_index()
-        wait.columns = ['seller_id', 'wait_time']
-
-        # return delay dataframe merged with wait dataframe
-        return delay.merge(wait, on='seller_id')
+        return df
 
 
+    @feature(tables={'orders': ('order_id', 'order_approved_at'),
+                     'order_items': ('order_id', 'seller_id')})
     def get_active_dates(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -96,22 +106,20 @@ class Seller:
             .merge(self.data['order_items'], on='order_id')[[
                 'order_id', 'seller_id','order_approved_at']]
         orders_sellers.drop_duplicates()
-        orders_sellers["order_approved_at"] = pd.to_datetime(
-            orders_sellers["order_approved_at"])
 
         # Compute dates and return the wanted dataframe
         orders_sellers["date_first_sale"] = orders_sellers["order_approved_at"]
         orders_sellers["date_last_sale"] = orders_sellers["order_approved_at"]
-        df = orders_sellers.groupby('seller_id').agg({
+        df = orders_sellers.groupby('seller_id', observed=True).agg({
             "date_first_sale": min,
             "date_last_sale": max
         })
         df['months_on_olist'] = round(
-            (df['date_last_sale'] - df['date_first_sale']) /
-            np.timedelta64(1, 'M'))
+            (df['date_last_sale'] - df['date_first_sale']) / ONE_MONTH)
         return df.reset_index()
 
 
+    @feature(tables={'order_items': ('order_id', 'seller_id')})
     def get_quantity(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -123,13 +131,13 @@ class Seller:
         order_items = self.data['order_items']
 
         # compute the number of orders per seller
-        n_orders = order_items.groupby('seller_id')['order_id']\
+        n_orders = order_items.groupby('seller_id', observed=True)['order_id']\
             .nunique()\
             .reset_index()
         n_orders.columns = ['seller_id', 'n_orders']
 
         # compute the number of products per seller
-        quantity = order_items.groupby('seller_id', as_index=False).agg(
+        quantity = order_items.groupby('seller_id', as_index=False, observed=True).agg(
             {'order_id': 'count'})
         quantity.columns = ['seller_id', 'quantity']
 
@@ -139,6 +147,7 @@ class Seller:
         return df
 
 
+    @feature(tables={'order_items': ('seller_id', 'price')})
     def get_sales(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -148,11 +157,13 @@ class Seller:
         """
         # compute and return the total sales per seller
         return self.data['order_items'][['seller_id', 'price']]\
-            .groupby('seller_id')\
+            .groupby('seller_id', observed=True)\
             .sum()\
             .rename(columns={'price': 'sales'}).reset_index()
 
 
+    @feature(tables={'order_items': ('order_id', 'seller_id')},
+             depends_on=('Order.get_review_score',))
     def get_review_score(self) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with the following columns:
@@ -178,7 +189,7 @@ class Seller:
             1: 100, 2: 50, 3: 40, 4: 0, 5: 0
         })
         # compute for each seller the following means and sum
-        df_grouped_by_sellers = df.groupby('seller_id', as_index=False).agg({
+        df_grouped_by_sellers = df.groupby('seller_id', as_index=False, observed=True).agg({
             'dim_is_one_star': 'mean',
             'dim_is_five_star': 'mean',
             'review_score': 'mean',
@@ -193,7 +204,13 @@ class Seller:
         return df_grouped_by_sellers
 
 
-    def get_training_data(self) -> pd.core.frame.DataFrame:
+    @feature(depends_on=('Seller.get_seller_features',
+                         'Seller.get_seller_delay_wait_time',
+                         'Seller.get_active_dates',
+                         'Seller.get_review_score', 'Seller.get_quantity',
+                         'Seller.get_sales'),
+             ignore=('n_jobs',))
+    def get_training_data(self, n_jobs: int = 1) -> pd.core.frame.DataFrame:
         """
         Returns a DataFrame with with the following columns:
         seller_id, seller_city, seller_state, delay_to_carrier,
@@ -201,35 +218,21 @@ class Seller:
         share_of_one_stars, share_of_five_stars, review_score,
         cost_of_reviews, n_orders, quantity, quantity_per_order,
         sales, revenues, profits
+        :param n_jobs: number of feature methods computed at the same time,
+        see features.run_blocks
+        :type n_jobs: int
         :return: a DataFrame with the specified columns
         :rtype: pd.core.frame.DataFrame
         """
-        # merge the dataframes from the previous methods of this class
-        training_df =\
-            self.get_seller_features()\
-                .merge(
-                    self.get_seller_delay_wait_time(), on='seller_id'
-                ).merge(
-                    self.get_active_dates(), on='seller_id'
-                ).merge(
-                    self.get_review_score(), on='seller_id'
-                ).merge(
-                    self.get_quantity(), on='seller_id'
-                ).merge(
-                self.get_sales(), on='seller_id'
-                )
-
-        # add seller economics (revenues, profits)
-        olist_monthly_fee = 80
-        olist_sales_cut = 0.1
-
-        training_df['revenues'] = training_df['months_on_olist'] * olist_monthly_fee\
-            + olist_sales_cut * training_df['sales']
-
-        training_df['profits'] = training_df['revenues'] - training_df[
-            'cost_of_reviews']
-
-        return training_df
+        # merge the blocks in the order of the list
+        return assemble_training_data(*run_blocks([
+            self.get_seller_features,
+            self.get_seller_delay_wait_time,
+            self.get_active_dates,
+            self.get_review_score,
+            self.get_quantity,
+            self.get_sales,
+        ], n_jobs))
 
 
     def ping(self):
@@ -239,6 +242,39 @@ class Seller:
         return "PONG"
 
 
+def assemble_training_data(features: pd.DataFrame,
+                           delay_wait_time: pd.DataFrame,
+                           active_dates: pd.DataFrame,
+                           review_score: pd.DataFrame,
+                           quantity: pd.DataFrame,
+                           sales: pd.DataFrame) -> pd.core.frame.DataFrame:
+    """
+    Merge the per-seller DataFrames returned by the Seller methods
+    get_seller_features, get_seller_delay_wait_time, get_active_dates,
+    get_review_score, get_quantity and get_sales,
+    and add the seller economics (revenues, profits)
+    :return: a DataFrame with the columns of Seller.get_training_data
+    :rtype: pd.core.frame.DataFrame
+    """
+    # join the dataframes from the methods of the Seller class on seller_id
+    training_df = assemble(
+        [features, delay_wait_time, active_dates,
+         review_score, quantity, sales],
+        on='seller_id')
+
+    # add seller economics (revenues, profits)
+    olist_monthly_fee = 80
+    olist_sales_cut = 0.1
+
+    training_df['revenues'] = training_df['months_on_olist'] * olist_monthly_fee\
+        + olist_sales_cut * training_df['sales']
+
+    training_df['profits'] = training_df['revenues'] - training_df[
+        'cost_of_reviews']
+
+    return training_df
+
+
 def main():
     print("The library seller.py has been ran directly.")
 
@@ -0,0 +1,228 @@
+from olistpackage.data import Olist, LazyData
+from olistpackage.geo import ZipIndex
+from olistpackage.ids import EncodedData
+from olistpackage.features import FeatureCache, required_columns
+
+
+class Session:
+    """
+    A shared dataset context: the Olist tables are read once
+    and shared by every Order, Seller and Product built from the session.
+    The tables are shared read-only: the feature methods never modify them.
+    """
+
+    # the session used by Order(), Seller() and Product()
+    # when no session is given
+    _default = None
+
+    # backends of the feature methods, see the engine parameter
+    ENGINES = ("pandas", "duckdb")
+
+    def __init__(self,
+                 data=None,
+                 feature_cache: bool = True,
+                 cache_bytes: int = 512 * 2**20,
+                 encode_ids: bool = False,
+                 engine: str = "pandas",
+                 used_features: list = None):
+        """
+        Attribute "data" : dict of dataframes (from Olist csv files),
+        each table is read the first time it is used
+        Attribute "features" : the FeatureCache of the results of the
+        feature methods, or None
+        :param data: a Python dict of dataframes with the same keys as
+        Olist().get_data(), defaults to Olist().get_data(lazy=True)
+        :type data: dict
+        :param feature_cache: if True, cache the results of the feature
+        methods of Order, Seller and Product (see features.FeatureCache)
+        :type feature_cache: bool
+        :param cache_bytes: memory budget of the feature cache, in bytes
+        :type cache_bytes: int
+        :param encode_ids: if True, the feature methods join and group the
+        order, customer, seller and product ids as int32 codes of a shared
+        dictionary (Attribute "ids", see ids.IdDictionary), and their
+        results hold the original ids
+        :type encode_ids: bool
+        :param engine: "pandas", or "duckdb" to run the feature methods as
+        SQL queries in DuckDB (Attribute "sql", see sql.DuckDBEngine),
+        with the same results
+        :type engine: str
+        :param used_features: names of the feature methods used with this session,
+        e.g. ["Seller.get_training_data"]: when data is None, the tables are
+        read with only the columns used by these methods and their
+        dependencies (see features.required_columns), the other methods
+        may miss columns. All the columns are read if None
+        :type used_features: list
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"engine must be one of {self.ENGINES}, got {engine!r}")
+        if data is None:
+            columns = None
+            if used_features is not None:
+                columns = required_columns(used_features)
+            data = Olist().get_data(lazy=True, columns=columns)
+        self.data = data
+        if encode_ids and not isinstance(self.data, EncodedData):
+            self.data = EncodedData(self.data)
+        self.ids = self.data.ids if isinstance(self.data, EncodedData) else None
+        self.engine = engine
+        self.sql = None
+        if engine == "duckdb":
+            from olistpackage.sql import DuckDBEngine
+            self.sql = DuckDBEngine(self)
+        self.features = FeatureCache(cache_bytes) if feature_cache else None
+        self._zip_indexes = {}
+
+
+    @classmethod
+    def default(cls) -> "Session":
+        """
+        Return the session shared by all the objects
+        built without an explicit session, create it on the first call
+        :return: the default session
+        :rtype: Session
+        """
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+
+    @classmethod
+    def reset_default(cls) -> None:
+        """
+        Drop the default session, e.g. after the csv files changed:
+        the next call to Session.default() reads the tables again
+        :return: None
+        """
+        cls._default = None
+
+
+    def zip_index(self, agg: str = "first") -> ZipIndex:
+        """
+        Return the geolocation zip code prefix index, built once per session.
+        When the tables come from Olist().get_data(lazy=True) with the cache,
+        the index is also stored with the data cache (see ZipIndex.cached),
+        unless the geolocation table was replaced with Session.update_table
+        :param agg: "first", "mean" or "median"
+        :type agg: str
+        :return: the index
+        :rtype: ZipIndex
+        """
+        if agg not in self._zip_indexes:
+            data = self.source_data
+            # a table replaced in memory is not the one of the data cache
+            if isinstance(data, LazyData) and data.use_cache \
+                    and 'geolocation' not in data.replaced:
+                self._zip_indexes[agg] = ZipIndex.cached(data, agg)
+            else:
+                self._zip_indexes[agg] = ZipIndex.from_geolocation(
+                    data['geolocation'], agg)
+        return self._zip_indexes[agg]
+
+
+    def cache_path(self) -> str:
+        """
+        Return the data cache directory of the tables (see Olist.cache_path)
+        when they come from Olist(...).get_data(lazy=True) with the cache,
+        None otherwise: the tables in memory have no place to persist results
+        :return: a directory path, or None
+        :rtype: str
+        """
+        data = self.source_data
+        if isinstance(data, LazyData) and data.use_cache:
+            return data.olist.cache_path()
+        return None
+
+
+    @property
+    def source_data(self):
+        """
+        The tables with the original ids: self.data,
+        or the tables encoded by self.data when encode_ids is True
+        """
+        return self.data.source if self.ids is not None else self.data
+
+
+    def update_table(self, key: str, df) -> None:
+        """
+        Replace a table, and drop everything computed from it
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :param df: the new DataFrame of the table
+        :type df: pd.DataFrame
+        :return: None
+        """
+        if isinstance(self.data, (LazyData, EncodedData)):
+            self.data.replace(key, df)
+        else:
+            self.data[key] = df
+        self.invalidate([key])
+
+
+    def reload(self, keys=None) -> None:
+        """
+        Read some tables again from the csv files (or the data cache)
+        the next time they are used, and drop everything computed from them.
+        Only for the tables from Olist().get_data(lazy=True)
+        :param keys: table names, all the tables if None
+        :type keys: list
+        :return: None
+        """
+        keys = list(self.data) if keys is None else keys
+        self.data.unload(keys)
+        self.invalidate(keys)
+
+
+    def invalidate(self, keys) -> None:
+        """
+        Drop the cached results computed from some tables
+        :param keys: table names
+        :type keys: list
+        :return: None
+        """
+        if self.features is not None:
+            self.features.invalidate(keys)
+        if 'geolocation' in keys:
+            self._zip_indexes = {}
+
+
+    def order(self):
+        """
+        Return an Order built from this session
+        :rtype: Order
+        """
+        from olistpackage.order import Order
+        return Order(self)
+
+
+    def seller(self):
+        """
+        Return a Seller built from this session
+        :rtype: Seller
+        """
+        from olistpackage.seller import Seller
+        return Seller(self)
+
+
+    def product(self):
+        """
+        Return a Product built from this session
+        :rtype: Product
+        """
+        from olistpackage.product import Product
+        return Product(self)
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+def main():
+    print("The library session.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,482 @@
+import os
+
+import duckdb
+import numpy as np
+import pandas as pd
+
+from olistpackage.data import LazyData, DATETIME_FORMAT
+from olistpackage.geo import AVG_EARTH_RADIUS_KM
+from olistpackage.features import required_tables
+
+
+# The feature methods of Order, Seller and Product as SQL queries
+# over the Olist tables, run by DuckDBEngine (Session(engine="duckdb")).
+# Each query gives the same rows and columns as the pandas method.
+
+
+def literal(value: str) -> str:
+    """
+    SQL string literal of a value, e.g. a file path containing quotes
+    (the views of the tables cannot have prepared parameters)
+    """
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+def identifier(name: str) -> str:
+    """
+    SQL quoted identifier of a column name
+    """
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def days(start: str, end: str) -> str:
+    """
+    SQL expression of the duration between two timestamps, in days
+    """
+    return f"(epoch_us({end}) - epoch_us({start})) / 86400e6"
+
+
+def not_null(columns: list) -> str:
+    """
+    SQL condition of the rows without NULL, as DataFrame.dropna()
+    """
+    return " AND ".join(f"{column} IS NOT NULL" for column in columns)
+
+
+# cost of a review of each score, see Seller.get_review_score
+REVIEW_COST = "CASE review_score WHEN 1 THEN 100 WHEN 2 THEN 50 WHEN 3 THEN 40 " \
+              "WHEN 4 THEN 0 WHEN 5 THEN 0 END"
+
+# average number of seconds in a month, as seller.ONE_MONTH
+SECONDS_PER_MONTH = 2629746
+
+
+def order_wait_time(is_delivered: bool = True) -> str:
+    where = "WHERE order_status = 'delivered'" if is_delivered else ""
+    return f"""
+        SELECT order_id, wait_time, expected_wait_time,
+               CASE WHEN delay_vs_expected < 0 THEN 0
+                    ELSE delay_vs_expected END AS delay_vs_expected,
+               order_status
+        FROM (
+            SELECT order_id, order_status,
+                   {days('order_purchase_timestamp', 'order_delivered_customer_date')}
+                       AS wait_time,
+                   {days('order_purchase_timestamp', 'order_estimated_delivery_date')}
+                       AS expected_wait_time,
+                   {days('order_estimated_delivery_date', 'order_delivered_customer_date')}
+                       AS delay_vs_expected
+            FROM orders {where}
+        )"""
+
+
+def order_review_score() -> str:
+    return """
+        SELECT order_id,
+               CASE WHEN review_score = 5 THEN 1 ELSE 0 END AS dim_is_five_star,
+               CASE WHEN review_score = 1 THEN 1 ELSE 0 END AS dim_is_one_star,
+               review_score
+        FROM order_reviews"""
+
+
+def order_number_products() -> str:
+    return """
+        SELECT order_id, count(product_id) AS number_of_products
+        FROM order_items GROUP BY order_id"""
+
+
+def order_number_sellers() -> str:
+    return """
+        SELECT order_id, count(DISTINCT seller_id) AS number_of_sellers
+        FROM order_items GROUP BY order_id"""
+
+
+def order_price_and_freight() -> str:
+    return """
+        SELECT order_id, coalesce(sum(price), 0) AS price,
+               coalesce(sum(freight_value), 0) AS freight_value
+        FROM order_items GROUP BY order_id"""
+
+
+def order_distance_seller_customer(agg: str = "first", use_cache: bool = True) -> str:
+    # the coordinates of the zip code prefixes come from the ZipIndex of
+    # the session ("zip_index" table, see DuckDBEngine.run), the distances
+    # are computed by the query, without the DistanceCache
+    radians = {f"{v}_{who}": f"radians(z{who[0]}.{v})"
+               for v in ("lat", "lng") for who in ("seller", "customer")}
+    # (lng, lat) in place of (lat, lng), as DistanceCache.compute
+    lat1, lng1 = radians["lng_seller"], radians["lat_seller"]
+    lat2, lng2 = radians["lng_customer"], radians["lat_customer"]
+    haversine = f"""2 * {AVG_EARTH_RADIUS_KM} * asin(sqrt(
+                   pow(sin(({lat2} - {lat1}) * 0.5), 2)
+                   + cos({lat1}) * cos({lat2}) * pow(sin(({lng2} - {lng1}) * 0.5), 2)))"""
+    return f"""
+        WITH customers_and_sellers AS (
+            SELECT order_id, seller_zip_code_prefix, customer_zip_code_prefix
+            FROM customers
+            JOIN orders USING (customer_id)
+            JOIN order_items USING (order_id)
+            JOIN sellers USING (seller_id)
+        ), pairs AS (
+            SELECT seller_zip_code_prefix, customer_zip_code_prefix,
+                   {haversine} AS distance_seller_customer
+            FROM (SELECT DISTINCT seller_zip_code_prefix, customer_zip_code_prefix
+                  FROM customers_and_sellers) AS p
+            JOIN zip_index AS zs ON zs.prefix = p.seller_zip_code_prefix
+            JOIN zip_index AS zc ON zc.prefix = p.customer_zip_code_prefix
+        )
+        SELECT order_id, avg(distance_seller_customer) AS distance_seller_customer
+        FROM customers_and_sellers
+        JOIN pairs USING (seller_zip_code_prefix, customer_zip_code_prefix)
+        GROUP BY order_id"""
+
+
+ORDER_TRAINING_COLUMNS = [
+    'order_id', 'wait_time', 'expected_wait_time', 'delay_vs_expected',
+    'order_status', 'dim_is_five_star', 'dim_is_one_star', 'review_score',
+    'number_of_products', 'number_of_sellers', 'price', 'freight_value'
+]
+
+
+def order_training_data(is_delivered: bool = True,
+                        with_distance_seller_customer: bool = False) -> str:
+    blocks = {
+        "wait_time": order_wait_time(is_delivered),
+        "review_score": order_review_score(),
+        "number_products": order_number_products(),
+        "number_sellers": order_number_sellers(),
+        "price_and_freight": order_price_and_freight(),
+    }
+    columns = list(ORDER_TRAINING_COLUMNS)
+    if with_distance_seller_customer:
+        blocks["distance"] = order_distance_seller_customer()
+        columns.append('distance_seller_customer')
+    ctes = ",\n".join(f"{name} AS ({query})" for name, query in blocks.items())
+    first, *others = blocks
+    joins = "\n".join(f"JOIN {name} USING (order_id)" for name in others)
+    return f"""
+        WITH {ctes}
+        SELECT * FROM {first}
+        {joins}
+        WHERE {not_null(columns)}"""
+
+
+def seller_features() -> str:
+    return """
+        SELECT DISTINCT seller_id, seller_city, seller_state FROM sellers"""
+
+
+def seller_delay_wait_time() -> str:
+    return f"""
+        SELECT seller_id,
+               CASE WHEN avg(delay_to_carrier) > 0 THEN avg(delay_to_carrier)
+                    ELSE 0 END AS delay_to_carrier,
+               avg(wait_time) AS wait_time
+        FROM (
+            SELECT seller_id,
+                   {days('shipping_limit_date', 'order_delivered_carrier_date')}
+                       AS delay_to_carrier,
+                   {days('order_purchase_timestamp', 'order_delivered_customer_date')}
+                       AS wait_time
+            FROM order_items
+            JOIN orders USING (order_id)
+            WHERE order_status = 'delivered'
+        )
+        GROUP BY seller_id"""
+
+
+def seller_active_dates() -> str:
+    return f"""
+        SELECT seller_id, date_first_sale, date_last_sale,
+               round_even((epoch_us(date_last_sale) - epoch_us(date_first_sale))
+                          / {SECONDS_PER_MONTH}e6, 0) AS months_on_olist
+        FROM (
+            SELECT seller_id, min(order_approved_at) AS date_first_sale,
+                   max(order_approved_at) AS date_last_sale
+            FROM orders JOIN order_items USING (order_id)
+            GROUP BY seller_id
+        )"""
+
+
+def quantity(key: str) -> str:
+    return f"""
+        SELECT {key}, count(DISTINCT order_id) AS n_orders,
+               count(order_id) AS quantity
+        FROM order_items GROUP BY {key}"""
+
+
+def seller_quantity() -> str:
+    return f"""
+        SELECT *, CAST(quantity AS DOUBLE) / n_orders AS quantity_per_order
+        FROM ({quantity('seller_id')})"""
+
+
+def sales(key: str) -> str:
+    return f"""
+        SELECT {key}, coalesce(sum(price), 0) AS sales
+        FROM order_items GROUP BY {key}"""
+
+
+def review_score(key: str) -> str:
+    return f"""
+        SELECT {key},
+               avg(dim_is_one_star) AS share_of_one_stars,
+               avg(dim_is_five_star) AS share_of_five_stars,
+               avg(review_score) AS review_score,
+               coalesce(sum({REVIEW_COST}), 0) AS cost_of_reviews
+        FROM (SELECT DISTINCT order_id, {key} FROM order_items)
+        JOIN ({order_review_score()}) USING (order_id)
+        GROUP BY {key}"""
+
+
+def training_data(key: str, blocks: dict, economics: str) -> str:
+    """
+    Inner join of the blocks on key, with the economics columns
+    """
+    ctes = ",\n".join(f"{name} AS ({query})" for name, query in blocks.items())
+    first, *others = blocks
+    joins = "\n".join(f"JOIN {name} USING ({key})" for name in others)
+    return f"""
+        WITH {ctes}
+        SELECT *, {economics}
+        FROM (SELECT * FROM {first} {joins})"""
+
+
+def seller_training_data() -> str:
+    return training_data("seller_id", {
+        "features": seller_features(),
+        "delay_wait_time": seller_delay_wait_time(),
+        "active_dates": seller_active_dates(),
+        "review_score": review_score("seller_id"),
+        "quantity": seller_quantity(),
+        "sales": sales("seller_id"),
+    }, """months_on_olist * 80 + 0.1 * sales AS revenues,
+          months_on_olist * 80 + 0.1 * sales - cost_of_reviews AS profits""")
+
+
+def product_features() -> str:
+    return """
+        SELECT product_id,
+               product_name_lenght AS product_name_length,
+               product_description_lenght AS product_description_length,
+               product_photos_qty, product_weight_g, product_length_cm,
+               product_height_cm, product_width_cm,
+               product_category_name_english AS category
+        FROM products
+        JOIN product_category_name_translation USING (product_category_name)"""
+
+
+def product_price() -> str:
+    return """
+        SELECT product_id, avg(price) AS price
+        FROM order_items GROUP BY product_id"""
+
+
+def product_wait_time() -> str:
+    return f"""
+        SELECT product_id, avg(wait_time) AS wait_time
+        FROM order_items JOIN ({order_wait_time()}) USING (order_id)
+        GROUP BY product_id"""
+
+
+PRODUCT_TRAINING_COLUMNS = [
+    'product_id', 'product_name_length', 'product_description_length',
+    'product_photos_qty', 'product_weight_g', 'product_length_cm',
+    'product_height_cm', 'product_width_cm', 'category', 'wait_time', 'price',
+    'share_of_one_stars', 'share_of_five_stars', 'review_score',
+    'cost_of_reviews', 'n_orders', 'quantity', 'sales', 'revenues', 'profits'
+]
+
+
+def product_training_data() -> str:
+    return training_data("product_id", {
+        "features": product_features(),
+        "wait_time": product_wait_time(),
+        "price": product_price(),
+        "review_score": review_score("product_id"),
+        "quantity": quantity("product_id"),
+        "sales": sales("product_id"),
+    }, """0.1 * sales AS revenues, 0.1 * sales - cost_of_reviews AS profits""")
+
+
+# SQL aggregate function of each pandas aggregation name
+AGGREGATES = {"mean": "avg", "median": "median", "sum": "sum", "min": "min",
+              "max": "max", "std": "stddev_samp", "var": "var_samp"}
+
+
+def product_cat(agg: str = "mean") -> str:
+    if agg not in AGGREGATES:
+        raise ValueError(f"agg must be one of {list(AGGREGATES)}, got {agg!r}")
+    columns = [c for c in PRODUCT_TRAINING_COLUMNS
+               if c not in ('product_id', 'category')]
+    aggregates = ",\n".join(
+        f"{'sum' if c == 'quantity' else AGGREGATES[agg]}({c}) AS {c}"
+        for c in columns)
+    return f"""
+        SELECT category, {aggregates}
+        FROM ({product_training_data()})
+        GROUP BY category"""
+
+
+# feature method -> function returning its SQL query,
+# called with the arguments of the method
+QUERIES = {
+    "Order.get_wait_time": order_wait_time,
+    "Order.get_review_score": order_review_score,
+    "Order.get_number_products": order_number_products,
+    "Order.get_number_sellers": order_number_sellers,
+    "Order.get_price_and_freight": order_price_and_freight,
+    "Order.get_distance_seller_customer": order_distance_seller_customer,
+    "Order.get_training_data": order_training_data,
+    "Seller.get_seller_features": seller_features,
+    "Seller.get_seller_delay_wait_time": seller_delay_wait_time,
+    "Seller.get_active_dates": seller_active_dates,
+    "Seller.get_quantity": lambda: seller_quantity(),
+    "Seller.get_sales": lambda: sales("seller_id"),
+    "Seller.get_review_score": lambda: review_score("seller_id"),
+    "Seller.get_training_data": seller_training_data,
+    "Product.get_product_features": product_features,
+    "Product.get_price": product_price,
+    "Product.get_wait_time": product_wait_time,
+    "Product.get_quantity": lambda: quantity("product_id"),
+    "Product.get_sales": lambda: sales("product_id"),
+    "Product.get_review_score": lambda: review_score("product_id"),
+    "Product.get_training_data": product_training_data,
+    "Product.get_product_cat": product_cat,
+}
+
+# key column of the result of each feature method: the rows are sorted
+# by key, as the pandas groupby; get_product_cat returns it as index
+KEYS = {name: name.split(".")[0].lower() + "_id" for name in QUERIES}
+KEYS["Product.get_product_cat"] = "category"
+
+
+class DuckDBEngine:
+    """
+    Runs the feature methods of Order, Seller and Product as SQL queries
+    (see QUERIES) in an in-process DuckDB database: the queries are
+    multi-threaded, filter the rows while scanning and can spill to disk.
+    The tables are read from the parquet cache or the csv files
+    of the Olist dataset, or from the DataFrames already in memory
+    (e.g. the tables replaced by Session.update_table)
+    """
+
+    def __init__(self,
+                 session,
+                 threads: int = None,
+                 memory_limit: str = None,
+                 temp_directory: str = None):
+        """
+        :param session: the dataset context
+        :type session: Session
+        :param threads: number of threads of DuckDB, defaults to the number of cores
+        :type threads: int
+        :param memory_limit: memory limit of DuckDB, e.g. "4GB",
+        beyond which the queries spill to temp_directory
+        :type memory_limit: str
+        :param temp_directory: directory of the spilled data
+        :type temp_directory: str
+        """
+        self.session = session
+        self.connection = duckdb.connect()
+        if threads is not None:
+            self.connection.execute(f"SET threads = {int(threads)}")
+        if memory_limit is not None:
+            self.connection.execute(f"SET memory_limit = {literal(memory_limit)}")
+        if temp_directory is not None:
+            self.connection.execute(f"SET temp_directory = {literal(temp_directory)}")
+
+
+    def source(self, key: str):
+        """
+        Return the source of the table "key": the path of its parquet cache
+        if up to date, else of its csv file, for the tables of a LazyData
+        not read yet, else the DataFrame
+        :param key: name of the table, e.g. "orders"
+        :type key: str
+        :return: a path or a DataFrame
+        """
+        data = self.session.source_data
+        if isinstance(data, LazyData) and key not in data.loaded():
+            olist = data.olist
+            if data.use_cache and data.optimize_dtypes:
+                path = olist.cache_file(key)
+                if path is not None:
+                    return path
+            return os.path.join(olist.csv_path(), olist.csv_files()[key])
+        return data[key]
+
+
+    def register(self, cursor, key: str, source) -> None:
+        """
+        Create the view "key" of a table in a cursor,
+        with the categorical columns of a DataFrame as strings,
+        and for a file only the columns read by the LazyData
+        of the session (see Session(used_features=...))
+        """
+        if isinstance(source, pd.DataFrame):
+            cursor.register(f"{key}_frame", source)
+            casts = [f"CAST({column} AS VARCHAR) AS {column}"
+                     for column, dtype in source.dtypes.items()
+                     if isinstance(dtype, pd.CategoricalDtype)]
+            replace = f" REPLACE ({', '.join(casts)})" if casts else ""
+            query = f"SELECT *{replace} FROM {key}_frame"
+        else:
+            data = self.session.source_data
+            columns = data.columns.get(key) if isinstance(data, LazyData) else None
+            select = "*" if columns is None else \
+                ", ".join(identifier(column) for column in columns)
+            if source.endswith(".parquet"):
+                query = f"SELECT {select} FROM read_parquet({literal(source)})"
+            else:
+                query = f"SELECT {select} FROM read_csv({literal(source)}, " \
+                        f"header=true, timestampformat={literal(DATETIME_FORMAT)})"
+        cursor.execute(f"CREATE TEMP VIEW {key} AS {query}")
+
+
+    def run(self, name: str, arguments: dict) -> pd.DataFrame:
+        """
+        Run the query of a feature method
+        :param name: name of the feature method, e.g. "Order.get_wait_time"
+        :type name: str
+        :param arguments: the arguments of the method,
+        without the arguments which do not change the result
+        :type arguments: dict
+        :return: the result of the method
+        :rtype: pd.DataFrame
+        """
+        query = QUERIES[name](**arguments)
+        # one cursor per call, the feature methods may run in several threads
+        cursor = self.connection.cursor()
+        try:
+            for key in required_tables(name):
+                self.register(cursor, key, self.source(key))
+            if 'zip_index' in query:
+                zip_index = self.session.zip_index(arguments.get('agg', 'first'))
+                self.register(cursor, "zip_index", pd.DataFrame({
+                    "prefix": zip_index.prefixes,
+                    "lat": zip_index.lat.astype(np.float64),
+                    "lng": zip_index.lng.astype(np.float64),
+                }).dropna())
+            key = KEYS[name]
+            df = cursor.execute(f"SELECT * FROM ({query}) ORDER BY {key}").df()
+        finally:
+            cursor.close()
+        if name == "Product.get_product_cat":
+            df = df.set_index(key)
+        return df
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+def main():
+    print("The library sql.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
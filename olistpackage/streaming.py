@@ -0,0 +1,209 @@
+import os
+import json
+import shutil
+from collections import ChainMap
+
+import pandas as pd
+
+from olistpackage.data import Olist, LazyData, apply_schema, iter_csv
+from olistpackage.session import Session
+from olistpackage.incremental import IncrementalAggregates
+
+
+# tables read in chunks and split by order_id,
+# the other tables (sellers, products, customers...) are read as usual
+STREAMED_TABLES = ("orders", "order_items", "order_reviews")
+
+
+class StreamingTrainingData:
+    """
+    Training data on order tables larger than the memory.
+    The orders, order_items and order_reviews csv files are read in chunks
+    of rows and split into partitions by a hash of order_id, so that
+    all the rows of an order are in the same partition. The partitions are
+    then processed one at a time: the per-order training data is written
+    per partition, and the seller and product aggregates are folded into
+    an IncrementalAggregates. The peak memory depends on the chunk size
+    and on the size of a partition, not on the size of the dataset.
+    """
+
+    def __init__(self,
+                 session: Session = None,
+                 chunksize: int = 100_000,
+                 n_partitions: int = 16,
+                 path: str = None):
+        """
+        :param session: the dataset context of the other tables,
+        defaults to Session.default(); its orders, order_items and
+        order_reviews tables are never read
+        :type session: Session
+        :param chunksize: number of csv rows read at once
+        :type chunksize: int
+        :param n_partitions: number of partitions, the larger the dataset
+        the more partitions are needed to fit one partition in memory
+        :type n_partitions: int
+        :param path: directory of the partitions and of the outputs,
+        defaults to root/data/cache/streaming
+        :type path: str
+        """
+        self.session = session if session is not None else Session.default()
+        data = self.session.source_data
+        self.olist = data.olist if isinstance(data, LazyData) else Olist()
+        self.chunksize = chunksize
+        self.n_partitions = n_partitions
+        self.path = path if path is not None else os.path.join(
+            self.olist.cache_path(), "streaming")
+
+
+    def fingerprint(self) -> dict:
+        """
+        Return the fingerprint of the partitions:
+        the number of partitions and the fingerprints of the csv files
+        :rtype: dict
+        """
+        return {
+            "n_partitions": self.n_partitions,
+            "csv": {key: self.olist.csv_fingerprint(key, with_hash=False)
+                    for key in STREAMED_TABLES},
+        }
+
+
+    def partition(self, force: bool = False) -> None:
+        """
+        Split the orders, order_items and order_reviews csv files
+        into partitions of parquet files:
+        path/partitions/<table>/<partition>/<chunk>.parquet
+        Nothing is done if the partitions of the same csv files already exist.
+        :param force: if True, split the csv files again
+        :type force: bool
+        :return: None
+        """
+        partitions_path = os.path.join(self.path, "partitions")
+        manifest_path = os.path.join(partitions_path, "manifest.json")
+        if not force and os.path.exists(manifest_path):
+            with open(manifest_path) as f:
+                if json.load(f) == self.fingerprint():
+                    return None
+
+        if os.path.exists(partitions_path):
+            shutil.rmtree(partitions_path)
+        for key in STREAMED_TABLES:
+            csv_path = os.path.join(self.olist.csv_path(),
+                                    self.olist.csv_files()[key])
+            for i, chunk in enumerate(iter_csv(csv_path, key, self.chunksize)):
+                partitions = pd.util.hash_pandas_object(
+                    chunk['order_id'].astype(str), index=False) % self.n_partitions
+                for p in range(self.n_partitions):
+                    part = chunk[(partitions == p).to_numpy()]
+                    # keep one (possibly empty) file of each partition,
+                    # with the columns of the table
+                    if len(part) == 0 and i > 0:
+                        continue
+                    partition_path = os.path.join(partitions_path, key, f"{p:04d}")
+                    os.makedirs(partition_path, exist_ok=True)
+                    part.to_parquet(
+                        os.path.join(partition_path, f"{i:06d}.parquet"),
+                        index=False)
+
+        # the manifest is written last: partitions without manifest are incomplete
+        Olist._write_json(manifest_path, self.fingerprint())
+
+
+    def read_partition(self, p: int) -> dict:
+        """
+        Read one partition of the orders, order_items and order_reviews tables
+        :param p: the partition, from 0 to n_partitions - 1
+        :type p: int
+        :return: a Python dict of DataFrames with the keys
+        orders, order_items and order_reviews
+        :rtype: dict
+        """
+        data = {}
+        for key in STREAMED_TABLES:
+            partition_path = os.path.join(self.path, "partitions", key, f"{p:04d}")
+            chunks = [pd.read_parquet(os.path.join(partition_path, file))
+                      for file in sorted(os.listdir(partition_path))]
+            # the categories differ from a chunk to the other
+            data[key] = apply_schema(pd.concat(chunks, ignore_index=True), key)
+        return data
+
+
+    def sessions(self):
+        """
+        Partition the csv files if needed, then return an iterator
+        of the same Session, holding one partition at a time
+        :return: an iterator of (partition, session)
+        """
+        self.partition()
+        # the partition tables, and the other tables of self.session
+        session = Session(ChainMap({}, self.session.source_data))
+        for p in range(self.n_partitions):
+            for key, df in self.read_partition(p).items():
+                session.update_table(key, df)
+            yield p, session
+
+
+    def order_training_data(self,
+                            output_path: str = None,
+                            is_delivered: bool = True,
+                            with_distance_seller_customer: bool = False) -> str:
+        """
+        Write Order().get_training_data() of each partition
+        in output_path/<partition>.parquet.
+        pd.read_parquet(output_path) reads the whole training data.
+        :param output_path: the output directory,
+        defaults to path/order_training_data
+        :type output_path: str
+        :param is_delivered: see Order.get_training_data
+        :type is_delivered: bool
+        :param with_distance_seller_customer: see Order.get_training_data
+        :type with_distance_seller_customer: bool
+        :return: the output directory
+        :rtype: str
+        """
+        output_path = output_path if output_path is not None else \
+            os.path.join(self.path, "order_training_data")
+        if os.path.exists(output_path):
+            shutil.rmtree(output_path)
+        os.makedirs(output_path)
+
+        for p, session in self.sessions():
+            df = session.order().get_training_data(
+                is_delivered, with_distance_seller_customer)
+            # the categories differ from a partition to the other
+            for column in df.select_dtypes('category'):
+                df[column] = df[column].astype(str)
+            df.to_parquet(os.path.join(output_path, f"{p:04d}.parquet"),
+                          index=False)
+        return output_path
+
+
+    def aggregates(self) -> IncrementalAggregates:
+        """
+        Fold the partitions into the seller and product aggregates,
+        see IncrementalAggregates.seller_training_data and
+        IncrementalAggregates.product_training_data
+        :return: the aggregates
+        :rtype: IncrementalAggregates
+        """
+        aggregates = IncrementalAggregates(self.session, keep_orders=False)
+        for _, session in self.sessions():
+            aggregates.update(session.data['orders'],
+                              session.data['order_items'],
+                              session.data['order_reviews'])
+        return aggregates
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+def main():
+    print("The library streaming.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+import os
+import numpy as np
+import pandas as pd
+
+from olistpackage.data import DATETIME_FORMAT
+
+
+# number of rows of the Olist dataset version 2, the scale 1 of generate()
+OLIST_SIZES = {
+    "orders": 99_441,
+    "customer_unique_ids": 96_096,
+    "sellers": 3_095,
+    "products": 32_951,
+    "zip_code_prefixes": 19_015,
+    "geolocation": 1_000_163,
+    "categories": 71,
+}
+
+# first zip code prefix of each state, and an approximate center (lat, lng)
+STATES = [
+    ("SP", 1000, -23.2, -47.3), ("RJ", 20000, -22.4, -42.9),
+    ("ES", 29000, -19.6, -40.6), ("MG", 30000, -18.9, -44.6),
+    ("BA", 40000, -12.6, -41.4), ("SE", 49000, -10.6, -37.4),
+    ("PE", 50000, -8.3, -36.9), ("AL", 57000, -9.6, -36.5),
+    ("PB", 58000, -7.1, -36.6), ("RN", 59000, -5.8, -36.5),
+    ("CE", 60000, -5.2, -39.5), ("PI", 64000, -7.4, -42.6),
+    ("MA", 65000, -4.9, -45.3), ("PA", 66000, -3.8, -52.4),
+    ("AP", 68900, 1.4, -51.8), ("AM", 69000, -3.4, -64.9),
+    ("RR", 69300, 2.1, -61.4), ("AM", 69400, -3.4, -64.9),
+    ("AC", 69900, -9.0, -70.3), ("DF", 70000, -15.8, -47.9),
+    ("GO", 72800, -16.0, -49.6), ("RO", 76800, -10.9, -62.8),
+    ("TO", 77000, -10.2, -48.3), ("MT", 78000, -13.0, -55.9),
+    ("MS", 79000, -20.5, -54.6), ("PR", 80000, -24.6, -51.5),
+    ("SC", 88000, -27.2, -50.4), ("RS", 90000, -29.7, -53.2),
+]
+
+# share of the orders of each status
+ORDER_STATUSES = {
+    "delivered": 0.9702, "shipped": 0.0111, "canceled": 0.0063,
+    "unavailable": 0.0061, "invoiced": 0.0032, "processing": 0.0030,
+    "created": 0.0001, "approved": 0.0001,
+}
+
+# share of the reviews of each score
+REVIEW_SCORES = {5: 0.578, 4: 0.193, 3: 0.082, 2: 0.032, 1: 0.115}
+
+# share of the payments of each type
+PAYMENT_TYPES = {
+    "credit_card": 0.739, "boleto": 0.190, "voucher": 0.056, "debit_card": 0.015,
+}
+
+# words of the review titles and messages, with the accents,
+# the punctuation and the mixed case of the real reviews
+REVIEW_WORDS = np.array([
+    "produto", "entrega", "ótimo", "otimo", "bom", "ruim", "recomendo",
+    "chegou", "antes", "do", "prazo", "não", "nao", "veio", "qualidade",
+    "excelente", "Muito", "bom!", "péssimo", "atrasou", "loja", "OK",
+    "Parabéns", "...", "super", "rápido", "correto", "faltou", "item",
+    "comprei", "e", "o", "a", "mas", "!!!", "10",
+])
+
+# timestamps of the orders
+START = np.datetime64("2016-09-04T00:00:00")
+END = np.datetime64("2018-10-17T00:00:00")
+
+
+def hex_ids(rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    Return n random 32 characters hex ids, like the Olist ids
+    :param rng: the random generator
+    :type rng: np.random.Generator
+    :param n: number of ids
+    :type n: int
+    :return: an object array of strings
+    :rtype: np.ndarray
+    """
+    # hex of each byte, then 16 bytes per id
+    hex_bytes = np.array([f"{i:02x}" for i in range(256)], dtype="S2")
+    ids = hex_bytes[rng.integers(0, 256, size=(n, 16), dtype=np.uint8)]
+    return np.ascontiguousarray(ids).view("S32").ravel().astype(str).astype(object)
+
+
+def choice(rng: np.random.Generator, shares: dict, n: int) -> np.ndarray:
+    """
+    Draw n keys of shares with the probabilities given by its values
+    """
+    keys = list(shares)
+    p = np.array([shares[k] for k in keys], dtype=float)
+    return np.array(keys)[rng.choice(len(keys), n, p=p / p.sum())]
+
+
+def popularity(rng: np.random.Generator, n: int) -> np.ndarray:
+    """
+    Return skewed probabilities of n sellers or products:
+    a few of them get most of the orders
+    """
+    weights = rng.lognormal(0, 1.5, n)
+    return weights / weights.sum()
+
+
+def seconds(rng: np.random.Generator, mean_days: float, n: int) -> np.ndarray:
+    """
+    Return n random durations with a mean of mean_days, as timedelta64[s]
+    """
+    return rng.gamma(2, mean_days * 86400 / 2, n).astype("timedelta64[s]")
+
+
+def write_csv(df: pd.DataFrame, path: str, append: bool) -> None:
+    """
+    Write a DataFrame in a csv file with the Olist timestamp format
+    """
+    df.to_csv(path, mode="a" if append else "w", header=not append,
+              index=False, date_format=DATETIME_FORMAT)
+
+
+def generate_geolocation(rng: np.random.Generator, scale: float) -> pd.DataFrame:
+    """
+    Return the geolocation table: the number of zip code prefixes
+    does not grow beyond the scale 1, Brazil does not grow with the orders
+    """
+    scale = min(scale, 1)
+    n_prefixes = max(int(OLIST_SIZES["zip_code_prefixes"] * scale), len(STATES))
+    n_rows = max(int(OLIST_SIZES["geolocation"] * scale), n_prefixes)
+    prefixes = np.sort(rng.choice(np.arange(1000, 100000), n_prefixes,
+                                  replace=False))
+
+    # state and center of each prefix, from the prefix ranges of the states
+    state = np.searchsorted([s[1] for s in STATES], prefixes, side="right") - 1
+    center_lat = np.array([s[2] for s in STATES])[state] + rng.normal(0, 1.5, n_prefixes)
+    center_lng = np.array([s[3] for s in STATES])[state] + rng.normal(0, 1.5, n_prefixes)
+
+    # several (lat, lng) per prefix, around its center,
+    # about half of the rows are in SP like in Olist
+    p = popularity(rng, n_prefixes) * np.where(state == 0, 5, 1)
+    rows = np.concatenate([
+        np.arange(n_prefixes),
+        rng.choice(n_prefixes, n_rows - n_prefixes, p=p / p.sum()),
+    ])
+    rows.sort()
+    return pd.DataFrame({
+        "geolocation_zip_code_prefix": prefixes[rows],
+        "geolocation_lat": center_lat[rows] + rng.normal(0, 0.02, n_rows),
+        "geolocation_lng": center_lng[rows] + rng.normal(0, 0.02, n_rows),
+        "geolocation_city": [f"cidade {p // 100}" for p in prefixes[rows]],
+        "geolocation_state": np.array([s[0] for s in STATES])[state][rows],
+    })
+
+
+def generate(path: str,
+             scale: float = 1.0,
+             seed: int = 0,
+             chunk_orders: int = 200_000) -> dict:
+    """
+    Write a synthetic dataset with the nine csv files of the Olist dataset,
+    the same columns and formats, consistent keys between the tables, and
+    the row counts, cardinalities and distributions of the Olist dataset
+    multiplied by scale. The orders and the tables of their rows
+    (customers, order_items, order_payments, order_reviews) are written
+    by chunks of chunk_orders orders, so that large scales fit in memory.
+    Read it with Olist(data_path=path).get_data()
+    :param path: the dataset directory, the csv files are written in path/csv
+    :type path: str
+    :param scale: the size of the dataset, 1 for the size of the Olist dataset
+    :type scale: float
+    :param seed: seed of the random generator, the same seed and scale
+    give the same dataset
+    :type seed: int
+    :param chunk_orders: number of orders generated at once
+    :type chunk_orders: int
+    :return: a Python dict with the table names as keys
+    and their numbers of rows as values
+    :rtype: dict
+    """
+    rng = np.random.default_rng(seed)
+    csv_path = os.path.join(path, "csv")
+    os.makedirs(csv_path, exist_ok=True)
+
+    def file(key: str) -> str:
+        return os.path.join(csv_path, f"olist_{key}_dataset.csv")
+
+    n_orders = max(int(OLIST_SIZES["orders"] * scale), 1)
+    sizes = {}
+
+    # geolocation
+    geolocation = generate_geolocation(rng, scale)
+    write_csv(geolocation, file("geolocation"), append=False)
+    sizes["geolocation"] = len(geolocation)
+    prefixes = geolocation.groupby("geolocation_zip_code_prefix")\
+        .agg(city=("geolocation_city", "first"),
+             state=("geolocation_state", "first"),
+             rows=("geolocation_city", "size"))
+    prefix_p = (prefixes["rows"] / prefixes["rows"].sum()).to_numpy()
+    del geolocation
+
+    # the customers and the sellers live where the geolocation rows are
+    def zips(n: int):
+        """
+        Draw n zip code prefixes with their cities and states,
+        0.3% of them are not in the geolocation table, like in Olist
+        """
+        i = rng.choice(len(prefixes), n, p=prefix_p)
+        zip_code = prefixes.index.to_numpy()[i].copy()
+        missing = rng.random(n) < 0.003
+        zip_code[missing] = 99999 - rng.integers(0, 10, missing.sum())
+        return zip_code, prefixes["city"].to_numpy()[i], prefixes["state"].to_numpy()[i]
+
+    # product categories and their translation, 2 categories are not translated
+    categories = [f"categoria_{i:02d}" for i in range(OLIST_SIZES["categories"] + 2)]
+    translation = pd.DataFrame({
+        "product_category_name": categories[:-2],
+        "product_category_name_english": [
+            f"category_{i:02d}" for i in range(OLIST_SIZES["categories"])],
+    })
+    translation.to_csv(os.path.join(csv_path, "product_category_name_translation.csv"),
+                       index=False)
+    sizes["product_category_name_translation"] = len(translation)
+
+    # products, 1.85% without category and description
+    n_products = max(int(OLIST_SIZES["products"] * scale), 1)
+    products = pd.DataFrame({
+        "product_id": hex_ids(rng, n_products),
+        "product_category_name": np.array(categories)[
+            rng.choice(len(categories), n_products, p=popularity(rng, len(categories)))],
+        "product_name_lenght": rng.integers(5, 77, n_products).astype(float),
+        "product_description_lenght": rng.gamma(2, 400, n_products).round() + 4,
+        "product_photos_qty": rng.geometric(0.45, n_products).astype(float),
+        "product_weight_g": rng.lognormal(6.6, 1.2, n_products).round(),
+        "product_length_cm": rng.integers(7, 106, n_products).astype(float),
+        "product_height_cm": rng.integers(2, 106, n_products).astype(float),
+        "product_width_cm": rng.integers(6, 119, n_products).astype(float),
+    })
+    no_category = rng.random(n_products) < 0.0185
+    products.loc[no_category, ["product_category_name", "product_name_lenght",
+                               "product_description_lenght",
+                               "product_photos_qty"]] = np.nan
+    write_csv(products, file("products"), append=False)
+    sizes["products"] = n_products
+    product_ids = products["product_id"].to_numpy()
+    product_p = popularity(rng, n_products)
+    del products
+
+    # sellers
+    n_sellers = max(int(OLIST_SIZES["sellers"] * scale), 1)
+    zip_code, city, state = zips(n_sellers)
+    sellers = pd.DataFrame({
+        "seller_id": hex_ids(rng, n_sellers),
+        "seller_zip_code_prefix": zip_code,
+        "seller_city": city,
+        "seller_state": state,
+    })
+    write_csv(sellers, file("sellers"), append=False)
+    sizes["sellers"] = n_sellers
+    seller_ids = sellers["seller_id"].to_numpy()
+    seller_p = popularity(rng, n_sellers)
+    del sellers
+
+    # the orders, and the tables of their rows, by chunks of orders
+    for key in ["customers", "orders", "order_items", "order_payments",
+                "order_reviews"]:
+        sizes[key] = 0
+    for start in range(0, n_orders, chunk_orders):
+        n = min(chunk_orders, n_orders - start)
+        append = start > 0
+        for key, df in generate_orders(rng, n, zips, seller_ids, seller_p,
+                                       product_ids, product_p).items():
+            write_csv(df, file(key), append)
+            sizes[key] += len(df)
+    return sizes
+
+
+def generate_orders(rng: np.random.Generator,
+                    n: int,
+                    zips,
+                    seller_ids: np.ndarray,
+                    seller_p: np.ndarray,
+                    product_ids: np.ndarray,
+                    product_p: np.ndarray) -> dict:
+    """
+    Return n orders, with their customers, items, payments and reviews
+    """
+    # customers: one customer_id per order, 3.4% of the people order again
+    n_people = max(int(n * OLIST_SIZES["customer_unique_ids"] / OLIST_SIZES["orders"]), 1)
+    people = hex_ids(rng, n_people)
+    customer_unique_id = np.concatenate([
+        people, people[rng.integers(0, n_people, n - n_people)]])
+    rng.shuffle(customer_unique_id)
+    zip_code, city, state = zips(n)
+    customers = pd.DataFrame({
+        "customer_id": hex_ids(rng, n),
+        "customer_unique_id": customer_unique_id,
+        "customer_zip_code_prefix": zip_code,
+        "customer_city": city,
+        "customer_state": state,
+    })
+
+    # orders: more orders over time, and missing dates
+    # according to the status, like in Olist
+    status = choice(rng, ORDER_STATUSES, n)
+    purchase = START + (rng.beta(1.6, 1.0, n) * (END - START).astype(int))\
+        .astype("timedelta64[s]")
+    approved = purchase + rng.exponential(10 * 3600, n).astype("timedelta64[s]")
+    carrier = approved + seconds(rng, 2.8, n)
+    delivered = carrier + seconds(rng, 9.3, n)
+    estimated = (purchase + rng.normal(23.4, 8.8, n).clip(2).astype("timedelta64[D]"))\
+        .astype("datetime64[D]").astype("datetime64[s]")
+    nat = np.datetime64("NaT")
+    approved[(status == "created") | (rng.random(n) < 0.0015)] = nat
+    carrier[~np.isin(status, ["delivered", "shipped"]) | (rng.random(n) < 0.0001)] = nat
+    delivered[(status != "delivered") | (rng.random(n) < 0.0003)] = nat
+    order_ids = hex_ids(rng, n)
+    orders = pd.DataFrame({
+        "order_id": order_ids,
+        "customer_id": customers["customer_id"],
+        "order_status": status,
+        "order_purchase_timestamp": purchase,
+        "order_approved_at": approved,
+        "order_delivered_carrier_date": carrier,
+        "order_delivered_customer_date": delivered,
+        "order_estimated_delivery_date": estimated,
+    })
+
+    # order_items: 90% of the orders have one item, most of the orders
+    # have one seller, unavailable orders have no item
+    n_items = rng.choice([1, 2, 3, 4, 5, 6], n,
+                         p=[0.900, 0.076, 0.013, 0.005, 0.003, 0.003])
+    n_items[(status == "unavailable") | (status == "created")
+            | ((status == "canceled") & (rng.random(n) < 0.5))] = 0
+    order = np.repeat(np.arange(n), n_items)
+    item = np.arange(len(order)) - np.repeat(np.cumsum(n_items) - n_items, n_items) + 1
+    order_seller = rng.choice(len(seller_ids), n, p=seller_p)
+    other_seller = rng.choice(len(seller_ids), len(order), p=seller_p)
+    seller = np.where(rng.random(len(order)) < 0.98, order_seller[order], other_seller)
+    product = rng.choice(len(product_ids), len(order), p=product_p)
+    shipping_limit = np.where(np.isnat(approved), purchase, approved)[order] \
+        + seconds(rng, 6, len(order))
+    order_items = pd.DataFrame({
+        "order_id": order_ids[order],
+        "order_item_id": item,
+        "product_id": product_ids[product],
+        "seller_id": seller_ids[seller],
+        "shipping_limit_date": shipping_limit,
+        "price": rng.lognormal(4.3, 0.9, len(order)).round(2) + 0.85,
+        "freight_value": rng.gamma(2.5, 8, len(order)).round(2),
+    })
+
+    # order_payments: the value of the items, in 1 to 3 payments
+    value = order_items.assign(value=order_items["price"] + order_items["freight_value"])\
+        .groupby("order_id", sort=False)["value"].sum()\
+        .reindex(order_ids, fill_value=0).to_numpy()
+    value = np.where(value > 0, value, rng.lognormal(4.6, 0.8, n))
+    n_payments = rng.choice([1, 2, 3], n, p=[0.97, 0.025, 0.005])
+    payment_order = np.repeat(np.arange(n), n_payments)
+    sequential = np.arange(len(payment_order)) \
+        - np.repeat(np.cumsum(n_payments) - n_payments, n_payments) + 1
+    payment_type = choice(rng, PAYMENT_TYPES, len(payment_order))
+    payment_type[sequential > 1] = "voucher"
+    installments = np.where(payment_type == "credit_card",
+                            rng.integers(1, 11, len(payment_order)), 1)
+    order_payments = pd.DataFrame({
+        "order_id": order_ids[payment_order],
+        "payment_sequential": sequential,
+        "payment_type": payment_type,
+        "payment_installments": installments,
+        "payment_value": (value[payment_order] / n_payments[payment_order]).round(2),
+    })
+
+    # order_reviews: 99.2% of the orders have a review, 0.6% have two,
+    # the day after the delivery (or the estimated delivery)
+    n_reviews = rng.choice([0, 1, 2], n, p=[0.008, 0.986, 0.006])
+    review_order = np.repeat(np.arange(n), n_reviews)
+    n_r = len(review_order)
+    reviewed = np.where(np.isnat(delivered), estimated, delivered)[review_order]
+    creation = (reviewed + np.timedelta64(1, "D")).astype("datetime64[D]")\
+        .astype("datetime64[s]")
+    has_title = rng.random(n_r) < 0.12
+    has_message = rng.random(n_r) < 0.41
+    order_reviews = pd.DataFrame({
+        "review_id": hex_ids(rng, n_r),
+        "order_id": order_ids[review_order],
+        "review_score": choice(rng, REVIEW_SCORES, n_r),
+        "review_comment_title": pd.Series(
+            review_texts(rng, has_title.sum(), 1, 3), index=np.flatnonzero(has_title)
+        ).reindex(range(n_r)),
+        "review_comment_message": pd.Series(
+            review_texts(rng, has_message.sum(), 3, 30), index=np.flatnonzero(has_message)
+        ).reindex(range(n_r)),
+        "review_creation_date": creation,
+        "review_answer_timestamp": creation + seconds(rng, 3.1, n_r),
+    })
+
+    return {
+        "customers": customers,
+        "orders": orders,
+        "order_items": order_items,
+        "order_payments": order_payments,
+        "order_reviews": order_reviews,
+    }
+
+
+def review_texts(rng: np.random.Generator, n: int, low: int, high: int) -> list:
+    """
+    Return n texts of low to high words from REVIEW_WORDS
+    """
+    lengths = rng.integers(low, high + 1, n)
+    words = REVIEW_WORDS[rng.integers(0, len(REVIEW_WORDS), lengths.sum())]
+    ends = np.cumsum(lengths)
+    return [" ".join(words[end - length:end]) for end, length in zip(ends, lengths)]
+
+
+def main():
+    print("The library synthetic.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
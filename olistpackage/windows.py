@@ -0,0 +1,248 @@
+import numpy as np
+import pandas as pd
+
+from olistpackage.session import Session
+
+
+# trailing windows of SellerWindows.metrics, in days
+WINDOWS = (30, 90, 365)
+
+# cumulated columns of the order items, see SellerWindows.__init__
+FACTS = ['price', 'delivered', 'delay_sum', 'delay_count', 'wait_sum',
+         'wait_count', 'reviews', 'score_sum', 'one_stars']
+
+ONE_DAY = 24 * 3600
+
+# times are in seconds since 1970 and must fit in 32 bits (1901 to 2038)
+FIRST_SECOND = -2**31
+
+
+def to_seconds(times) -> np.ndarray:
+    """
+    Return datetimes as int64 seconds since 1970, NaT as the minimum int64
+    :param times: a Series, an Index or an array of datetimes
+    :rtype: np.ndarray
+    """
+    return np.asarray(times, dtype='datetime64[s]').astype('int64')
+
+
+class PrefixSums:
+    """
+    Sums of the values of events of entities (e.g. the items of a seller)
+    over time intervals: the events are sorted once by entity and time,
+    and their values are cumulated, so the sum over an interval
+    is the difference of two cumulative sums found by binary search
+    """
+
+    def __init__(self, codes: np.ndarray, times, values: np.ndarray):
+        """
+        :param codes: the entity of each event, as integer codes
+        :type codes: np.ndarray
+        :param times: the time of each event, the events without time
+        are left out
+        :param values: the values of the events, one column per value
+        :type values: np.ndarray
+        """
+        times = np.asarray(times, dtype='datetime64[s]')
+        known = ~np.isnat(times)
+        # one int64 key per event, the entity code in the 32 high bits
+        keys = (np.asarray(codes, dtype='int64')[known] << 32) + \
+            times[known].astype('int64')
+        order = np.argsort(keys, kind='stable')
+        self.keys = keys[order]
+        # cumulative sums with a leading row of zeros:
+        # the sum of the events [lo, hi) is cumsum[hi] - cumsum[lo]
+        values = np.asarray(values, dtype='float64')[known][order]
+        self.cumsum = np.zeros((len(order) + 1, values.shape[1]))
+        np.cumsum(values, axis=0, out=self.cumsum[1:])
+
+
+    def sums(self, codes: np.ndarray, starts: np.ndarray, ends: np.ndarray) -> tuple:
+        """
+        Return the number of events and the sums of their values,
+        for each entity code, from start included to end excluded
+        :param codes: entity codes
+        :type codes: np.ndarray
+        :param starts: starts of the intervals, in seconds (see to_seconds)
+        :type starts: np.ndarray
+        :param ends: ends of the intervals, in seconds
+        :type ends: np.ndarray
+        :return: the numbers of events and the 2D array of the sums
+        :rtype: tuple
+        """
+        codes = np.asarray(codes, dtype='int64') << 32
+        # positions of the first event at or after the start
+        # and of the first event at or after the end
+        lo = self._positions(codes + starts)
+        hi = self._positions(codes + ends)
+        return hi - lo, self.cumsum[hi] - self.cumsum[lo]
+
+
+    def _positions(self, keys: np.ndarray) -> np.ndarray:
+        """
+        Return the positions of the keys in the sorted keys of the events,
+        the keys are searched in sorted order: the binary searches then
+        read the same parts of self.keys one after the other
+        """
+        if len(keys) < 2 or (keys[1:] >= keys[:-1]).all():
+            return np.searchsorted(self.keys, keys)
+        order = np.argsort(keys)
+        positions = np.empty(len(keys), dtype=np.intp)
+        positions[order] = np.searchsorted(self.keys, keys[order])
+        return positions
+
+
+class SellerWindows:
+    """
+    Seller metrics over trailing time windows (e.g. the last 30, 90 and
+    365 days) at each month end: sales, quantity, review_score,
+    share_of_one_stars, delay_to_carrier and wait_time, computed like
+    Seller.get_training_data on the orders purchased in the window.
+
+    The order items are sorted once by seller and order_purchase_timestamp
+    and their facts are cumulated (see PrefixSums): the sum over a window
+    is then the difference of two cumulative sums, found by binary search,
+    for every seller, date and window at once.
+
+    windows = SellerWindows(session)
+    windows.metrics()                                  # every month end
+    windows.metrics(windows=[7], dates=['2018-08-15'])
+    """
+
+    def __init__(self, session: Session = None):
+        """
+        :param session: the dataset context, defaults to Session.default()
+        :type session: Session
+        """
+        self.session = session if session is not None else Session.default()
+        data = self.session.source_data
+
+        # the orders of the items, the items of unknown orders are left out
+        orders = data['orders'][['order_id', 'order_status',
+                                 'order_purchase_timestamp',
+                                 'order_delivered_carrier_date',
+                                 'order_delivered_customer_date']]
+        order = pd.Index(orders['order_id']).get_indexer(data['order_items']['order_id'])
+        items = data['order_items'].loc[order >= 0, [
+            'order_id', 'seller_id', 'shipping_limit_date', 'price']]
+        orders = orders.iloc[order[order >= 0]].reset_index(drop=True)
+        items = items.reset_index(drop=True)
+        purchase = orders['order_purchase_timestamp']
+
+        # delivered items: delay_to_carrier and wait_time, in days
+        # (Seller.get_seller_delay_wait_time)
+        one_day_delta = np.timedelta64(24, 'h')
+        delivered = (orders['order_status'] == 'delivered').to_numpy()
+        delay = ((orders['order_delivered_carrier_date'] -
+                  items['shipping_limit_date']) / one_day_delta).to_numpy()
+        wait = ((orders['order_delivered_customer_date'] - purchase) /
+                one_day_delta).to_numpy()
+        delay = np.where(delivered, delay, np.nan)
+        wait = np.where(delivered, wait, np.nan)
+
+        # reviews of the order, counted once per (order_id, seller_id) pair
+        # on its first item (Seller.get_review_score)
+        reviews = data['order_reviews'][['order_id', 'review_score']]
+        reviews = reviews.assign(
+            review_score=reviews['review_score'].astype('float64'),
+            one_star=(reviews['review_score'] == 1) * 1)\
+            .groupby('order_id', observed=True)\
+            .agg(reviews=('review_score', 'size'),
+                 score_sum=('review_score', 'sum'),
+                 one_stars=('one_star', 'sum'))
+        review = reviews.index.get_indexer(items['order_id'])
+        reviewed = (review >= 0) & ~items.duplicated(['order_id', 'seller_id']).to_numpy()
+
+        facts = np.zeros((len(items), len(FACTS)))
+        facts[:, 0] = items['price'].to_numpy(dtype='float64')
+        facts[:, 1] = delivered
+        facts[:, 2] = np.nan_to_num(delay)
+        facts[:, 3] = ~np.isnan(delay)
+        facts[:, 4] = np.nan_to_num(wait)
+        facts[:, 5] = ~np.isnan(wait)
+        for i, column in enumerate(['reviews', 'score_sum', 'one_stars'], 6):
+            values = reviews[column].to_numpy(dtype='float64')
+            facts[:, i] = np.where(reviewed, values[review], 0)
+
+        # sort the items by seller, then by purchase time
+        codes, self.sellers = pd.factorize(items['seller_id'])
+        self.items = PrefixSums(codes, purchase, facts)
+        self.first_purchase = purchase.min()
+        self.last_purchase = purchase.max()
+
+
+    def month_ends(self) -> pd.DatetimeIndex:
+        """
+        Return the month ends from the first to the last purchase month
+        :rtype: pd.DatetimeIndex
+        """
+        if pd.isna(self.first_purchase):
+            return pd.DatetimeIndex([])
+        month_end = pd.offsets.MonthEnd()
+        return pd.date_range(month_end.rollforward(self.first_purchase.normalize()),
+                             month_end.rollforward(self.last_purchase.normalize()),
+                             freq=month_end)
+
+
+    def metrics(self,
+                windows: list = WINDOWS,
+                dates: list = None) -> pd.core.frame.DataFrame:
+        """
+        Returns a DataFrame with the following columns:
+        seller_id, date, window, sales, quantity, review_score,
+        share_of_one_stars, delay_to_carrier, wait_time
+        one row per seller, date and window with items in the window:
+        the items of the orders purchased in the window days up to
+        the date, included
+        :param windows: lengths of the windows, in days
+        :type windows: list
+        :param dates: the last days of the windows,
+        defaults to SellerWindows.month_ends()
+        :type dates: list
+        :return: a DataFrame with the specified columns
+        :rtype: pd.core.frame.DataFrame
+        """
+        dates = self.month_ends() if dates is None \
+            else pd.DatetimeIndex(dates).normalize()
+        # grid of the sellers, dates and windows
+        sellers, ends, lengths = (a.ravel() for a in np.meshgrid(
+            np.arange(len(self.sellers), dtype='int64'),
+            to_seconds(dates + pd.Timedelta(days=1)),
+            np.asarray(windows, dtype='int64'),
+            indexing='ij'))
+
+        quantity, sums = self.items.sums(sellers, ends - lengths * ONE_DAY, ends)
+        window = quantity > 0
+        sums = pd.DataFrame(sums[window], columns=FACTS)
+
+        df = pd.DataFrame({
+            'seller_id': self.sellers.take(sellers[window]),
+            'date': pd.to_datetime(ends[window] - ONE_DAY, unit='s'),
+            'window': lengths[window],
+            'sales': sums['price'],
+            'quantity': quantity[window],
+        })
+        # means of the window, as in Seller.get_training_data
+        reviews = sums['reviews'].replace(0, np.nan)
+        df['review_score'] = sums['score_sum'] / reviews
+        df['share_of_one_stars'] = sums['one_stars'] / reviews
+        delay = sums['delay_sum'] / sums['delay_count'].replace(0, np.nan)
+        df['delay_to_carrier'] = delay.where(delay > 0, 0)\
+            .where(sums['delivered'] > 0)
+        df['wait_time'] = sums['wait_sum'] / sums['wait_count'].replace(0, np.nan)
+        return df
+
+
+    def ping(self):
+        """
+        You call ping I return pong.
+        """
+        return "PONG"
+
+
+def main():
+    print("The library windows.py has been ran directly.")
+
+
+if __name__ == "__main__":
+    main()
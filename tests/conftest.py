@@ -0,0 +1,16 @@
+"""
+pytest configuration of the tests of olistpackage
+"""
+from olistpackage.data import Olist
+from olistpackage.synthetic import generate
+
+
+def pytest_configure(config):
+    """
+    The tests read the csv files of root/data/csv (see Olist.get_data):
+    when they are not downloaded, a small synthetic dataset with the same
+    tables is written in their place before the test modules are imported
+    """
+    olist = Olist()
+    if not olist.csv_files_exist():
+        generate(olist.data_path, scale=0.03)
@@ -0,0 +1,107 @@
+"""
+test asof.py from olistpackage
+"""
+import numpy as np
+from olistpackage.asof import AsOfAggregates, main
+from olistpackage.session import Session
+
+session = Session.default()
+data = session.source_data
+a = AsOfAggregates(session)
+sellers = a.sellers()
+products = a.products()
+
+
+def before(order_id):
+    """
+    Return a session of the facts known strictly before the purchase
+    of an order: the orders purchased before, delivered before,
+    and the reviews created before
+    """
+    orders = data['orders']
+    purchase = orders.loc[orders['order_id'] == order_id,
+                          'order_purchase_timestamp'].iloc[0]
+    orders = orders[orders['order_purchase_timestamp'] < purchase].copy()
+    delivered = orders['order_delivered_customer_date'] < purchase
+    orders.loc[~delivered, 'order_status'] = 'shipped'
+    order_items = data['order_items']
+    order_reviews = data['order_reviews']
+    return Session({**data,
+                    'orders': orders,
+                    'order_items': order_items[
+                        order_items['order_id'].isin(orders['order_id'])],
+                    'order_reviews': order_reviews[
+                        order_reviews['review_creation_date'] < purchase]},
+                   feature_cache=False)
+
+
+def value(df, key, entity, column, default=np.nan):
+    """
+    Return the value of an entity, default if the entity has no row:
+    0 for the sums, NaN for the means
+    """
+    df = df.astype({key: str}).set_index(key)
+    return df[column].get(str(entity), default)
+
+
+def test_columns():
+    assert list(sellers.columns) == [
+        'order_id', 'seller_id', 'n_orders', 'quantity', 'sales',
+        'delay_to_carrier', 'wait_time', 'review_score', 'share_of_one_stars',
+        'share_of_five_stars', 'cost_of_reviews']
+    assert list(products.columns) == [
+        'order_id', 'product_id', 'n_orders', 'quantity', 'sales', 'price',
+        'wait_time', 'review_score', 'share_of_one_stars',
+        'share_of_five_stars', 'cost_of_reviews']
+    assert not sellers.duplicated(['order_id', 'seller_id']).any()
+    assert len(products) == len(data['order_items']
+                                [['order_id', 'product_id']].drop_duplicates())
+
+def test_first_order():
+    # nothing is known before the first order of the dataset
+    purchase = data['orders'].set_index('order_id')['order_purchase_timestamp']
+    first = sellers['order_id'].map(purchase) == purchase.min()
+    assert (sellers.loc[first, 'quantity'] == 0).all()
+    assert sellers.loc[first, 'review_score'].isna().all()
+
+def test_sellers():
+    for i in [10, len(sellers) // 2, len(sellers) - 10]:
+        row = sellers.iloc[i]
+        seller = before(row['order_id']).seller()
+        delay_wait_time = seller.get_seller_delay_wait_time()
+        review_score = seller.get_review_score()
+        expected = [
+            value(seller.get_sales(), 'seller_id', row['seller_id'], 'sales', 0),
+            value(seller.get_quantity(), 'seller_id', row['seller_id'], 'n_orders', 0),
+            value(delay_wait_time, 'seller_id', row['seller_id'], 'delay_to_carrier'),
+            value(delay_wait_time, 'seller_id', row['seller_id'], 'wait_time'),
+            value(review_score, 'seller_id', row['seller_id'], 'review_score'),
+            value(review_score, 'seller_id', row['seller_id'], 'share_of_one_stars'),
+        ]
+        result = row[['sales', 'n_orders', 'delay_to_carrier', 'wait_time',
+                      'review_score', 'share_of_one_stars']].astype(float)
+        assert np.allclose(result, expected, equal_nan=True)
+
+def test_products():
+    for i in [10, len(products) // 2, len(products) - 10]:
+        row = products.iloc[i]
+        product = before(row['order_id']).product()
+        expected = [
+            value(product.get_price(), 'product_id', row['product_id'], 'price'),
+            value(product.get_quantity(), 'product_id', row['product_id'],
+                  'quantity', 0),
+            value(product.get_wait_time(), 'product_id', row['product_id'],
+                  'wait_time'),
+            value(product.get_review_score(), 'product_id', row['product_id'],
+                  'review_score'),
+        ]
+        result = row[['price', 'quantity', 'wait_time', 'review_score']]\
+            .astype(float)
+        assert np.allclose(result, expected, equal_nan=True)
+
+
+def test_ping():
+    assert a.ping() == "PONG"
+
+def test_main():
+    assert main() == None
@@ -0,0 +1,134 @@
+"""
+test cube.py from olistpackage
+"""
+import numpy as np
+import pandas as pd
+import pytest
+from olistpackage.cube import ProductCube, DIMENSIONS, MEASURES, WEIGHTED_MEANS, main
+from olistpackage.session import Session
+
+session = Session.default()
+c = ProductCube.from_session(session)
+
+# the order items with their category, as in Product.get_product_features
+items = session.data['order_items'].merge(
+    session.product().get_product_features()[['product_id', 'category']],
+    on='product_id')
+items = items[items['order_id'].isin(session.data['orders']['order_id'])]
+items['category'] = items['category'].astype(str)
+
+
+def test_cells():
+    assert list(c.cells.columns) == DIMENSIONS + MEASURES
+    assert not c.cells.duplicated(DIMENSIONS).any()
+    assert c.cells['quantity'].sum() == len(items)
+    assert np.isclose(c.cells['sales'].sum(), items['price'].sum())
+
+def test_product_cat_sum():
+    result = c.product_cat(agg="sum")
+    result.index = result.index.astype(str)
+    expected = items.groupby('category').agg(
+        quantity=('order_id', 'size'), sales=('price', 'sum'))
+    pd.testing.assert_frame_equal(
+        result[['quantity', 'sales']].sort_index(), expected,
+        check_dtype=False, check_names=False)
+    assert np.allclose(result['revenues'], 0.1 * result['sales'])
+
+def test_product_cat_mean():
+    result = c.product_cat(agg="mean")
+    result.index = result.index.astype(str)
+    price = items.groupby('category')['price'].mean()
+    assert np.allclose(result['weighted_price'].sort_index(), price)
+    assert result['weighted_review_score'].between(1, 5).all()
+    # the means over the products of Product.get_product_cat
+    # have their own names
+    assert list(result.columns) == WEIGHTED_MEANS + ['quantity']
+    assert not set(WEIGHTED_MEANS) & set(session.product().get_product_cat().columns)
+    with pytest.raises(ValueError):
+        c.product_cat(agg="median")
+
+def test_product_cat_parity():
+    # Product.get_product_cat sums the products of
+    # Product.get_training_data, which have a delivered order
+    product = session.product()
+    products = product.get_training_data()['product_id']
+    order_items = session.data['order_items']
+    cube = ProductCube.from_session(Session({
+        **session.data,
+        'order_items': order_items[order_items['product_id'].isin(products)]}))
+    columns = ['n_orders', 'quantity', 'sales', 'cost_of_reviews',
+               'revenues', 'profits']
+    for agg in ["sum", "mean"]:
+        result = cube.product_cat(agg=agg)
+        expected = product.get_product_cat(agg=agg)
+        result.index = result.index.astype(str)
+        expected.index = expected.index.astype(str)
+        if agg == "mean":
+            # only quantity is summed by Product.get_product_cat(agg="mean")
+            columns = ['quantity']
+        pd.testing.assert_frame_equal(
+            result[columns].sort_index(), expected[columns].sort_index(),
+            check_dtype=False, check_names=False)
+
+def test_rollup():
+    total = c.rollup()
+    assert total['quantity'].iloc[0] == len(items)
+    states = c.rollup(['customer_state'])
+    assert states['quantity'].sum() == len(items)
+    state = states.index[0]
+    sliced = c.rollup(filters={'customer_state': state})
+    assert sliced['quantity'].iloc[0] == states['quantity'].iloc[0]
+    with pytest.raises(ValueError):
+        c.rollup(filters={'product_id': 'x'})
+
+def test_rollup_months():
+    months = c.rollup(['month'])
+    first, last = months.index[0], months.index[-1]
+    result = c.rollup(filters={'month': (str(first.date()), str(last.date()))})
+    assert result['quantity'].iloc[0] == len(items)
+    result = c.rollup(filters={'month': first})
+    assert result['quantity'].iloc[0] == months['quantity'].iloc[0]
+
+def test_merge():
+    # two cubes of two halves of the orders
+    orders = session.data['orders']
+    half = orders['order_id'].isin(orders['order_id'].iloc[::2])
+    cubes = [ProductCube.from_session(Session({**session.data, 'orders': o}))
+             for o in [orders[half], orders[~half]]]
+    merged = cubes[0].merge(cubes[1])
+    result = merged.rollup(DIMENSIONS[:3])[MEASURES]
+    expected = c.rollup(DIMENSIONS[:3])[MEASURES]
+    result.index = result.index.map(lambda key: tuple(map(str, key)))
+    expected.index = expected.index.map(lambda key: tuple(map(str, key)))
+    pd.testing.assert_frame_equal(result.sort_index(), expected.sort_index(),
+                                  check_dtype=False)
+
+def test_missing_dimensions():
+    # items of an unknown seller, of an unknown customer
+    # and of an order without purchase time
+    orders = session.data['orders'].copy()
+    orders.loc[orders.index[0], 'order_purchase_timestamp'] = pd.NaT
+    cube = ProductCube.from_session(Session({
+        **session.data,
+        'orders': orders,
+        'sellers': session.data['sellers'].iloc[1:],
+        'customers': session.data['customers'].iloc[1:]}))
+    for dimension in ['seller_state', 'customer_state', 'month']:
+        assert cube.cells[dimension].isna().any()
+    assert cube.cells['quantity'].sum() == len(items)
+    assert cube.rollup(['seller_state'])['quantity'].sum() == len(items)
+    merged = cube.merge(cube)
+    assert merged.cells['quantity'].sum() == 2 * len(items)
+
+def test_save_load(tmp_path):
+    path = str(tmp_path / "cube.parquet")
+    c.save(path)
+    loaded = ProductCube.load(path)
+    assert loaded.product_cat().equals(c.product_cat())
+
+
+def test_ping():
+    assert c.ping() == "PONG"
+
+def test_main():
+    assert main() == None
@@ -21,6 +21,56 @@ def test_download_data():
 def test_get_data():
     assert len(o.get_data()) == 9
 
+def test_get_data_categorical_ids():
+    assert o.get_data()['orders']['order_id'].dtype == 'category'
+
+def test_get_data_timestamps():
+    orders = o.get_data()['orders']
+    assert orders['order_purchase_timestamp'].dtype == 'datetime64[ns]'
+    assert orders['order_approved_at'].dtype == 'datetime64[ns]'
+
+def test_memory_report():
+    report = o.memory_report()
+    assert len(report) == 9
+    for c in ['table', 'rows', 'memory_before_mb', 'memory_after_mb', 'reduction']:
+        assert c in report.columns
+
+def test_get_data_lazy():
+    data = o.get_data(lazy=True)
+    assert len(data) == 9
+    assert data.loaded() == []
+    assert 'orders' in list(data)
+    assert len(data['orders']) > 0
+    assert data.loaded() == ['orders']
+
+def test_cache_path():
+    assert isinstance(o.cache_path(), str)
+
+def test_get_data_from_cache():
+    o.get_data()
+    assert o.read_cache('orders') is not None
+    assert len(o.get_data()) == 9
+
+def test_get_data_n_jobs():
+    data = o.get_data(n_jobs=4)
+    assert list(data) == list(o.get_data())
+    assert data['orders'].equals(o.get_data()['orders'])
+    assert set(o.read_times) == set(data)
+
+def test_get_data_columns():
+    columns = {'order_reviews': ['order_id', 'review_score']}
+    data = o.get_data(columns=columns)
+    assert list(data['order_reviews'].columns) == columns['order_reviews']
+    assert data['orders'].equals(o.get_data()['orders'])
+    # csv file, without writing a partial cache
+    data = o.get_data(use_cache=False, columns=columns, lazy=True)
+    assert list(data['order_reviews'].columns) == columns['order_reviews']
+
+def test_time_get_data():
+    times = o.time_get_data(n_jobs=2)
+    assert set(times) == {'cold', 'warm', 'cold_tables'}
+    assert len(times['cold_tables']) == 9
+
 def test_ping():
     assert o.ping() == "PONG"
 
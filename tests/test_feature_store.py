@@ -0,0 +1,83 @@
+"""
+test feature_store.py from olistpackage
+"""
+import pandas as pd
+import pytest
+from olistpackage.feature_store import FeatureStore, data_fingerprint, main
+from olistpackage.session import Session
+
+df = pd.DataFrame({'seller_id': ['a', 'b'], 'sales': [1.0, 2.0]})
+
+
+def test_data_fingerprint():
+    assert isinstance(data_fingerprint(Session.default().data), str)
+    assert data_fingerprint({'t': df}) == data_fingerprint({'t': df.copy()})
+    assert data_fingerprint({'t': df}) != data_fingerprint({'t': df.head(1)})
+
+def test_data_fingerprint_update_table():
+    session = Session()
+    fingerprint = data_fingerprint(session.source_data)
+    orders = session.data['orders']
+    session.update_table('orders', orders.head(10))
+    assert data_fingerprint(session.source_data) != fingerprint
+    session.update_table('orders', orders)
+    assert data_fingerprint(session.source_data) != fingerprint
+    session.reload(['orders'])
+    assert data_fingerprint(session.source_data) == fingerprint
+
+def test_data_fingerprint_encode_ids():
+    session = Session(encode_ids=True)
+    assert data_fingerprint(session.source_data) == \
+        data_fingerprint(Session().source_data)
+
+def test_write_load(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    version = store.write('seller', df, 'fingerprint1')
+    assert store.load('seller', version).equals(df)
+    assert store.load('seller').equals(df)
+    # a version is never modified
+    assert store.write('seller', df.head(1), 'fingerprint1') == version
+    assert store.load('seller', version).equals(df)
+    assert [p.name for p in (tmp_path / 'seller').iterdir()] == [version]
+
+def test_versions_prune(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    store.write('seller', df, 'fingerprint1')
+    latest = store.write('seller', df.head(1), 'fingerprint2')
+    versions = store.versions('seller')
+    assert list(versions['version'])[-1] == latest
+    assert len(versions) == 2
+    assert len(store.prune('seller', keep=1)) == 1
+    assert list(store.versions('seller')['version']) == [latest]
+    assert len(store.load('seller')) == 1
+
+def test_load_missing(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    with pytest.raises(KeyError):
+        store.load('seller')
+
+def test_get_update_table(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    session = Session()
+    assert len(store.get('product', session)) == len(session.product().get_training_data())
+    session.update_table('order_items', session.data['order_items'].head(100))
+    products = store.get('product', session)
+    assert len(products) == len(session.product().get_training_data())
+    assert len(store.versions('product')) == 2
+
+def test_get(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    order = store.get('order')
+    assert isinstance(order, pd.core.frame.DataFrame)
+    assert len(store.versions('order')) == 1
+    assert len(store.get('order')) == len(order)
+    assert len(store.versions('order')) == 1
+
+def test_build(tmp_path):
+    store = FeatureStore(str(tmp_path))
+    version = store.build('product')
+    assert len(store.load('product', version).columns) == 20
+
+
+def test_main():
+    assert main() == None
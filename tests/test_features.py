@@ -0,0 +1,135 @@
+"""
+test features.py from olistpackage
+"""
+import pandas as pd
+import time
+from olistpackage.features import (FeatureCache, dependencies, required_tables,
+                                   graph, run_blocks, assemble,
+                                   required_columns, main)
+from olistpackage.session import Session
+
+df = pd.DataFrame({'a': range(1000)})
+size = int(df.memory_usage(deep=True).sum())
+
+
+# test the dependency graph
+def test_type_graph():
+    assert isinstance(graph(), pd.core.frame.DataFrame)
+
+def test_dependencies():
+    assert 'Order.get_review_score' in dependencies('Seller.get_training_data')
+    assert 'Product.get_training_data' in dependencies('Product.get_product_cat')
+
+def test_required_tables():
+    assert required_tables('Order.get_wait_time') == ['orders']
+    assert required_tables('Product.get_wait_time') == ['order_items', 'orders']
+
+def test_required_columns():
+    columns = required_columns(['Seller.get_training_data'])
+    assert columns['order_reviews'] == ['order_id', 'review_score']
+    assert columns['orders'][0] == 'order_id'
+    assert 'review_comment_message' not in columns['order_reviews']
+    # get_product_features reads the whole products table
+    assert 'products' not in required_columns(['Product.get_training_data'])
+
+
+# test FeatureCache
+def test_cache_get_put():
+    cache = FeatureCache()
+    assert cache.get(('f', ())) is None
+    cache.put(('f', ()), df, ['orders'])
+    assert cache.get(('f', ())) is df
+    assert cache.info()['hits'] == 1
+
+def test_cache_lru_eviction():
+    cache = FeatureCache(max_bytes=2 * size)
+    cache.put(('f', 1), df, ['orders'])
+    cache.put(('f', 2), df, ['orders'])
+    cache.get(('f', 1))
+    cache.put(('f', 3), df, ['orders'])
+    assert cache.get(('f', 2)) is None
+    assert cache.get(('f', 1)) is df
+    assert cache.nbytes <= cache.max_bytes
+
+def test_cache_invalidate():
+    cache = FeatureCache()
+    cache.put(('f', 1), df, ['orders'])
+    cache.put(('f', 2), df, ['order_items'])
+    cache.invalidate(['orders'])
+    assert len(cache) == 1
+    assert cache.get(('f', 2)) is df
+
+
+# test the cached feature methods
+def test_session_cache():
+    s = Session()
+    order = s.order()
+    first = order.get_wait_time()
+    assert order.get_wait_time(True).equals(first)
+    assert s.features.info()['hits'] == 1
+
+def test_session_cache_returns_copies():
+    order = Session().order()
+    order.get_wait_time()['wait_time'] = 0
+    assert not (order.get_wait_time()['wait_time'] == 0).all()
+
+def test_session_update_table():
+    s = Session()
+    order = s.order()
+    order.get_wait_time()
+    s.update_table('orders', s.data['orders'].head(10))
+    assert len(s.features) == 0
+    assert len(order.get_wait_time()) <= 10
+
+def test_session_without_cache():
+    s = Session(feature_cache=False)
+    assert s.features is None
+    assert len(s.order().get_review_score()) > 0
+
+
+# test the concurrent feature blocks
+def test_run_blocks_order():
+    # the first block finishes last
+    blocks = [lambda: time.sleep(0.2) or 1, lambda: 2, lambda: 3]
+    assert run_blocks(blocks) == [1, 2, 3]
+    assert run_blocks(blocks, n_jobs=3) == [1, 2, 3]
+
+def test_training_data_n_jobs():
+    order = Session(feature_cache=False).order()
+    assert order.get_training_data(n_jobs=4).equals(order.get_training_data())
+    product = Session(feature_cache=False).product()
+    assert product.get_training_data(n_jobs=4).equals(product.get_training_data())
+
+def test_training_data_n_jobs_cache_key():
+    s = Session()
+    s.order().get_training_data()
+    hits = s.features.info()['hits']
+    s.order().get_training_data(n_jobs=4)
+    assert s.features.info()['hits'] == hits + 1
+
+
+# test assemble
+def chain(blocks, on):
+    result = blocks[0]
+    for block in blocks[1:]:
+        result = result.merge(block, on=on)
+    return result
+
+def test_assemble_same_as_merge():
+    a = pd.DataFrame({'k': [3, 1, 2, 5], 'x': [30, 10, 20, 50]})
+    b = pd.DataFrame({'k': [2, 3, 3, 4, 1], 'y': [.2, .3, .33, .4, .1]})
+    c = pd.DataFrame({'z': ['one', 'three', 'two'], 'k': [1, 3, 2]})
+    for blocks in [[a, b, c], [b, a, c], [c, a]]:
+        assert assemble(blocks, 'k').equals(chain(blocks, 'k'))
+
+def test_assemble_training_data_blocks():
+    order = Session(feature_cache=False).order()
+    blocks = [order.get_wait_time(), order.get_review_score(),
+              order.get_number_products(), order.get_price_and_freight()]
+    result = assemble(blocks, 'order_id').astype({'order_id': object})
+    expected = chain(blocks, 'order_id').astype({'order_id': object})
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_main():
+    assert main() == None
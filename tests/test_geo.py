@@ -0,0 +1,102 @@
+"""
+test geo.py from olistpackage
+"""
+import os
+import numpy as np
+import pandas as pd
+from haversine import haversine
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from olistpackage.geo import haversine_np, ZipIndex, DistanceCache, main
+
+pairs = pd.DataFrame({
+    'seller_zip_code_prefix': [1001, 1001, 22290],
+    'customer_zip_code_prefix': [1001, 22290, 69900],
+    'geolocation_lat_seller': [-23.55, -23.55, -22.95],
+    'geolocation_lng_seller': [-46.63, -46.63, -43.18],
+    'geolocation_lat_customer': [-23.55, -22.95, -9.97],
+    'geolocation_lng_customer': [-46.63, -43.18, -67.81],
+})
+
+
+def test_haversine_np():
+    expected = [haversine((r.geolocation_lat_seller, r.geolocation_lng_seller),
+                          (r.geolocation_lat_customer, r.geolocation_lng_customer))
+                for r in pairs.itertuples()]
+    result = haversine_np(pairs.geolocation_lat_seller, pairs.geolocation_lng_seller,
+                          pairs.geolocation_lat_customer, pairs.geolocation_lng_customer)
+    assert np.allclose(result, expected)
+
+geolocation = pd.DataFrame({
+    'geolocation_zip_code_prefix': [22290, 1001, 1001, 1001],
+    'geolocation_lat': [-22.95, -23.0, -24.0, -26.0],
+    'geolocation_lng': [-43.18, -46.0, -47.0, -45.0],
+})
+
+def test_zip_index_first():
+    index = ZipIndex.from_geolocation(geolocation)
+    assert list(index.prefixes) == [1001, 22290]
+    assert index.lat.dtype == np.float32
+    lat, lng = index.lookup([22290, 1001])
+    assert np.allclose(lat, [-22.95, -23.0])
+    assert np.allclose(lng, [-43.18, -46.0])
+
+def test_zip_index_mean_median():
+    lat, lng = ZipIndex.from_geolocation(geolocation, "mean").lookup([1001])
+    assert np.allclose([lat[0], lng[0]], [-73 / 3, -46.0])
+    lat, lng = ZipIndex.from_geolocation(geolocation, "median").lookup([1001])
+    assert np.allclose([lat[0], lng[0]], [-24.0, -46.0])
+
+def test_zip_index_lookup_missing():
+    lat, lng = ZipIndex.from_geolocation(geolocation).lookup([1, 5000, 99999])
+    assert np.isnan(lat).all() and np.isnan(lng).all()
+
+def test_zip_index_lookup_empty():
+    index = ZipIndex.from_geolocation(geolocation.iloc[:0])
+    assert len(index) == 0
+    lat, lng = index.lookup([1001, 22290])
+    assert lat.shape == lng.shape == (2,)
+    assert np.isnan(lat).all() and np.isnan(lng).all()
+
+def test_zip_index_key():
+    assert ZipIndex.from_geolocation(geolocation).key != \
+        ZipIndex.from_geolocation(geolocation, "mean").key
+
+def test_zip_index_unknown_agg():
+    with pytest.raises(ValueError):
+        ZipIndex.from_geolocation(geolocation, "last")
+
+def test_distance_cache(tmp_path):
+    cache = DistanceCache(str(tmp_path / "distances.parquet"))
+    expected = DistanceCache.compute(pairs)
+    assert np.allclose(cache.distances(pairs, "key"), expected)
+    assert len(cache.read("key")) == 3
+    assert len(cache.read("other_key")) == 0
+    assert np.allclose(cache.distances(pairs.iloc[::-1], "key"), expected[::-1])
+
+def test_distance_cache_key_in_file(tmp_path):
+    cache = DistanceCache(str(tmp_path / "distances.parquet"))
+    cache.distances(pairs, "key")
+    cache.distances(pairs.iloc[:1], "other_key")
+    assert len(cache.read("key")) == 0
+    assert len(cache.read("other_key")) == 1
+    assert os.listdir(tmp_path) == ["distances.parquet"]
+
+def test_distance_cache_threads(tmp_path):
+    cache = DistanceCache(str(tmp_path / "distances.parquet"))
+    expected = DistanceCache.compute(pairs)
+    keys = [f"key_{i % 2}" for i in range(16)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda key: cache.distances(pairs, key), keys))
+    assert all(np.allclose(result, expected) for result in results)
+    assert os.listdir(tmp_path) == ["distances.parquet"]
+
+def test_distance_cache_without_cache(tmp_path):
+    cache = DistanceCache(str(tmp_path / "distances.parquet"))
+    assert np.allclose(cache.distances(pairs, "key", use_cache=False),
+                       DistanceCache.compute(pairs))
+    assert len(cache.read("key")) == 0
+
+
+def test_main():
+    assert main() == None
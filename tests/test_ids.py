@@ -0,0 +1,64 @@
+"""
+test ids.py from olistpackage
+"""
+import pandas as pd
+from olistpackage.ids import IdDictionary, EncodedData, ID_COLUMNS, main
+from olistpackage.session import Session
+
+session = Session(feature_cache=False)
+encoded = Session(feature_cache=False, encode_ids=True)
+ids = encoded.ids
+
+
+# test IdDictionary
+def test_index_sorted():
+    index = ids.index('seller_id')
+    assert index.is_monotonic_increasing
+    assert len(index) == session.data['sellers']['seller_id'].nunique()
+
+def test_encode_shared_codes():
+    orders = encoded.data['orders']['order_id']
+    items = encoded.data['order_items']['order_id']
+    assert orders.dtype == 'int32' and items.dtype == 'int32'
+    # the same id has the same code in both tables
+    first = session.data['order_items']['order_id'].iloc[0]
+    position = session.data['orders']['order_id'].tolist().index(first)
+    assert items.iloc[0] == orders.iloc[position]
+
+def test_encode_unknown_ids():
+    dictionary = IdDictionary({'sellers': pd.DataFrame({'seller_id': ['b', 'a']})})
+    codes = dictionary.encode('seller_id', pd.Series(['a', 'c', None, 'b']))
+    assert list(codes) == [0, 2, -1, 1]
+    decoded = dictionary.decode(pd.DataFrame({'seller_id': codes}))
+    assert decoded['seller_id'].astype(object).tolist()[:2] == ['a', 'c']
+
+def test_encoded_data():
+    assert isinstance(encoded.data, EncodedData)
+    assert list(encoded.data) == list(session.data)
+    assert encoded.source_data is encoded.data.source
+
+
+# test Session(encode_ids=True)
+def test_same_training_data():
+    for name in ['order', 'product']:
+        expected = getattr(session, name)().get_training_data()
+        result = getattr(encoded, name)().get_training_data(n_jobs=4)
+        assert list(result.columns) == list(expected.columns)
+        key = result.columns[0]
+        pd.testing.assert_frame_equal(
+            result.astype({key: object}).sort_values(key).reset_index(drop=True),
+            expected.astype({key: object}).sort_values(key).reset_index(drop=True),
+            check_dtype=False)
+
+def test_decoded_ids():
+    for column in ID_COLUMNS:
+        for df in [encoded.order().get_review_score(),
+                   encoded.product().get_training_data()]:
+            if column in df.columns:
+                assert isinstance(df[column].dtype, pd.CategoricalDtype)
+
+def test_ping():
+    assert ids.ping() == "PONG"
+
+def test_main():
+    assert main() == None
@@ -0,0 +1,57 @@
+"""
+test incremental.py from olistpackage
+"""
+import pandas as pd
+import pytest
+from olistpackage.incremental import IncrementalAggregates, main
+from olistpackage.session import Session
+
+session = Session.default()
+orders = session.data['orders']
+order_items = session.data['order_items']
+order_reviews = session.data['order_reviews']
+
+# fold the data as two deltas of orders
+order_ids = orders['order_id'].astype(str)
+first = order_ids < order_ids.sort_values().iloc[len(order_ids) // 2]
+first_ids = orders.loc[first, 'order_id']
+i = IncrementalAggregates(session)
+i.update(orders[first],
+         order_items[order_items['order_id'].isin(first_ids)],
+         order_reviews.iloc[:len(order_reviews) // 2])
+i.update(orders[~first],
+         order_items[~order_items['order_id'].isin(first_ids)],
+         order_reviews.iloc[len(order_reviews) // 2:])
+
+
+def sort(df, key):
+    return df.astype({key: str}).sort_values(key).reset_index(drop=True)
+
+def test_seller_training_data():
+    expected = sort(session.seller().get_training_data(), 'seller_id')
+    result = sort(i.seller_training_data(), 'seller_id')[expected.columns]
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False,
+                                  check_categorical=False)
+
+def test_product_training_data():
+    expected = sort(session.product().get_training_data(), 'product_id')
+    result = sort(i.product_training_data(), 'product_id')[expected.columns]
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False,
+                                  check_categorical=False)
+
+def test_update_known_orders():
+    with pytest.raises(ValueError):
+        IncrementalAggregates(session).update(orders.head(3))\
+            .update(orders.head(3))
+
+def test_save_load(tmp_path):
+    i.save(str(tmp_path))
+    loaded = IncrementalAggregates.load(str(tmp_path), session)
+    assert loaded.product_training_data().equals(i.product_training_data())
+
+
+def test_ping():
+    assert i.ping() == "PONG"
+
+def test_main():
+    assert main() == None
@@ -110,6 +110,10 @@ def test_columns_get_distance_seller_customer():
     for c in ['order_id', 'distance_seller_customer']:
         assert c in o.get_distance_seller_customer()
 
+def test_columns_get_distance_seller_customer_with_mean():
+    for c in ['order_id', 'distance_seller_customer']:
+        assert c in o.get_distance_seller_customer(agg='mean')
+
 
 # test get_training_data()
 def test_type_get_training_data():
@@ -0,0 +1,69 @@
+"""
+test profiling.py from olistpackage
+"""
+import json
+import pandas as pd
+from olistpackage import profiling
+from olistpackage.profiling import Profiler, main
+from olistpackage.session import Session
+
+session = Session()
+with Profiler() as profiler:
+    session.product().get_training_data(n_jobs=4)
+report = profiler.report()
+
+
+def test_disabled():
+    assert profiling.ACTIVE is None
+
+def test_type_report():
+    assert isinstance(report, pd.core.frame.DataFrame)
+
+def test_report_columns():
+    assert list(report.columns) == [
+        "id", "parent", "depth", "name", "thread", "wall_s", "cpu_s",
+        "memory_peak_mb", "input_rows", "output_rows"]
+
+def test_report_values():
+    assert report.loc[0, 'name'] == 'Product.get_training_data'
+    assert report.loc[0, 'output_rows'] == len(session.product().get_training_data())
+    assert (report['wall_s'] >= 0).all()
+    assert (report['cpu_s'] >= 0).all()
+
+def test_memory_per_thread():
+    # the memory is measured in the thread which started the profiler only
+    main_thread = report['thread'] == report.loc[0, 'thread']
+    assert (report.loc[main_thread, 'memory_peak_mb'] >= 0).all()
+    assert report.loc[~main_thread, 'memory_peak_mb'].isna().all()
+    assert (~main_thread).any()
+
+def test_tree():
+    roots = profiler.tree()
+    assert len(roots) == 1
+    children = [child['name'] for child in roots[0]['children']]
+    assert 'Product.get_review_score' in children
+    review_score = roots[0]['children'][children.index('Product.get_review_score')]
+    assert 'Order.get_review_score' in [c['name'] for c in review_score['children']]
+
+def test_to_json():
+    assert json.loads(profiler.to_json()) == profiler.tree()
+
+def test_format_tree():
+    assert profiler.format_tree().splitlines()[0].startswith('Product.get_training_data')
+
+def test_read_table():
+    olist = session.data.olist
+    with Profiler(memory=False) as p:
+        olist.get_data(n_jobs=4)
+    names = list(p.report()['name'])
+    assert names[0] == 'Olist.get_data'
+    assert 'Olist.read_table(orders)' in names
+    assert set(p.report()['depth'][1:]) == {1}
+
+def test_not_recorded():
+    session.order().get_wait_time()
+    assert len(profiler.report()) == len(report)
+
+
+def test_main():
+    assert main() == None
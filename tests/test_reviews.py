@@ -0,0 +1,133 @@
+"""
+test reviews.py from olistpackage
+"""
+import string
+import nltk
+import numpy as np
+import pandas as pd
+import pytest
+import unidecode
+from nltk.tokenize import NLTKWordTokenizer
+from olistpackage.reviews import Reviews, ReviewTopics, CONTRACTIONS, normalize, main
+from olistpackage.session import Session
+
+session = Session.default()
+r = Reviews(session)
+reviews = r.get_reviews(after_delivery=False, words=("de", "a"))
+t = ReviewTopics().fit(reviews['clean_review'], reviews['review_score'])
+words = ("de", "a", "o", "que", "e", "não", "é", "um", "para", "com", "muito",
+         "na")
+texts = pd.Series(["Produto MUITO bom! Chegou em 2 dias.",
+                   "Não recebi o produto²",
+                   None,
+                   "",
+                   "  ótimo, recomendo  ",
+                   "O produto é de 1ª qualidade",
+                   "Ação\tde   graças\nrecomendo",
+                   "I cannot wait, gonna buy again",
+                   "wanna",
+                   "Produto MUITO bom! Chegou em 2 dias."],
+                  index=range(10, 20))
+
+try:
+    nltk.data.find("tokenizers/punkt")
+    PUNKT = True
+except LookupError:
+    PUNKT = False
+
+
+def word_tokenize(text):
+    """
+    nltk.word_tokenize, which needs the punkt data to split the sentences:
+    without it, the texts without punctuation (a single sentence)
+    are tokenized by the word tokenizer of nltk.word_tokenize
+    """
+    if PUNKT:
+        return nltk.word_tokenize(text)
+    assert not any(char in string.punctuation for char in text)
+    return NLTKWordTokenizer().tokenize(text)
+
+
+def clean(text, tokenize=word_tokenize):
+    """
+    The clean function of the notebook 5_reviews_investigation
+    """
+    text = "".join([char for char in text if char not in string.punctuation])
+    text = text.lower()
+    text = "".join([char for char in text if not char.isdigit()])
+    text = unidecode.unidecode(text)
+    text = tokenize(text)
+    text = " ".join([word for word in text if word not in words])
+    return text.strip()
+
+
+def test_normalize():
+    result = normalize(texts, words)
+    assert result.index.equals(texts.index)
+    assert result.tolist() == [clean(text or "") for text in texts]
+    assert result.iloc[1] == "nao recebi produto"
+    assert result.iloc[7] == "i can not wait gon buy again"
+    assert result.iloc[8] == "wan"
+
+def test_normalize_contractions():
+    # the words split by the nltk word tokenizer without punctuation
+    text = " ".join(word.upper() for word in CONTRACTIONS)
+    assert normalize(pd.Series([text]), words).iloc[0] == clean(text)
+
+def test_normalize_n_jobs():
+    assert normalize(texts, words, n_jobs=2).equals(normalize(texts, words))
+
+def test_normalize_punctuation():
+    # unidecode gives punctuation, tokenized by nltk
+    if not PUNKT:
+        pytest.skip("the nltk punkt data is not downloaded")
+    text = "Chegou rápido… “ótimo” produto"
+    assert normalize(pd.Series([text]), words).iloc[0] == \
+        clean(text)
+
+def test_get_reviews():
+    df = r.get_reviews(words=words)
+    assert list(df.columns) == ['review_id', 'order_id', 'review_score',
+                                'review_title_and_message', 'clean_review']
+    assert (df['clean_review'] != "").all()
+    assert df['clean_review'].tolist() == \
+        [clean(text) for text in df['review_title_and_message']]
+    assert len(r.get_reviews(after_delivery=False, words=words)) >= len(df)
+
+def test_top_terms():
+    # same weights as the dense DataFrame of the notebook
+    dense = pd.DataFrame(t.matrix.toarray(), columns=t.terms).sum(axis=0)
+    result = t.top_terms(10)
+    assert list(result.columns) == ['rank', 'term', 'weight']
+    assert list(result['rank']) == list(range(1, 11))
+    assert np.allclose(result['weight'], dense.sort_values(ascending=False)[:10])
+    assert np.allclose(result['weight'], dense[result['term']])
+
+def test_top_terms_by_band():
+    result = t.top_terms_by_band(5)
+    assert list(result.columns) == ['band', 'rank', 'term', 'weight']
+    assert set(result['band']) == {'negative', 'neutral', 'positive'}
+    negative = reviews['review_score'] <= 2
+    dense = pd.DataFrame(t.matrix[np.flatnonzero(negative)].toarray(),
+                         columns=t.terms).sum(axis=0)
+    weights = result.loc[result['band'] == 'negative', 'weight']
+    assert np.allclose(weights, dense.sort_values(ascending=False)[:5])
+    with pytest.raises(ValueError):
+        ReviewTopics().fit(reviews['clean_review']).top_terms(band='negative')
+
+def test_topics():
+    for method in ['lda', 'nmf']:
+        result = t.topics(n_topics=3, method=method, top=4, band='positive')
+        assert list(result.columns) == ['topic', 'rank', 'term', 'weight']
+        assert len(result) == 12
+        assert set(result['term']) <= set(t.terms)
+    with pytest.raises(ValueError):
+        t.topics(method='pca')
+
+
+def test_ping():
+    assert r.ping() == "PONG"
+    assert t.ping() == "PONG"
+
+def test_main():
+    assert main() == None
@@ -0,0 +1,67 @@
+"""
+test session.py from olistpackage
+"""
+from olistpackage.session import Session, main
+from olistpackage.data import Olist
+from olistpackage.order import Order
+from olistpackage.seller import Seller
+from olistpackage.product import Product
+
+s = Session()
+
+def test_len_data():
+    assert len(s.data) == 9
+
+def test_order_shares_data():
+    assert s.order().data is s.data
+
+def test_seller_shares_data():
+    seller = s.seller()
+    assert seller.data is s.data
+    assert seller.order.data is s.data
+
+def test_product_shares_data():
+    product = s.product()
+    assert product.data is s.data
+    assert product.order.data is s.data
+
+def test_zip_index():
+    assert s.zip_index() is s.zip_index()
+    assert len(s.zip_index("mean")) == len(s.zip_index())
+
+def test_update_table_geolocation():
+    session = Session()
+    session.zip_index()
+    geolocation = session.data['geolocation'].assign(geolocation_lat=0.0)
+    session.update_table('geolocation', geolocation)
+    assert (session.zip_index().lat == 0).all()
+    assert (session.zip_index("mean").lat == 0).all()
+    session.reload(['geolocation'])
+    assert (session.zip_index().lat != 0).any()
+
+def test_cache_path():
+    assert s.cache_path() == Olist().cache_path()
+    assert Session(dict(s.data)).cache_path() is None
+
+def test_distances_without_cache_path():
+    session = Session(dict(s.data))
+    result = session.order().get_distance_seller_customer()
+    expected = s.order().get_distance_seller_customer()
+    assert result.equals(expected)
+
+def test_default_session():
+    assert Order().data is Seller().data
+    assert Seller().data is Product().data
+    assert Order().session is Session.default()
+
+def test_used_features():
+    session = Session(used_features=['Order.get_training_data'])
+    assert 'review_comment_message' not in session.data['order_reviews'].columns
+    assert session.order().get_training_data().equals(s.order().get_training_data())
+
+def test_ping():
+    assert s.ping() == "PONG"
+
+
+def test_main():
+    assert main() == None
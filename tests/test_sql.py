@@ -0,0 +1,94 @@
+"""
+test sql.py from olistpackage: the DuckDB engine gives the same results
+as the pandas feature methods
+"""
+import pandas as pd
+import pytest
+from olistpackage.sql import DuckDBEngine, QUERIES, KEYS, main
+from olistpackage.features import load_graph
+from olistpackage.session import Session
+from olistpackage.data import Olist
+from olistpackage.synthetic import generate
+
+pandas_session = Session(feature_cache=False)
+duckdb_session = Session(feature_cache=False, engine="duckdb")
+
+
+def same(result, expected):
+    """
+    Compare two results whatever the row order and the dtypes
+    """
+    def normalize(df):
+        df = df.reset_index(drop=df.index.name is None)
+        for column in df.columns:
+            if df[column].dtype in ('object', 'category'):
+                df[column] = df[column].astype(str)
+        return df.sort_values(list(df.columns)).reset_index(drop=True)
+    assert list(result.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(normalize(result), normalize(expected),
+                                  check_dtype=False, rtol=1e-5)
+
+
+# every feature method has a query
+def test_queries():
+    assert sorted(QUERIES) == sorted(load_graph())
+    assert sorted(KEYS) == sorted(load_graph())
+
+def test_engine():
+    assert isinstance(duckdb_session.sql, DuckDBEngine)
+    assert pandas_session.sql is None
+    with pytest.raises(ValueError):
+        Session(engine="spark")
+
+
+# parity with the pandas engine
+@pytest.mark.parametrize("name", sorted(QUERIES))
+def test_parity(name):
+    class_name, method = name.split(".")
+    result = getattr(getattr(duckdb_session, class_name.lower())(), method)()
+    expected = getattr(getattr(pandas_session, class_name.lower())(), method)()
+    same(result, expected)
+
+@pytest.mark.parametrize("name, kwargs", [
+    ("Order.get_wait_time", {"is_delivered": False}),
+    ("Order.get_training_data", {"with_distance_seller_customer": True}),
+    ("Order.get_distance_seller_customer", {"agg": "median"}),
+    ("Product.get_product_cat", {"agg": "median"}),
+])
+def test_parity_arguments(name, kwargs):
+    class_name, method = name.split(".")
+    result = getattr(getattr(duckdb_session, class_name.lower())(), method)(**kwargs)
+    expected = getattr(getattr(pandas_session, class_name.lower())(), method)(**kwargs)
+    same(result, expected)
+
+def test_update_table():
+    session = Session(feature_cache=False, engine="duckdb")
+    orders = session.data['orders']
+    session.update_table('orders', orders.iloc[:100])
+    assert len(session.order().get_wait_time(is_delivered=False)) == 100
+
+
+def test_quoted_path(tmp_path):
+    # a data path with a quote, read from the csv files
+    path = str(tmp_path / "olist's data")
+    generate(path, scale=0.001, seed=0)
+    data = Olist(path).get_data(lazy=True, use_cache=False)
+    session = Session(data, feature_cache=False, engine="duckdb")
+    same(session.order().get_wait_time(),
+         Session(Olist(path).get_data(), feature_cache=False).order().get_wait_time())
+
+def test_used_features():
+    # the views of the files have the columns of the LazyData only
+    session = Session(engine="duckdb", used_features=["Order.get_wait_time"])
+    cursor = session.sql.connection.cursor()
+    session.sql.register(cursor, "orders", session.sql.source("orders"))
+    columns = list(cursor.execute("SELECT * FROM orders LIMIT 0").df().columns)
+    assert columns == session.data.columns["orders"]
+    assert len(columns) < len(pandas_session.data["orders"].columns)
+    same(session.order().get_wait_time(), pandas_session.order().get_wait_time())
+
+def test_ping():
+    assert duckdb_session.sql.ping() == "PONG"
+
+def test_main():
+    assert main() == None
@@ -0,0 +1,54 @@
+"""
+test streaming.py from olistpackage
+"""
+import os
+import pandas as pd
+from olistpackage.streaming import StreamingTrainingData, main
+from olistpackage.session import Session
+
+session = Session.default()
+
+
+def sort(df, by=None):
+    df = df.copy()
+    for column in df.select_dtypes('category'):
+        df[column] = df[column].astype(str)
+    by = list(df.columns) if by is None else by
+    return df.sort_values(by).reset_index(drop=True)
+
+def test_partition(tmp_path):
+    s = StreamingTrainingData(chunksize=1000, n_partitions=3, path=str(tmp_path))
+    s.partition()
+    orders = pd.concat([s.read_partition(p)['orders'] for p in range(3)])
+    assert len(orders) == len(session.data['orders'])
+    # all the items of an order are in the partition of the order
+    for p in range(3):
+        data = s.read_partition(p)
+        assert data['order_items']['order_id'].isin(data['orders']['order_id']).all()
+
+def test_order_training_data(tmp_path):
+    s = StreamingTrainingData(chunksize=1000, n_partitions=3, path=str(tmp_path))
+    output_path = s.order_training_data()
+    assert len(os.listdir(output_path)) == 3
+    expected = sort(session.order().get_training_data())
+    pd.testing.assert_frame_equal(sort(pd.read_parquet(output_path)), expected,
+                                  check_dtype=False)
+
+def test_aggregates(tmp_path):
+    s = StreamingTrainingData(chunksize=1000, n_partitions=3, path=str(tmp_path))
+    aggregates = s.aggregates()
+    for key, result, expected in [
+            ('product_id', aggregates.product_training_data(),
+             session.product().get_training_data()),
+            ('seller_id', aggregates.seller_training_data(),
+             session.seller().get_training_data())]:
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_frame_equal(sort(result, [key]), sort(expected, [key]),
+                                      check_dtype=False)
+
+
+def test_ping():
+    assert StreamingTrainingData().ping() == "PONG"
+
+def test_main():
+    assert main() == None
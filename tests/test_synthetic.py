@@ -0,0 +1,56 @@
+"""
+test synthetic.py from olistpackage
+"""
+import pytest
+from olistpackage.synthetic import generate, hex_ids, main
+from olistpackage.data import Olist
+from olistpackage.session import Session
+import numpy as np
+
+
+@pytest.fixture(scope="module")
+def olist(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("synthetic"))
+    generate(path, scale=0.01, seed=0, chunk_orders=300)
+    return Olist(path)
+
+
+def test_hex_ids():
+    ids = hex_ids(np.random.default_rng(0), 10)
+    assert len(ids) == 10
+    assert all(len(i) == 32 for i in ids)
+
+def test_generate_files(olist):
+    assert olist.csv_files_exist()
+    assert len(olist.get_data()) == 9
+
+def test_generate_sizes(olist):
+    data = olist.get_data()
+    assert len(data['orders']) == 994
+    assert len(data['customers']) == len(data['orders'])
+    assert len(data['order_items']) > len(data['orders']) * 0.9
+
+def test_generate_keys(olist):
+    data = olist.get_data()
+    items = data['order_items']
+    assert items['order_id'].isin(data['orders']['order_id']).all()
+    assert items['seller_id'].isin(data['sellers']['seller_id']).all()
+    assert items['product_id'].isin(data['products']['product_id']).all()
+    assert data['orders']['customer_id'].isin(data['customers']['customer_id']).all()
+    assert data['order_reviews']['order_id'].isin(data['orders']['order_id']).all()
+
+def test_generate_seed(tmp_path):
+    generate(str(tmp_path / "a"), scale=0.001, seed=1)
+    generate(str(tmp_path / "b"), scale=0.001, seed=1)
+    a = Olist(str(tmp_path / "a")).get_data(use_cache=False)
+    b = Olist(str(tmp_path / "b")).get_data(use_cache=False)
+    assert a['order_items'].equals(b['order_items'])
+
+def test_generate_training_data(olist):
+    session = Session(olist.get_data(lazy=True))
+    assert len(session.order().get_training_data()) > 0
+    assert len(session.product().get_training_data()) > 0
+
+
+def test_main():
+    assert main() == None
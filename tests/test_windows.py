@@ -0,0 +1,72 @@
+"""
+test windows.py from olistpackage
+"""
+import pandas as pd
+from olistpackage.windows import SellerWindows, WINDOWS, main
+from olistpackage.session import Session
+
+session = Session.default()
+w = SellerWindows(session)
+m = w.metrics()
+
+
+def seller_metrics(date, window):
+    """
+    The metrics of the Seller methods on the orders of a window
+    """
+    data = session.source_data
+    end = pd.Timestamp(date) + pd.Timedelta(days=1)
+    start = end - pd.Timedelta(days=window)
+    purchase = data['orders']['order_purchase_timestamp']
+    orders = data['orders'][(purchase >= start) & (purchase < end)]
+    s = Session({**data,
+                 'orders': orders,
+                 'order_items': data['order_items'][
+                     data['order_items']['order_id'].isin(orders['order_id'])],
+                 'order_reviews': data['order_reviews'][
+                     data['order_reviews']['order_id'].isin(orders['order_id'])]},
+                feature_cache=False)
+    seller = s.seller()
+    df = seller.get_sales()\
+        .merge(seller.get_quantity()[['seller_id', 'quantity']], on='seller_id')\
+        .merge(seller.get_review_score()[['seller_id', 'review_score',
+                                          'share_of_one_stars']],
+               on='seller_id', how='left')\
+        .merge(seller.get_seller_delay_wait_time(), on='seller_id', how='left')
+    return df.astype({'seller_id': str}).sort_values('seller_id')\
+        .reset_index(drop=True)
+
+
+def test_month_ends():
+    dates = w.month_ends()
+    assert (dates == dates + pd.offsets.MonthEnd(0)).all()
+    assert list(m.columns) == [
+        'seller_id', 'date', 'window', 'sales', 'quantity', 'review_score',
+        'share_of_one_stars', 'delay_to_carrier', 'wait_time']
+    assert set(m['window']) == set(WINDOWS)
+    assert set(m['date']) <= set(dates)
+    assert (m['quantity'] > 0).all()
+
+def test_metrics():
+    for date, window in [(w.month_ends()[-1], 365), (w.month_ends()[-4], 90)]:
+        expected = seller_metrics(date, window)
+        result = m[(m['date'] == date) & (m['window'] == window)]
+        result = result.astype({'seller_id': str}).sort_values('seller_id')\
+            .reset_index(drop=True)[expected.columns]
+        pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+def test_metrics_dates():
+    date = w.month_ends()[-2] - pd.Timedelta(days=10)
+    expected = seller_metrics(date, 45)
+    result = w.metrics(windows=[45], dates=[date])
+    assert (result['date'] == date).all()
+    result = result.astype({'seller_id': str}).sort_values('seller_id')\
+        .reset_index(drop=True)[expected.columns]
+    pd.testing.assert_frame_equal(result, expected, check_dtype=False)
+
+
+def test_ping():
+    assert w.ping() == "PONG"
+
+def test_main():
+    assert main() == None